@@ -0,0 +1,63 @@
+import numpy as np
+
+from numpy.typing import ArrayLike, NDArray
+from typing import NamedTuple
+
+from analysis.mpp import PVParameters, calc_pv_parameters, resample_rows, sort_sweeps
+
+
+class HysteresisResult(NamedTuple):
+	# Floats and (m,) curves for a single pair of sweeps, with a leading k axis for k pairs
+	forward: PVParameters
+	reverse: PVParameters
+	average: PVParameters  # parameters of the averaged proxy curve
+	hysteresis_index: NDArray[np.float64]  # (Pmpp_reverse - Pmpp_forward) / Pmpp_reverse
+	area_index: NDArray[np.float64]  # area between the curves over the area under the reverse curve, 0 V to Voc
+	voltage: NDArray[np.float64]  # common voltage grid
+	current: NDArray[np.float64]  # averaged proxy current on the grid
+
+
+def resample_pairs(
+	forward: ArrayLike, reverse: ArrayLike, grid_points: int = 201
+) -> tuple[NDArray[np.float64], NDArray[np.float64], NDArray[np.float64], bool]:
+	# Put the forward and reverse currents of every pair on a shared grid spanning the voltage range both sweeps cover
+	i_fwd, v_fwd, single = sort_sweeps(forward)
+	i_rev, v_rev, single_rev = sort_sweeps(reverse)
+	if single != single_rev or i_fwd.shape[0] != i_rev.shape[0]:
+		raise ValueError(f"Forward and reverse sweeps do not pair up, got {i_fwd.shape[0]} and {i_rev.shape[0]}.")
+
+	v_lo = np.maximum(v_fwd[:, :1], v_rev[:, :1])
+	v_hi = np.minimum(v_fwd[:, -1:], v_rev[:, -1:])
+	if np.any(v_hi <= v_lo):
+		raise ValueError("Forward and reverse sweeps must overlap in voltage.")
+
+	grid = v_lo + (v_hi - v_lo) * np.linspace(0.0, 1.0, grid_points)
+	return grid, resample_rows(v_fwd, i_fwd, grid), resample_rows(v_rev, i_rev, grid), single
+
+
+def analyse_hysteresis(
+	forward: ArrayLike, reverse: ArrayLike, grid_points: int = 201, fit_points: int = 5
+) -> HysteresisResult:
+	# Forward and reverse [I, V] sweeps as n * 2 or k * n * 2 arrays, sweeps in a pair may differ in length
+	grid, i_fwd, i_rev, single = resample_pairs(forward, reverse, grid_points)
+	i_avg = 0.5 * (i_fwd + i_rev)
+
+	fwd = calc_pv_parameters(np.asarray(forward, dtype=np.float64), fit_points)
+	rev = calc_pv_parameters(np.asarray(reverse, dtype=np.float64), fit_points)
+	avg = calc_pv_parameters(np.stack([i_avg, grid], axis=-1), fit_points)
+
+	# integrate |I_rev - I_fwd| and |I_rev| over the generating quadrant of the reverse sweep only
+	voc = np.atleast_1d(rev.voc)[:, np.newaxis]
+	generating = (grid >= 0) & (grid <= np.where(np.isfinite(voc), voc, grid[:, -1:]))
+	gap = np.trapezoid(np.where(generating, np.abs(i_rev - i_fwd), 0.0), grid, axis=1)
+	under = np.trapezoid(np.where(generating, np.abs(i_rev), 0.0), grid, axis=1)
+
+	with np.errstate(divide="ignore", invalid="ignore"):
+		pmpp_fwd, pmpp_rev = np.atleast_1d(fwd.pmpp), np.atleast_1d(rev.pmpp)
+		hysteresis_index = np.where(pmpp_rev > 0, (pmpp_rev - pmpp_fwd) / pmpp_rev, np.nan)
+		area_index = np.where(under > 0, gap / under, np.nan)
+
+	if single:
+		avg = PVParameters(*(field[0] for field in avg))
+		return HysteresisResult(fwd, rev, avg, hysteresis_index[0], area_index[0], voltage=grid[0], current=i_avg[0])
+	return HysteresisResult(fwd, rev, avg, hysteresis_index, area_index, voltage=grid, current=i_avg)
@@ -0,0 +1,134 @@
+import numpy as np
+
+from numpy.typing import ArrayLike, NDArray
+from typing import NamedTuple
+
+
+class PVParameters(NamedTuple):
+	# Floats for a single n * 2 sweep, shape (k,) arrays for a k * n * 2 stack of sweeps
+	voc: NDArray[np.float64]
+	isc: NDArray[np.float64]  # magnitude of the current at 0 V
+	vmpp: NDArray[np.float64]
+	impp: NDArray[np.float64]  # magnitude of the current at Vmpp
+	pmpp: NDArray[np.float64]
+	ff: NDArray[np.float64]
+
+
+def sort_sweeps(iv_data_array: ArrayLike) -> tuple[NDArray[np.float64], NDArray[np.float64], bool]:
+	# Split n * 2 or k * n * 2 [I, V] data into (k, n) current and voltage arrays ordered by ascending voltage
+	data = np.asarray(iv_data_array, dtype=np.float64)
+	single = data.ndim == 2
+	if single:
+		data = data[np.newaxis]
+
+	if data.ndim != 3 or data.shape[-1] != 2:
+		raise ValueError(f"Expected an n * 2 or k * n * 2 array of current and voltage data, got shape {data.shape}.")
+	if data.shape[1] < 3:
+		raise ValueError("At least three points per sweep are required to extract PV parameters.")
+
+	order = np.argsort(data[..., 1], axis=1)
+	i = np.take_along_axis(data[..., 0], order, axis=1)
+	v = np.take_along_axis(data[..., 1], order, axis=1)
+	return i, v, single
+
+
+def interp_rows(x: NDArray[np.float64], y: NDArray[np.float64], x0: NDArray[np.float64]) -> NDArray[np.float64]:
+	# Row-wise linear interpolation of y at x0 for ascending x, extrapolating from the end segments if out of range
+	n = x.shape[1]
+	rows = np.arange(x.shape[0])
+	j = np.clip(np.sum(x <= x0[:, np.newaxis], axis=1) - 1, 0, n - 2)
+
+	x_lo, x_hi = x[rows, j], x[rows, j + 1]
+	y_lo, y_hi = y[rows, j], y[rows, j + 1]
+	with np.errstate(divide="ignore", invalid="ignore"):
+		slope = (y_hi - y_lo) / (x_hi - x_lo)
+	slope = np.where(np.isfinite(slope), slope, 0.0)
+	return y_lo + slope * (x0 - x_lo)
+
+
+def resample_rows(x: NDArray[np.float64], y: NDArray[np.float64], x_new: NDArray[np.float64]) -> NDArray[np.float64]:
+	# Row-wise linear interpolation of y at (k, m) x_new for ascending (k, n) x, clamped to each row's end values.
+	# Offsetting every row past the previous one makes the flattened x ascending, so one searchsorted serves all rows.
+	k, n = x.shape
+	x_new = np.clip(x_new, x[:, :1], x[:, -1:])
+	offset = (np.arange(k) * (np.ptp(x) + 1.0))[:, np.newaxis]
+
+	j = np.searchsorted((x + offset).ravel(), (x_new + offset).ravel(), side="right").reshape(x_new.shape) - 1
+	j = np.clip(j - (np.arange(k) * n)[:, np.newaxis], 0, n - 2)
+
+	x_lo, x_hi = np.take_along_axis(x, j, axis=1), np.take_along_axis(x, j + 1, axis=1)
+	y_lo, y_hi = np.take_along_axis(y, j, axis=1), np.take_along_axis(y, j + 1, axis=1)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		slope = (y_hi - y_lo) / (x_hi - x_lo)
+	slope = np.where(np.isfinite(slope), slope, 0.0)
+	return y_lo + slope * (x_new - x_lo)
+
+
+def _open_circuit_voltage(i: NDArray[np.float64], v: NDArray[np.float64]) -> NDArray[np.float64]:
+	# Interpolate across the first sign change of the current, or extrapolate the last segment if the sweep stops short
+	n = i.shape[1]
+	rows = np.arange(i.shape[0])
+	crossed = np.sign(i) != np.sign(i[:, :1])
+	j = np.where(crossed.any(axis=1), np.argmax(crossed, axis=1) - 1, n - 2)
+	j = np.clip(j, 0, n - 2)
+
+	i_lo, i_hi = i[rows, j], i[rows, j + 1]
+	v_lo, v_hi = v[rows, j], v[rows, j + 1]
+	with np.errstate(divide="ignore", invalid="ignore"):
+		voc = v_lo - i_lo * (v_hi - v_lo) / (i_hi - i_lo)
+	return np.where(np.isfinite(voc), voc, np.nan)
+
+
+def _fit_power_peak(
+	i: NDArray[np.float64], v: NDArray[np.float64], fit_points: int, grid_points: int = 201
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+	# Fit a local cubic to I(V) around max |V*I| of every sweep (solved as one batch) and maximise V*I between
+	# the neighbouring sweep points. I(V) stays smooth through the knee where the power curve itself is skewed.
+	k, n = v.shape
+	rows = np.arange(k)
+	fit_points = min(max(fit_points, 4), n)
+
+	photocurrent_sign = np.sign(i[:, :1])
+	generating = (v >= 0) & (np.sign(i) == photocurrent_sign)  # ignore reverse bias and points beyond Voc
+	p = np.where(generating, np.abs(v * i), 0.0)
+	peak = np.argmax(p, axis=1)
+	start = np.clip(peak - fit_points // 2, 0, n - fit_points)
+	window = start[:, np.newaxis] + np.arange(fit_points)
+
+	v_peak = v[rows, peak]
+	x = np.take_along_axis(v, window, axis=1) - v_peak[:, np.newaxis]  # centre on the peak for conditioning
+	y = np.take_along_axis(i, window, axis=1)
+	coeffs = (np.linalg.pinv(x[..., np.newaxis] ** np.arange(4)) @ y[..., np.newaxis])[..., 0]
+
+	x_lo = v[rows, np.clip(peak - 1, 0, n - 1)] - v_peak
+	x_hi = v[rows, np.clip(peak + 1, 0, n - 1)] - v_peak
+	x_grid = x_lo[:, np.newaxis] + (x_hi - x_lo)[:, np.newaxis] * np.linspace(0.0, 1.0, grid_points)
+	i_grid = (x_grid[..., np.newaxis] ** np.arange(4)) @ coeffs[..., np.newaxis]
+	v_grid = v_peak[:, np.newaxis] + x_grid
+	p_grid = np.where(
+		(v_grid >= 0) & (np.sign(i_grid[..., 0]) == photocurrent_sign), np.abs(v_grid * i_grid[..., 0]), 0.0
+	)
+
+	best = np.argmax(p_grid, axis=1)
+	vmpp, pmpp = v_grid[rows, best], p_grid[rows, best]
+
+	# keep the raw sweep point if the fit is degenerate or does worse than the measured peak
+	fallback = ~np.isfinite(pmpp) | (pmpp < p[rows, peak])
+	return np.where(fallback, v_peak, vmpp), np.where(fallback, p[rows, peak], pmpp)
+
+
+def calc_pv_parameters(iv_data_array: ArrayLike, fit_points: int = 5) -> PVParameters:
+	i, v, single = sort_sweeps(iv_data_array)
+
+	vmpp, pmpp = _fit_power_peak(i, v, fit_points)
+	voc = _open_circuit_voltage(i, v)
+	isc = np.abs(interp_rows(v, i, np.zeros(v.shape[0])))
+
+	with np.errstate(divide="ignore", invalid="ignore"):
+		impp = np.where(vmpp != 0, pmpp / np.abs(vmpp), np.nan)
+		ff = np.where((voc * isc) != 0, pmpp / np.abs(voc * isc), np.nan)
+
+	params = PVParameters(voc=voc, isc=isc, vmpp=vmpp, impp=impp, pmpp=pmpp, ff=ff)
+	if single:
+		return PVParameters(*(field[0] for field in params))
+	return params
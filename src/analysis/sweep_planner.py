@@ -0,0 +1,87 @@
+import numpy as np
+
+from numpy.typing import ArrayLike, NDArray
+from typing import NamedTuple, Optional
+
+from analysis.mpp import calc_pv_parameters
+from utils.constants import SOURCE_DELAY, MAX_LIST_POINTS
+
+
+class SweepPlan(NamedTuple):
+	levels: NDArray[np.float64]  # V, in execution order
+	delay: float  # s, source delay per point
+
+	@property
+	def duration(self) -> float:
+		return len(self.levels) * self.delay
+
+
+def points_for_budget(time_budget: float, min_delay: float, max_points: int) -> tuple[int, float]:
+	# As many points as the budget allows at min_delay, with the delay stretched to fill the budget once the list
+	# memory is full
+	n_points = int(np.clip(np.floor(time_budget / min_delay + 1e-9), 2, max_points))  # tolerate float division error
+	return n_points, max(min_delay, time_budget / n_points)
+
+
+def point_density(
+	grid: NDArray[np.float64], vmpp: float, voc: float, knee_width: float, uniform_fraction: float
+) -> NDArray[np.float64]:
+	# Mixture of a uniform floor and equal Gaussian bumps at Vmpp and Voc, normalised over the grid
+	span = grid[-1] - grid[0]
+	density = np.full_like(grid, uniform_fraction / span)
+	if not (np.isfinite(vmpp) and np.isfinite(voc) and voc > 0):
+		return density / np.trapezoid(density, grid)
+
+	sigma = knee_width * voc
+	bumps = np.exp(-0.5 * ((grid - vmpp) / sigma) ** 2) + np.exp(-0.5 * ((grid - voc) / sigma) ** 2)
+	density += (1 - uniform_fraction) * bumps / np.trapezoid(bumps, grid)
+	return density / np.trapezoid(density, grid)
+
+
+def plan_sweep(
+	iv_data_array: ArrayLike,
+	time_budget: float,
+	v_max: Optional[float] = None,
+	min_delay: float = SOURCE_DELAY,
+	max_points: int = MAX_LIST_POINTS,
+	uniform_fraction: float = 0.25,
+	knee_width: float = 0.05,
+	reverse: bool = True,
+) -> SweepPlan:
+	# Place list-sweep voltages from 0 to v_max so they crowd around the MPP knee and Voc of a previous or coarse
+	# [I, V] sweep, as many as points_for_budget allows. knee_width is the width of the crowded regions as a fraction
+	# of Voc.
+	data = np.asarray(iv_data_array, dtype=np.float64)
+	if not 0 <= uniform_fraction <= 1:
+		raise ValueError(f"uniform_fraction must lie between 0 and 1, got {uniform_fraction}.")
+	if v_max is None:
+		v_max = float(np.max(data[:, 1]))
+	if v_max <= 0:
+		raise ValueError(f"Sweep limit must be positive, got {v_max} V.")
+
+	n_points, delay = points_for_budget(time_budget, min_delay, max_points)
+
+	params = calc_pv_parameters(data)
+	grid = np.linspace(0.0, v_max, 2001)
+	density = point_density(grid, float(params.vmpp), float(params.voc), knee_width, uniform_fraction)
+
+	# inverse-transform the cumulative density so equal quantiles map to the voltage levels
+	cdf = np.concatenate(([0.0], np.cumsum(0.5 * (density[1:] + density[:-1]) * np.diff(grid))))
+	levels = np.interp(np.linspace(0.0, cdf[-1], n_points), cdf, grid)
+
+	return SweepPlan(levels=levels[::-1] if reverse else levels, delay=delay)
+
+
+def linear_plan(
+	v_max: float,
+	time_budget: float,
+	min_delay: float = SOURCE_DELAY,
+	max_points: int = MAX_LIST_POINTS,
+	reverse: bool = True,
+) -> SweepPlan:
+	# Evenly spaced levels, for curves without a knee to crowd around such as dark JV sweeps
+	if v_max <= 0:
+		raise ValueError(f"Sweep limit must be positive, got {v_max} V.")
+	n_points, delay = points_for_budget(time_budget, min_delay, max_points)
+	levels = np.linspace(0.0, v_max, n_points)
+	return SweepPlan(levels=levels[::-1] if reverse else levels, delay=delay)
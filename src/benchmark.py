@@ -0,0 +1,198 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+from pathlib import Path
+from typing import Any, Callable
+
+from numpy.typing import NDArray
+
+from controllers.interfaces import sourcemeterMode, sourcemeterOutput, sweepDirection
+from controllers.simulatedK2400 import SingleDiodeModel, simulatedK2400Controller
+from core.algorithms import trackingAlgorithm, create_tracking_algorithm
+from core.core import MaximumPowerPointTracker
+from utils.constants import CURRENT_COMPLIANCE, VOLTAGE_PROTECTION
+from utils.data_writer import StreamingDataWriter
+from utils.logger_config import LogLevel, setup_logger
+from utils.utils import calc_mpp_from_iv
+
+# Regression checks: higher is better for every metric listed here. Both are measured on the simulated clock, so they
+# compare across machines. Wall-clock throughput depends on the host and is only reported.
+COMPARED_METRICS = ["samples_per_s_simulated", "efficiency"]
+REPORTED_METRICS = ["samples_per_s_wall"]
+
+
+def parse_arguments(args: list[str]) -> argparse.Namespace:
+	parser = argparse.ArgumentParser(
+		description="Benchmark MPP tracking convergence and loop throughput against the simulated sourcemeter."
+	)
+	parser.add_argument(
+		"-a",
+		"--algorithms",
+		nargs="+",
+		default=[algorithm.value for algorithm in trackingAlgorithm],
+		choices=[algorithm.value for algorithm in trackingAlgorithm],
+		help="Tracking algorithms to benchmark.",
+	)
+	parser.add_argument("-t", "--tracking_time", type=float, default=600.0, help="Simulated tracking time in s.")
+	parser.add_argument("--area", type=float, default=0.1, help="Simulated device area in cm^2.")
+	parser.add_argument("--latency", type=float, default=0.005, help="Modelled GPIB latency per transaction in s.")
+	parser.add_argument("--noise", type=float, default=0.0, help="Relative current noise of the simulated device.")
+	parser.add_argument("--light_drift", type=float, default=0.0, help="Fractional Jsc drift per simulated hour.")
+	parser.add_argument(
+		"--start_offset", type=float, default=-0.2, help="Fractional offset of the starting voltage from the true Vmpp."
+	)
+	parser.add_argument("--calls", type=int, default=1000, help="Calls per operation for the latency benchmark.")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("-o", "--output", type=Path, help="Write results as JSON to this file as well as stdout.")
+	parser.add_argument(
+		"--compare",
+		type=Path,
+		help="Baseline results JSON. Exits with status 1 if simulated throughput or efficiency regresses by more than --tolerance.",
+	)
+	parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional regression, e.g. 0.2.")
+	return parser.parse_args(args)
+
+
+def make_sourcemeter(args: argparse.Namespace, latency: float) -> simulatedK2400Controller:
+	model = SingleDiodeModel(area_cm2=args.area, light_drift_per_hour=args.light_drift)
+	return simulatedK2400Controller(
+		resource="GPIB0::20::INSTR",  # type: ignore
+		voltage_protection=VOLTAGE_PROTECTION,
+		current_compliance=CURRENT_COMPLIANCE,
+		model=model,
+		latency=latency,
+		noise=args.noise,
+		seed=args.seed,
+	)
+
+
+def latency_stats(func: Callable[[], Any], calls: int) -> dict[str, float]:
+	durations = np.empty(calls)
+	for k in range(calls):
+		start = time.perf_counter_ns()
+		func()
+		durations[k] = time.perf_counter_ns() - start
+	durations /= 1e3  # us
+	return {
+		"calls": calls,
+		"mean_us": float(durations.mean()),
+		"p50_us": float(np.percentile(durations, 50)),
+		"p95_us": float(np.percentile(durations, 95)),
+		"p99_us": float(np.percentile(durations, 99)),
+	}
+
+
+def benchmark_latency(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+	# Python-side cost of each call, with the modelled GPIB latency switched off
+	sm = make_sourcemeter(args, latency=0.0)
+	sm.set_sm_output(
+		output=sourcemeterOutput.VOLTAGE, value=3.3, mode=sourcemeterMode.SWEEP, sweepdir=sweepDirection.REVERSE
+	)
+	sweep = sm.read_sweep()[:, :2]
+
+	return {
+		"set_sm_output": latency_stats(
+			lambda: sm.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=1.0, mode=sourcemeterMode.FIXED),
+			args.calls,
+		),
+		"read_output": latency_stats(sm.read_output, args.calls),
+		"set_and_read": latency_stats(lambda: sm.set_and_read(1.0), args.calls),
+		"calc_mpp_from_iv": latency_stats(lambda: calc_mpp_from_iv(sweep), max(args.calls // 10, 1)),
+	}
+
+
+def true_mpp_trace(model: SingleDiodeModel, t: NDArray[np.float64]) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+	# The true MPP only changes through drift, so solve it on a coarse time grid and interpolate
+	grid = np.linspace(t[0], t[-1], 25)
+	vmpp, pmpp = np.array([model.max_power_point(float(tk)) for tk in grid]).T
+	return np.interp(t, grid, vmpp), np.interp(t, grid, pmpp)
+
+
+def benchmark_tracking(args: argparse.Namespace, algorithm: trackingAlgorithm, directory: Path) -> dict[str, float]:
+	sm = make_sourcemeter(args, latency=args.latency)
+	path = directory / f"{algorithm.value}.npy"
+
+	with StreamingDataWriter(path) as writer:
+		mppt = MaximumPowerPointTracker(
+			sourcemeter=sm,
+			cell_area=args.area,
+			tracking_time=args.tracking_time,  # type: ignore
+			dummyMode=True,
+			algorithm=create_tracking_algorithm(algorithm),
+			data_writer=writer,
+			clock=lambda: sm.clock,
+		)
+		vmpp_true, _ = sm.model.max_power_point(0.0)
+		mppt.vmpp = mppt.v_set = vmpp_true * (1 + args.start_offset)
+		mppt.algorithm.reset(mppt.vmpp)
+
+		start = time.perf_counter()
+		steps = mppt.track()
+		wall = time.perf_counter() - start
+		sm.output_off()
+
+	data = np.load(path)
+	t = data["t"]
+	_, pmpp = true_mpp_trace(sm.model, t)
+	at_mpp = np.nonzero(data["p"] >= 0.995 * pmpp)[0]
+
+	return {
+		"steps": steps,
+		"samples_per_s_wall": steps / wall,
+		"samples_per_s_simulated": steps / float(t[-1] - t[0]),
+		"time_to_mpp_s": float(t[at_mpp[0]] - t[0]) if len(at_mpp) else float("nan"),
+		"efficiency": float(np.trapezoid(data["p"], t) / np.trapezoid(pmpp, t)),
+	}
+
+
+def compare(
+	results: dict[str, Any], baseline: dict[str, Any], tolerance: float, compared: list[str] = COMPARED_METRICS
+) -> list[str]:
+	regressions = []
+	for name, metrics in results["tracking"].items():
+		for metric in compared:
+			reference = baseline.get("tracking", {}).get(name, {}).get(metric)
+			if reference and metrics[metric] < (1 - tolerance) * reference:
+				regressions.append(f"{name}.{metric}: {metrics[metric]:.4g} < baseline {reference:.4g}")
+	return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+	args = parse_arguments(sys.argv[1:] if argv is None else argv)
+	setup_logger(level=LogLevel.WARNING)
+
+	results: dict[str, Any] = {
+		"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"python": platform.python_version(),
+		"numpy": np.__version__,
+		"config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+		"latency": benchmark_latency(args),
+		"tracking": {},
+	}
+	with tempfile.TemporaryDirectory() as directory:
+		for name in args.algorithms:
+			results["tracking"][name] = benchmark_tracking(args, trackingAlgorithm(name), Path(directory))
+
+	report = json.dumps(results, indent=2)
+	print(report)
+	if args.output:
+		args.output.write_text(report)
+
+	if args.compare:
+		baseline = json.loads(args.compare.read_text())
+		for slower in compare(results, baseline, args.tolerance, REPORTED_METRICS):
+			print(f"NOTE {slower} (machine dependent, not checked)", file=sys.stderr)
+		regressions = compare(results, baseline, args.tolerance)
+		for regression in regressions:
+			print(f"REGRESSION {regression}", file=sys.stderr)
+		return 1 if regressions else 0
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -1,11 +1,15 @@
+import time
+import numpy as np
 import pyvisa as visa
 
+from numpy.typing import NDArray
 from typing import Optional, cast, Sequence, Any
 from types import TracebackType
 
 from controllers.interfaces import (
 	SourcemeterContext,
 	SourcemeterController,
+	SourcemeterSample,
 	sourcemeterOutput,
 	sweepDirection,
 	sourcemeterMode,
@@ -13,7 +17,15 @@ from controllers.interfaces import (
 
 from utils.logger_config import setup_logger
 from utils.custom_exceptions import OutputLimitsExceededError
-from utils.constants import SWEEP_RATE
+from utils.constants import (
+	SWEEP_RATE,
+	SOURCE_DELAY,
+	MAX_BUFFER_POINTS,
+	MAX_LIST_POINTS,
+	RAMP_SLEW_RATE,
+	VOLTAGE_STEP,
+)
+from utils.utils import ramp_levels
 
 from pyvisa import VisaIOError
 from pyvisa.resources import GPIBInstrument, MessageBasedResource
@@ -22,11 +34,17 @@ from pyvisa.resources import GPIBInstrument, MessageBasedResource
 logger = setup_logger()
 
 
+def readings_to_ivt(readings: Sequence[float] | NDArray[np.float32]) -> NDArray[np.float64]:
+	# The K2400 sends its elements in the fixed order V, I, t whatever :format:elements lists, ASCII or binary.
+	# Rows are reordered to the [i, v, t] used everywhere else.
+	return np.reshape(np.asarray(readings, dtype=np.float64), (-1, 3))[:, [1, 0, 2]]
+
+
 class K2400Context(SourcemeterContext):
 	resource: Optional[GPIBInstrument]
 	address: str
 
-	def __init__(self, address: str):
+	def __init__(self, address: str, resource_manager: Optional[visa.ResourceManager] = None):
 		if address:
 			self.address = f"GPIB0::{address}::INSTR"
 		else:
@@ -34,17 +52,18 @@ class K2400Context(SourcemeterContext):
 				"Keithley GPIB connection could not be initiated without a provided GPIB address. Run mppPy.py -h for more information."
 			)
 		self.resource = None
+		self.resource_manager = resource_manager  # shared between channels in multi-channel runs
 
 	def __enter__(self) -> GPIBInstrument:
-		rm = visa.ResourceManager()
+		rm = self.resource_manager if self.resource_manager is not None else visa.ResourceManager()
 		try:
 			self.resource = cast(
 				GPIBInstrument, rm.open_resource(resource_name=self.address, timeout=60000, _read_termination="\n")
 			)
-			logger.info(f"Keithley acquired at address {self.address}.")
+			logger.info("Keithley acquired at address %s.", self.address)
 			return self.resource
 		except visa.VisaIOError as e:
-			logger.error(f"Keithley resource could not be acquired at address '{self.address}': {e}.")
+			logger.error("Keithley resource could not be acquired at address '%s': %s.", self.address, e)
 			raise
 
 	def __exit__(
@@ -57,10 +76,10 @@ class K2400Context(SourcemeterContext):
 			try:
 				self.resource.write(":output off")
 			except visa.VisaIOError as e:
-				logger.error(f"Error turning off Keithley output during exit: {e}.")
+				logger.error("Error turning off Keithley output during exit: %s.", e)
 			finally:
 				self.resource.close()
-			logger.info(f"Released Keithley at address {self.address}.")
+			logger.info("Released Keithley at address %s.", self.address)
 
 
 class K2400Controller(SourcemeterController):
@@ -70,6 +89,9 @@ class K2400Controller(SourcemeterController):
 		self.max_current: float = 0.288  # max needed for 5-cell
 		self._voltage_protection: float
 		self._current_compliance: float
+		self.sweep_points: int = 0
+		self.sweep_delay: float = SOURCE_DELAY
+		self._state: dict[str, Any] = {}  # shadow copy of the instrument settings last written
 
 		logger.info("Initialising sourcemeter.")
 
@@ -82,13 +104,26 @@ class K2400Controller(SourcemeterController):
 		logger.info("Sourcemeter initialised.")
 
 	def reset(self):
+		self.invalidate_state()
 		self.resource.write("*RST")
 		self.resource.write(":trace:clear")
 
+	def invalidate_state(self) -> None:
+		# Forget the shadow state so every setting is re-sent, used whenever the instrument state is unknown
+		self._state.clear()
+
+	def _write_setting(self, command: str, value: Any) -> None:
+		# Skip the GPIB transaction when the instrument already holds this value
+		if self._state.get(command) == value:
+			return
+		self._state.pop(command, None)
+		self.resource.write(f"{command} {value}")
+		self._state[command] = value
+
 	def set_voltage_protection(self, voltage_protection: float):
 		self.voltage_protection = voltage_protection
-		self.resource.write(f":sense:voltage:protection {self.voltage_protection}")
-		self.resource.write(f":sense:voltage:range {self.voltage_protection}")
+		self._write_setting(":sense:voltage:protection", self.voltage_protection)
+		self._write_setting(":sense:voltage:range", self.voltage_protection)
 
 	@property
 	def voltage_protection(self):
@@ -98,18 +133,18 @@ class K2400Controller(SourcemeterController):
 	def voltage_protection(self, voltage: float):
 		if voltage > self.max_voltage:
 			self._voltage_protection = self.max_voltage
-			logger.warning(f"Trying to set voltage protection too high. Limiting voltage to {self.max_voltage} V.")
+			logger.warning("Trying to set voltage protection too high. Limiting voltage to %s V.", self.max_voltage)
 		elif voltage <= 0:
 			self._voltage_protection = self.max_voltage
-			logger.warning(f"Trying to set voltage protection too low. Setting voltage limit to {self.max_voltage} V.")
+			logger.warning("Trying to set voltage protection too low. Setting voltage limit to %s V.", self.max_voltage)
 		else:
 			self._voltage_protection = voltage
-			logger.info(f"Setting voltage limit to {voltage} V.")
+			logger.info("Setting voltage limit to %s V.", voltage)
 
 	def set_current_compliance(self, current_compliance: float):
 		self.current_compliance = current_compliance
-		self.resource.write(f":sense:current:protection {self.current_compliance}")
-		self.resource.write(f":sense:current:range {self.current_compliance}")
+		self._write_setting(":sense:current:protection", self.current_compliance)
+		self._write_setting(":sense:current:range", self.current_compliance)
 
 	@property
 	def current_compliance(self):
@@ -120,20 +155,31 @@ class K2400Controller(SourcemeterController):
 		if current > self.max_current:
 			self._current_compliance = self.max_current
 			logger.warning(
-				f"Trying to set current protection too high. Limiting current compliance to {self.max_current} A."
+				"Trying to set current protection too high. Limiting current compliance to %s A.", self.max_current
 			)
 		elif current <= 0:
 			self._current_compliance = self.max_current
 			logger.warning(
-				f"Trying to set current protection too low. Setting current compliance to {self.max_current} V."
+				"Trying to set current protection too low. Setting current compliance to %s V.", self.max_current
 			)
 		else:
 			self._current_compliance = current
-			logger.info(f"Setting current compliance to {current} V.")
+			logger.info("Setting current compliance to %s V.", current)
 
 	def configure_data_output(self):
 		self.resource.write(":format:elements voltage,current,time")
 
+	def check_output_limits(self, output: sourcemeterOutput, value: float) -> None:
+		if str(output.value) == "current":
+			max_value = self.current_compliance
+		else:
+			max_value = self.voltage_protection
+
+		if not (0 <= value <= max_value):
+			raise OutputLimitsExceededError(
+				f"Attempted to set {output.value} to {value} which exceeds maximum safe value of {max_value}."
+			)
+
 	def set_sm_output(
 		self,
 		output: sourcemeterOutput,
@@ -142,58 +188,209 @@ class K2400Controller(SourcemeterController):
 		sweepdir: sweepDirection = sweepDirection.FORWARD,
 		sweep_rate: float = SWEEP_RATE,
 	):
-		if str(output.value) == "current":
-			max_value = self.current_compliance
-		else:
-			max_value = self.voltage_protection
-
 		try:
-			if not (0 <= value <= max_value):
-				raise OutputLimitsExceededError(
-					f"Attempted to set {output.value} to {value} which exceeds maximum safe value of {max_value}."
-				)
-
-			elif str(mode.value) == "sweep":
-				self.resource.write(f":source:function {output.value}")
-				self.resource.write(f":source:{output.value}:mode {mode.value}")
-				self.resource.write(":source:sweep:spacing linear")
-				self.resource.write(":source:delay 0.05")  # Settling time in seconds
+			self.check_output_limits(output, value)
 
-				nPoints = value / (0.05 * sweep_rate)  # voltage (V) / (delay (S) * sweep_rate (V/s))
+			if str(mode.value) == "list":
+				raise ValueError("List mode needs a sequence of levels, use set_sm_list().")
 
-				self.resource.write(f":trigger:count {nPoints}")
-				self.resource.write(f":source:sweep:points {nPoints}")
+			elif str(mode.value) == "sweep":
+				self._write_setting(":source:function", output.value)
+				self._write_setting(f":source:{output.value}:mode", mode.value)
+				self._write_setting(":source:sweep:spacing", "linear")
+				self._write_setting(":source:delay", SOURCE_DELAY)
+
+				nPoints = round(value / (SOURCE_DELAY * sweep_rate))  # voltage (V) / (delay (S) * sweep_rate (V/s))
+				if nPoints > MAX_BUFFER_POINTS:
+					logger.warning(
+						"Sweep of %s points exceeds the trace buffer, limiting to %s points.",
+						nPoints,
+						MAX_BUFFER_POINTS,
+					)
+					nPoints = MAX_BUFFER_POINTS
+				nPoints = max(nPoints, 2)
+				self.sweep_points = nPoints
+				self.sweep_delay = SOURCE_DELAY
+
+				self._write_setting(":trigger:count", nPoints)
+				self._write_setting(":source:sweep:points", nPoints)
 
 				if sweepdir == sweepDirection.FORWARD:
-					self.resource.write(f":source:{output.value}:start 0.0")
-					self.resource.write(f":source:{output.value}:stop {value}")
-					logger.info(f"Sweeping {output.value} value from 0 to {value}.")
+					self._write_setting(f":source:{output.value}:start", 0.0)
+					self._write_setting(f":source:{output.value}:stop", value)
+					logger.info("Sweeping %s value from 0 to %s.", output.value, value)
 
-					self.resource.write(f":source:{output.value} {value}")
-					self.resource.write(":output on")
+					self._write_setting(f":source:{output.value}", value)
+					self._write_setting(":output", "on")
 
 				elif sweepdir == sweepDirection.REVERSE:
-					self.resource.write(f":source:{output.value}:start {value}")
-					self.resource.write(f":source:{output.value}:stop 0.0")
-					logger.info(f"Sweeping {output.value} value from {value} to 0.")
+					self._write_setting(f":source:{output.value}:start", value)
+					self._write_setting(f":source:{output.value}:stop", 0.0)
+					logger.info("Sweeping %s value from %s to 0.", output.value, value)
 
-					self.resource.write(f":source:{output.value} {value}")
-					self.resource.write(":output on")
+					self._write_setting(f":source:{output.value}", value)
+					self._write_setting(":output", "on")
 
 			else:
-				self.resource.write(f":source:function {output.value}")
-				self.resource.write(f":source:{output.value}:mode {mode.value}")
-				self.resource.write(f":source:{output.value} {value}")
-				self.resource.write(":output on")
+				# After a warm-up only the level changes, so a tracking step costs a single write
+				self._write_setting(":source:function", output.value)
+				self._write_setting(f":source:{output.value}:mode", mode.value)
+				self._write_setting(":trigger:count", 1)  # a sweep leaves the trigger count at its point count
+				self._write_setting(":trigger:delay", 0.0)  # and a ramp its step delay
+				self._write_setting(f":source:{output.value}", value)
+				self._write_setting(":output", "on")
 
 		except OutputLimitsExceededError as e:
 			raise e
 		except VisaIOError as e:
+			self.invalidate_state()
+			raise e
+
+	def set_sm_list(self, output: sourcemeterOutput, levels: Sequence[float], delay: float = SOURCE_DELAY):
+		# Upload an arbitrary sequence of levels to run as one triggered acquisition, fetched with read_sweep()
+		if not 2 <= len(levels) <= MAX_LIST_POINTS:
+			raise ValueError(f"Source list must hold between 2 and {MAX_LIST_POINTS} points, got {len(levels)}.")
+
+		try:
+			for level in levels:
+				self.check_output_limits(output, float(level))
+
+			self._write_setting(":source:function", output.value)
+			self._write_setting(f":source:{output.value}:mode", sourcemeterMode.LIST.value)
+			self._write_setting(":source:delay", delay)
+			self._write_setting(f":source:list:{output.value}", ",".join(f"{float(level):.6g}" for level in levels))
+			self._write_setting(":trigger:count", len(levels))
+			self._write_setting(":output", "on")
+			logger.info("Armed %s list of %s points from %s to %s.", output.value, len(levels), levels[0], levels[-1])
+
+		except VisaIOError as e:
+			self.invalidate_state()
 			raise e
 
+		self.sweep_points = len(levels)
+		self.sweep_delay = delay
+
+	def output_level(self, output: sourcemeterOutput) -> float:
+		# Level the output sits at now, 0 when it is off or sourcing the other function. Known settings come from the
+		# shadow state, anything else is asked of the instrument.
+		state = (
+			self._state.get(":output"),
+			self._state.get(":source:function"),
+			self._state.get(f":source:{output.value}"),
+		)
+		if None in state:
+			try:
+				state = (
+					"on" if int(float(self.resource.query(":output?"))) else "off",
+					"voltage"
+					if self.resource.query(":source:function?").strip().lower().startswith("volt")
+					else "current",
+					float(self.resource.query(f":source:{output.value}?")),
+				)
+			except VisaIOError:
+				self.invalidate_state()
+				raise
+		on, function, level = state
+		return float(level) if on == "on" and function == output.value else 0.0
+
+	def ramp_output(
+		self,
+		target: float,
+		output: sourcemeterOutput = sourcemeterOutput.VOLTAGE,
+		slew_rate: float = RAMP_SLEW_RATE,
+		max_step: float = VOLTAGE_STEP,
+	) -> None:
+		# Move the output from its present level to target as a staircase of fixed levels. Each step is a level write
+		# and a READ? that the trigger delay holds for the step time on the instrument clock, so GPIB and Python
+		# timing can only slow the ramp. A sweep would not do, the K2400 returns to the bias level when it ends.
+		# Both ends are checked up front, every level lies between. The output is left at target, ready for
+		# set_and_read.
+		start = self.output_level(output)
+		self.check_output_limits(output, start)
+		self.check_output_limits(output, target)
+		levels, delay = ramp_levels(start, target, slew_rate, max_step)
+		self.set_sm_output(output=output, value=start, mode=sourcemeterMode.FIXED)
+		if start == target:
+			return
+
+		logger.info("Ramping %s from %s to %s in %s steps of %.3g s.", output.value, start, target, len(levels), delay)
+		try:
+			# The trigger delay alone sets the step time, a source delay left by a sweep would add to every step.
+			# It is put back afterwards, tracking settles on it.
+			source_delay = self._state.get(":source:delay")
+			if source_delay is None:
+				source_delay = float(self.resource.query(":source:delay?"))
+			self._write_setting(":source:delay", 0.0)
+			self._write_setting(":trigger:delay", delay)
+			for level in levels[1:]:
+				self._state.pop(f":source:{output.value}", None)
+				self._query_sample(f":source:{output.value} {float(level)};:READ?")
+				self._state[f":source:{output.value}"] = float(level)
+			self._write_setting(":source:delay", source_delay)
+			self._write_setting(":trigger:delay", 0.0)
+		except VisaIOError:
+			self.invalidate_state()
+			raise
+
+	def _query_sample(self, message: str) -> SourcemeterSample:
+		# Host timestamp taken halfway through the transaction. Any constant lag of the instrument reading behind it
+		# ends up in the clock offset estimate and so does not distort the merged timeline.
+		start = time.perf_counter_ns()
+		try:
+			i, v, t = readings_to_ivt(self.resource.query_ascii_values(message=message))[0]  # type: ignore
+		except VisaIOError:
+			self.invalidate_state()
+			raise
+		return SourcemeterSample(float(i), float(v), float(t), (start + time.perf_counter_ns()) // 2)
+
 	def read_output(self) -> Sequence[Any]:
-		i, v, t = self.resource.query_ascii_values(message="READ?")  # type: ignore
-		return [i, v, t]
+		return list(self._query_sample("READ?")[:3])
+
+	def set_and_read(self, value: float, output: sourcemeterOutput = sourcemeterOutput.VOLTAGE) -> SourcemeterSample:
+		# Tracking step as one round trip: the new level and READ? go out as a single compound message
+		armed = (
+			self._state.get(":source:function") == output.value
+			and self._state.get(f":source:{output.value}:mode") == sourcemeterMode.FIXED.value
+			and self._state.get(":trigger:count") == 1
+			and self._state.get(":output") == "on"
+		)
+		if not armed or self._state.get(f":source:{output.value}") == value:
+			self.set_sm_output(output=output, value=value, mode=sourcemeterMode.FIXED)
+			return self._query_sample("READ?")
+
+		self.check_output_limits(output, value)
+		self._state.pop(f":source:{output.value}", None)
+		sample = self._query_sample(f":source:{output.value} {value};:READ?")
+		self._state[f":source:{output.value}"] = value
+		return sample
+
+	def read_sweep(self) -> NDArray[np.float64]:
+		# Buffer the armed sweep in the trace and fetch it as one little-endian float32 block
+		self.resource.write(":format:data real,32")
+		self.resource.write(":format:border swapped")
+		self.resource.write(f":trace:points {self.sweep_points}")
+		self.resource.write(":trace:feed sense")
+		self.resource.write(":trace:feed:control next")
+		self.resource.write(":initiate")
+
+		time.sleep(self.sweep_points * self.sweep_delay)  # avoid the *OPC? query outliving the VISA timeout
+		self.resource.query("*OPC?")
+
+		try:
+			data = self.resource.query_binary_values(
+				":trace:data?", datatype="f", is_big_endian=False, container=np.array
+			)
+		except VisaIOError:
+			self.invalidate_state()
+			raise
+		finally:
+			self.resource.write(":trace:clear")
+			self.resource.write(":format:data ascii")
+
+		return readings_to_ivt(data)
 
 	def output_off(self) -> None:
+		# Always sent, the shadow state must never stop the output being switched off
+		self._state.pop(":output", None)
 		self.resource.write(":output off")
+		self._state[":output"] = "off"
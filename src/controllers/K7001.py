@@ -0,0 +1,78 @@
+import time
+import pyvisa as visa
+
+from typing import Optional, Sequence, cast
+from types import TracebackType
+
+from controllers.interfaces import SwitchController
+from utils.logger_config import setup_logger
+from utils.constants import SWITCH_SETTLING_TIME
+
+from pyvisa.resources import GPIBInstrument, MessageBasedResource
+
+logger = setup_logger()
+
+
+class K7001Context:
+	resource: Optional[GPIBInstrument]
+	address: str
+
+	def __init__(self, address: str, resource_manager: Optional[visa.ResourceManager] = None):
+		if not address:
+			raise ValueError("Switch GPIB connection could not be initiated without a provided GPIB address.")
+		self.address = f"GPIB0::{address}::INSTR"
+		self.resource = None
+		self.resource_manager = resource_manager
+
+	def __enter__(self) -> GPIBInstrument:
+		rm = self.resource_manager if self.resource_manager is not None else visa.ResourceManager()
+		try:
+			self.resource = cast(
+				GPIBInstrument, rm.open_resource(resource_name=self.address, timeout=10000, _read_termination="\n")
+			)
+			logger.info("Switch acquired at address %s.", self.address)
+			return self.resource
+		except visa.VisaIOError as e:
+			logger.error("Switch resource could not be acquired at address '%s': %s.", self.address, e)
+			raise
+
+	def __exit__(
+		self,
+		exc_type: type[BaseException] | None,
+		exc_val: BaseException | None,
+		exc_tb: TracebackType | None,
+	) -> None:
+		if self.resource:
+			try:
+				self.resource.write(":open all")
+			except visa.VisaIOError as e:
+				logger.error("Error opening switch channels during exit: %s.", e)
+			finally:
+				self.resource.close()
+			logger.info("Released switch at address %s.", self.address)
+
+
+class K7001Switch(SwitchController):
+	# Keithley 7001/7002 switch mainframe, channels given in its card!channel notation, e.g. 1!3
+	def __init__(
+		self, resource: MessageBasedResource, channels: Sequence[str], settling_time: float = SWITCH_SETTLING_TIME
+	):
+		super().__init__(channels, settling_time)
+		self.resource: MessageBasedResource = resource
+		self.resource.write(":open all")
+
+	def select(self, channel: str) -> None:
+		if channel not in self.channels:
+			raise ValueError(f"Switch channel {channel} is not one of the configured channels {self.channels}.")
+		if channel == self.selected:
+			return
+
+		# one message, so the previous channel is always open before the next one closes
+		self.resource.write(f":open all;:close (@{channel})")
+		self.resource.query("*OPC?")
+		time.sleep(self.settling_time)
+		self.selected = channel
+
+	def disconnect(self) -> None:
+		self.resource.write(":open all")
+		self.selected = None
@@ -1,9 +1,15 @@
-from typing import Optional, Sequence, Any, cast
+import time
+import logging
+import numpy as np
+
+from numpy.typing import NDArray
+from typing import TYPE_CHECKING, Optional, Sequence, Any, cast
 from types import TracebackType
 
 from controllers.interfaces import (
 	SourcemeterContext,
 	SourcemeterController,
+	SourcemeterSample,
 	sourcemeterOutput,
 	sourcemeterMode,
 	sweepDirection,
@@ -11,15 +17,24 @@ from controllers.interfaces import (
 
 from utils.logger_config import setup_logger
 from utils.custom_exceptions import OutputLimitsExceededError
-from utils.constants import SWEEP_RATE
+from utils.constants import (
+	SWEEP_RATE,
+	SOURCE_DELAY,
+	MAX_BUFFER_POINTS,
+	MAX_LIST_POINTS,
+	RAMP_SLEW_RATE,
+	VOLTAGE_STEP,
+)
+from utils.utils import ramp_levels
 
-from pyvisa.resources import GPIBInstrument
+if TYPE_CHECKING:
+	from pyvisa.resources import GPIBInstrument
 
 logger = setup_logger()
 
 
 class dummyK2400Context(SourcemeterContext):
-	def __init__(self, address: Optional[str]):
+	def __init__(self, address: Optional[str], resource_manager: Optional[Any] = None):
 		if address:
 			self.address = "GPIB0::" + address + "::INSTR"
 		else:
@@ -27,11 +42,12 @@ class dummyK2400Context(SourcemeterContext):
 				"Keithley GPIB connection could not be initiated without a provided GPIB address. Run mppPy.py -h for more information."
 			)
 		self.resource = None
+		self.resource_manager = resource_manager
 
-	def __enter__(self) -> GPIBInstrument:
-		logger.info(f"Keithley acquired at address {self.address}.")
+	def __enter__(self) -> "GPIBInstrument":
+		logger.info("Keithley acquired at address %s.", self.address)
 		self.resource = self.address
-		self.resource = cast(GPIBInstrument, self.resource)
+		self.resource = cast("GPIBInstrument", self.resource)
 		return self.resource
 
 	def __exit__(
@@ -40,15 +56,16 @@ class dummyK2400Context(SourcemeterContext):
 		exc_val: BaseException | None,
 		exc_tb: TracebackType | None,
 	) -> None:
-		logger.info(f"Released Keithley at address {self.address}.")
+		logger.info("Released Keithley at address %s.", self.address)
 
 
 class dummyK2400Controller(SourcemeterController):
-	def __init__(self, resource: GPIBInstrument, voltage_protection: float, current_compliance: float):
+	def __init__(self, resource: "GPIBInstrument", voltage_protection: float, current_compliance: float):
 		self.max_voltage: float = 6  # max needed for 5-cell
 		self.max_current: float = 0.288  # max needed for 5-cell
 		self._voltage_protection: float
 		self._current_compliance: float
+		self.sweep_points: int = 0
 
 		logger.info("Initialising dummy sourcemeter.")
 
@@ -73,13 +90,13 @@ class dummyK2400Controller(SourcemeterController):
 	def voltage_protection(self, voltage: float):
 		if voltage > self.max_voltage:
 			self._voltage_protection = self.max_voltage
-			logger.warning(f"Trying to set voltage protection too high. Limiting voltage to {self.max_voltage} V.")
+			logger.warning("Trying to set voltage protection too high. Limiting voltage to %s V.", self.max_voltage)
 		elif voltage <= 0:
 			self._voltage_protection = self.max_voltage
-			logger.warning(f"Trying to set voltage protection too low. Setting voltage limit to {self.max_voltage} V.")
+			logger.warning("Trying to set voltage protection too low. Setting voltage limit to %s V.", self.max_voltage)
 		else:
 			self._voltage_protection = voltage
-			logger.info(f"Setting voltage limit to {voltage} V.")
+			logger.info("Setting voltage limit to %s V.", voltage)
 
 	def set_current_compliance(self, current_compliance: float):
 		self.current_compliance = current_compliance
@@ -93,16 +110,16 @@ class dummyK2400Controller(SourcemeterController):
 		if current > self.max_current:
 			self._current_compliance = self.max_current
 			logger.warning(
-				f"Trying to set current protection too high. Limiting current compliance to {self.max_current} A."
+				"Trying to set current protection too high. Limiting current compliance to %s A.", self.max_current
 			)
 		elif current <= 0:
 			self._current_compliance = self.max_current
 			logger.warning(
-				f"Trying to set current protection too low. Setting current compliance to {self.max_current} V."
+				"Trying to set current protection too low. Setting current compliance to %s V.", self.max_current
 			)
 		else:
 			self._current_compliance = current
-			logger.info(f"Setting current compliance to {current} V.")
+			logger.info("Setting current compliance to %s V.", current)
 
 	def configure_data_output(self):
 		logger.info("Sourcemeter set to output current, voltage, time.")
@@ -126,44 +143,99 @@ class dummyK2400Controller(SourcemeterController):
 					f"Attempted to set {output.value} to {value} which exceeds maximum safe value of {max_value}."
 				)
 
+			elif str(mode.value) == "list":
+				raise ValueError("List mode needs a sequence of levels, use set_sm_list().")
+
 			elif str(mode.value) == "sweep":
-				logger.debug(f":source:function {output.value}")
-				logger.debug(f":source:{output.value}:mode {mode.value}")
+				logger.debug(":source:function %s", output.value)
+				logger.debug(":source:%s:mode %s", output.value, mode.value)
 				logger.debug(":source:sweep:spacing linear")
-				logger.debug(":source:delay 0.05")  # Settling time in seconds
+				logger.debug(":source:delay %s", SOURCE_DELAY)
 
-				nPoints = value / (0.05 * sweep_rate)  # voltage (V) / (delay (S) * sweep_rate (V/s))
+				nPoints = round(value / (SOURCE_DELAY * sweep_rate))  # voltage (V) / (delay (S) * sweep_rate (V/s))
+				nPoints = max(min(nPoints, MAX_BUFFER_POINTS), 2)
+				self.sweep_points = nPoints
 
-				logger.debug(f":trigger:count {nPoints}")
-				logger.debug(f":source:sweep:points {nPoints}")
+				logger.debug(":trigger:count %s", nPoints)
+				logger.debug(":source:sweep:points %s", nPoints)
 
 				if sweepdir == sweepDirection.FORWARD:
-					logger.debug(f":source:{output.value}:start 0.0")
-					logger.debug(f":source:{output.value}:stop {value}")
-					logger.info(f"Sweeping {output.value} value from 0 to {value}.")
-					logger.debug(f":source:{output.value} {value}")
+					logger.debug(":source:%s:start 0.0", output.value)
+					logger.debug(":source:%s:stop %s", output.value, value)
+					logger.info("Sweeping %s value from 0 to %s.", output.value, value)
+					logger.debug(":source:%s %s", output.value, value)
 					logger.debug(":output on")
 
 				elif sweepdir == sweepDirection.REVERSE:
-					logger.debug(f":source:{output.value}:start {value}")
-					logger.debug(f":source:{output.value}:stop 0.0")
-					logger.info(f"Sweeping {output.value} value from {value} to 0.")
-					logger.debug(f":source:{output.value} {value}")
+					logger.debug(":source:%s:start %s", output.value, value)
+					logger.debug(":source:%s:stop 0.0", output.value)
+					logger.info("Sweeping %s value from %s to 0.", output.value, value)
+					logger.debug(":source:%s %s", output.value, value)
 					logger.debug(":output on")
 
 			else:
-				logger.debug(f":source:function {output.value}")
-				logger.debug(f":source:{output.value}:mode {mode.value}")
-				logger.debug(f":source:{output.value} {value}")
+				logger.debug(":source:function %s", output.value)
+				logger.debug(":source:%s:mode %s", output.value, mode.value)
+				logger.debug(":source:%s %s", output.value, value)
 				logger.debug(":output on")
 
 		except OutputLimitsExceededError as e:
 			raise e
 
+	def set_sm_list(self, output: sourcemeterOutput, levels: Sequence[float], delay: float = SOURCE_DELAY):
+		if not 2 <= len(levels) <= MAX_LIST_POINTS:
+			raise ValueError(f"Source list must hold between 2 and {MAX_LIST_POINTS} points, got {len(levels)}.")
+
+		max_value = self.current_compliance if str(output.value) == "current" else self.voltage_protection
+		for level in levels:
+			if not (0 <= level <= max_value):
+				raise OutputLimitsExceededError(
+					f"Attempted to set {output.value} to {level} which exceeds maximum safe value of {max_value}."
+				)
+
+		logger.debug(":source:function %s", output.value)
+		logger.debug(":source:%s:mode list", output.value)
+		logger.debug(":source:delay %s", delay)
+		if logger.isEnabledFor(logging.DEBUG):  # the level list is only joined when it will be shown
+			logger.debug(":source:list:%s %s", output.value, ",".join(f"{float(level):.6g}" for level in levels))
+		logger.debug(":trigger:count %s", len(levels))
+		logger.debug(":output on")
+		self.sweep_points = len(levels)
+
 	def read_output(self) -> Sequence[Any]:
-		logger.info("Beep boop, reading current, voltage, time.")
+		logger.debug("Beep boop, reading current, voltage, time.")
 		return [0.004, 0.96, 1.0]
 
+	def set_and_read(self, value: float, output: sourcemeterOutput = sourcemeterOutput.VOLTAGE) -> SourcemeterSample:
+		self.set_sm_output(output=output, value=value, mode=sourcemeterMode.FIXED)
+		return SourcemeterSample(*self.read_output(), self.host_time_ns())
+
+	def host_time_ns(self) -> int:
+		return time.perf_counter_ns()
+
+	def read_sweep(self) -> NDArray[np.float64]:
+		logger.info("Beep boop, fetching %s buffered sweep points.", self.sweep_points)
+		return np.tile([0.004, 0.96, 1.0], (self.sweep_points, 1))
+
+	def ramp_output(
+		self,
+		target: float,
+		output: sourcemeterOutput = sourcemeterOutput.VOLTAGE,
+		slew_rate: float = RAMP_SLEW_RATE,
+		max_step: float = VOLTAGE_STEP,
+	) -> None:
+		max_value = self.current_compliance if str(output.value) == "current" else self.voltage_protection
+		if not (0 <= target <= max_value):
+			raise OutputLimitsExceededError(
+				f"Attempted to set {output.value} to {target} which exceeds maximum safe value of {max_value}."
+			)
+
+		levels, delay = ramp_levels(0.0, target, slew_rate, max_step)
+		logger.debug(":trigger:delay %s", delay)
+		logger.debug(":source:%s <level>;:READ? for %s levels", output.value, len(levels) - 1)
+		logger.info("Beep boop, ramping %s to %s in %s steps of %.3g s.", output.value, target, len(levels), delay)
+		self.set_sm_output(output=output, value=target, mode=sourcemeterMode.FIXED)
+
 	def output_off(self) -> None:
 		logger.info(":output off")
 
@@ -1,5 +1,7 @@
+import time
+
 from utils.logger_config import setup_logger
-from controllers.interfaces import ShutterContext
+from controllers.interfaces import ShutterContext, ShutterEvent
 from types import TracebackType
 
 logger = setup_logger()
@@ -9,11 +11,13 @@ class dummyShutter(ShutterContext):
 	def __init__(self, enabled: bool = True) -> None:
 		self.enabled = enabled
 		self.task: bool
+		self.timeline: list[ShutterEvent] = []
 
 	def __enter__(self) -> None:
 		if self.enabled:
 			logger.info("Shutter opened.")
 			self.task = True
+			self._record(True)
 		else:
 			logger.info("Shutter control is disabled.")
 			self.task = False
@@ -25,6 +29,28 @@ class dummyShutter(ShutterContext):
 		exc_tb: TracebackType | None,
 	) -> None:
 		if self.task:
+			self._record(False)
 			logger.info("Closed shutter.")
 		else:
 			logger.info("Shutter control exited.")
+
+	def _record(self, state: bool, host_ns: int | None = None) -> ShutterEvent:
+		event = ShutterEvent(time.perf_counter_ns() if host_ns is None else host_ns, state)
+		self.timeline.append(event)
+		return event
+
+	def open(self) -> ShutterEvent:
+		logger.debug("Beep boop, shutter opened.")
+		return self._record(True)
+
+	def close(self) -> ShutterEvent:
+		logger.debug("Beep boop, shutter closed.")
+		return self._record(False)
+
+	def pulse(self, duration: float) -> tuple[ShutterEvent, ShutterEvent]:
+		logger.debug("Beep boop, shutter pulsed for %s s.", duration)
+		opened = self._record(True)
+		return opened, self._record(False, opened.host_ns + round(duration * 1e9))
+
+	def wait(self) -> None:
+		pass
@@ -0,0 +1,170 @@
+import json
+import math
+import time
+import numpy as np
+
+from pathlib import Path
+from typing import Any, Callable
+
+from numpy.typing import NDArray
+
+from controllers.interfaces import SourcemeterController
+from utils.logger_config import setup_logger
+
+logger = setup_logger()
+
+# Log-spaced latency bins from 1 us to 100 s, 20 per decade (about 12 % wide)
+HISTOGRAM_MIN_EXPONENT = -6
+HISTOGRAM_DECADES = 8
+HISTOGRAM_BINS_PER_DECADE = 20
+
+INSTRUMENTED_OPERATIONS = (
+	"set_sm_output",
+	"set_sm_list",
+	"ramp_output",
+	"read_output",
+	"set_and_read",
+	"read_sweep",
+	"output_off",
+)
+TIMED_RESOURCE_CALLS = ("write", "read", "query", "query_ascii_values", "query_binary_values")
+
+
+def scpi_header(message: str) -> str:
+	# Group commands by header, ':source:voltage 0.51;:READ?' is recorded as ':source:voltage;:READ?'
+	return ";".join(part.strip().split(" ", 1)[0] for part in message.split(";"))
+
+
+class LatencyHistogram:
+	# Fixed log-spaced histogram, so recording is a couple of float operations and memory never grows with run length
+	def __init__(self):
+		self.counts: NDArray[np.int64] = np.zeros(HISTOGRAM_DECADES * HISTOGRAM_BINS_PER_DECADE, dtype=np.int64)
+		self.count: int = 0
+		self.total: float = 0.0
+		self.min: float = math.inf
+		self.max: float = 0.0
+
+	def record(self, seconds: float) -> None:
+		exponent = math.log10(seconds) if seconds > 0 else HISTOGRAM_MIN_EXPONENT
+		index = int((exponent - HISTOGRAM_MIN_EXPONENT) * HISTOGRAM_BINS_PER_DECADE)
+		self.counts[min(max(index, 0), len(self.counts) - 1)] += 1
+		self.count += 1
+		self.total += seconds
+		self.min = min(self.min, seconds)
+		self.max = max(self.max, seconds)
+
+	def percentile(self, q: float) -> float:
+		# Geometric centre of the bin holding the q-th percentile, kept within the recorded range, in s
+		if not self.count:
+			return math.nan
+		index = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.count))
+		centre = 10 ** (HISTOGRAM_MIN_EXPONENT + (index + 0.5) / HISTOGRAM_BINS_PER_DECADE)
+		return min(max(centre, self.min), self.max)
+
+	def summary(self) -> dict[str, float]:
+		return {
+			"count": self.count,
+			"mean_us": 1e6 * self.total / self.count if self.count else math.nan,
+			"p50_us": 1e6 * self.percentile(50),
+			"p95_us": 1e6 * self.percentile(95),
+			"p99_us": 1e6 * self.percentile(99),
+			"max_us": 1e6 * self.max,
+		}
+
+
+class LatencyRecorder:
+	# Histograms by name for one controller. Not locked: every channel records from its own acquisition thread.
+	def __init__(self):
+		self.histograms: dict[str, LatencyHistogram] = {}
+		self.io_time: float = 0.0  # running total of time spent inside timed resource calls
+
+	def record(self, name: str, seconds: float) -> None:
+		histogram = self.histograms.get(name)
+		if histogram is None:
+			histogram = self.histograms[name] = LatencyHistogram()
+		histogram.record(seconds)
+
+	def summary(self) -> dict[str, dict[str, float]]:
+		return {name: self.histograms[name].summary() for name in sorted(self.histograms)}
+
+	def log_summary(self) -> None:
+		for name, stats in self.summary().items():
+			logger.info(
+				"%s: %s calls, p50 %.0f us, p95 %.0f us, p99 %.0f us, max %.0f us.",
+				name,
+				stats["count"],
+				stats["p50_us"],
+				stats["p95_us"],
+				stats["p99_us"],
+				stats["max_us"],
+			)
+
+	def dump(self, path: str | Path) -> None:
+		Path(path).write_text(json.dumps(self.summary(), indent=2))
+		logger.info("Timing summary written to %s.", path)
+
+	def report(self, path: str | Path | None = None) -> None:
+		self.log_summary()
+		if path is not None:
+			self.dump(path)
+
+
+class InstrumentedResource:
+	# Stands in for the VISA resource of a controller and times every transaction under 'scpi <header>'.
+	# Anything else is passed straight through.
+	def __init__(self, resource: Any, recorder: LatencyRecorder):
+		self._resource = resource
+		self._recorder = recorder
+		for name in TIMED_RESOURCE_CALLS:
+			if hasattr(resource, name):
+				setattr(self, name, self._timed(getattr(resource, name), name))
+
+	def _timed(self, call: Callable[..., Any], name: str) -> Callable[..., Any]:
+		def timed(*args: Any, **kwargs: Any) -> Any:
+			message = args[0] if args else kwargs.get("message", name)
+			start = time.perf_counter()
+			try:
+				return call(*args, **kwargs)
+			finally:
+				elapsed = time.perf_counter() - start
+				self._recorder.io_time += elapsed
+				self._recorder.record(f"scpi {scpi_header(message)}", elapsed)
+
+		return timed
+
+	def __getattr__(self, name: str) -> Any:
+		return getattr(self._resource, name)
+
+
+def instrument_controller(sm: SourcemeterController, recorder: LatencyRecorder | None = None) -> LatencyRecorder:
+	# Opt-in timing of a controller in place: each operation is recorded under 'op <name>' and the part of it not
+	# spent in resource calls under 'python <name>', which separates GPIB and settling time from our own overhead
+	recorder = recorder if recorder is not None else LatencyRecorder()
+	has_resource = not isinstance(getattr(sm, "resource", None), (str, type(None)))
+	if has_resource:
+		sm.resource = InstrumentedResource(sm.resource, recorder)  # type: ignore
+	else:
+		logger.info("Sourcemeter has no VISA resource, timing operations only.")
+
+	for name in INSTRUMENTED_OPERATIONS:
+		operation = getattr(sm, name, None)
+		if operation is not None:
+			setattr(sm, name, _timed_operation(operation, name, recorder, has_resource))
+	return recorder
+
+
+def _timed_operation(
+	operation: Callable[..., Any], name: str, recorder: LatencyRecorder, split_overhead: bool
+) -> Callable[..., Any]:
+	def timed(*args: Any, **kwargs: Any) -> Any:
+		io_start = recorder.io_time
+		start = time.perf_counter()
+		try:
+			return operation(*args, **kwargs)
+		finally:
+			elapsed = time.perf_counter() - start
+			recorder.record(f"op {name}", elapsed)
+			if split_overhead:
+				recorder.record(f"python {name}", max(elapsed - (recorder.io_time - io_start), 0.0))
+
+	return timed
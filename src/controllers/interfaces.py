@@ -2,10 +2,14 @@ from abc import ABC, abstractmethod
 from enum import Enum
 from types import TracebackType
 
-from pyvisa.resources import MessageBasedResource
-from typing import Optional, Sequence, Any
+import numpy as np
+from numpy.typing import NDArray
+from typing import TYPE_CHECKING, NamedTuple, Optional, Sequence, Any
 
-from nidaqmx import Task  # type: ignore
+if TYPE_CHECKING:
+	# only for annotations, so the simulated controllers run without pyvisa or the NI-DAQmx runtime installed
+	from pyvisa.resources import MessageBasedResource
+	from nidaqmx import Task  # type: ignore
 
 
 class sourcemeterOutput(Enum):
@@ -25,6 +29,18 @@ class sourcemeterMode(Enum):
 	LIST = "list"
 
 
+class SourcemeterSample(NamedTuple):
+	current: float  # A
+	voltage: float  # V
+	time: float  # s, instrument timestamp
+	host_ns: int  # host time.perf_counter_ns() at the middle of the transaction
+
+
+class ShutterEvent(NamedTuple):
+	host_ns: int  # host time.perf_counter_ns() of the edge, as scheduled for hardware-timed pulses
+	open: bool
+
+
 class SourcemeterContext(ABC):
 	@abstractmethod
 	def __init__(self, address: str) -> None:
@@ -32,7 +48,7 @@ class SourcemeterContext(ABC):
 		self.resource = None
 
 	@abstractmethod
-	def __enter__(self) -> MessageBasedResource:
+	def __enter__(self) -> "MessageBasedResource":
 		pass
 
 	@abstractmethod
@@ -47,8 +63,8 @@ class SourcemeterContext(ABC):
 
 class SourcemeterController(ABC):
 	@abstractmethod
-	def __init__(self, resource: MessageBasedResource, voltage_protection: float, current_compliance: float):
-		self.resource: MessageBasedResource = resource
+	def __init__(self, resource: "MessageBasedResource", voltage_protection: float, current_compliance: float):
+		self.resource: "MessageBasedResource" = resource
 		self._voltage_protection: float
 		self._current_compliance: float
 
@@ -84,22 +100,57 @@ class SourcemeterController(ABC):
 	):
 		pass
 
+	@abstractmethod
+	def set_sm_list(self, output: sourcemeterOutput, levels: Sequence[float], delay: float):
+		pass
+
+	@abstractmethod
+	def ramp_output(self, target: float, output: sourcemeterOutput, slew_rate: float, max_step: float) -> None:
+		pass
+
 	@abstractmethod
 	def read_output(self) -> Sequence[Any]:
 		pass
 
+	@abstractmethod
+	def set_and_read(self, value: float, output: sourcemeterOutput = sourcemeterOutput.VOLTAGE) -> SourcemeterSample:
+		pass
+
+	@abstractmethod
+	def read_sweep(self) -> NDArray[np.float64]:
+		pass
+
 	@abstractmethod
 	def output_off(self) -> None:
 		pass
 
 
+class SwitchController(ABC):
+	# Routes one sourcemeter to one of several devices, e.g. the pixels of a substrate through a relay matrix
+	@abstractmethod
+	def __init__(self, channels: Sequence[str], settling_time: float) -> None:
+		self.channels: list[str] = list(channels)
+		self.settling_time: float = settling_time  # s, contact settling after a channel is closed
+		self.selected: Optional[str] = None
+
+	@abstractmethod
+	def select(self, channel: str) -> None:
+		# Break before make, returning once the new channel has settled. Callers turn the output off first, so the
+		# relays never switch while carrying current.
+		pass
+
+	@abstractmethod
+	def disconnect(self) -> None:
+		pass
+
+
 class ShutterContext(ABC):
 	@abstractmethod
 	def __init__(self, enabled: bool) -> None:
-		pass
+		self.timeline: list[ShutterEvent] = []  # every edge so far, in time order
 
 	@abstractmethod
-	def __enter__(self) -> Optional[Task]:
+	def __enter__(self) -> Optional["Task"]:
 		pass
 
 	@abstractmethod
@@ -110,3 +161,21 @@ class ShutterContext(ABC):
 		exc_tb: TracebackType | None,
 	) -> None:
 		pass
+
+	@abstractmethod
+	def open(self) -> ShutterEvent:
+		pass
+
+	@abstractmethod
+	def close(self) -> ShutterEvent:
+		pass
+
+	@abstractmethod
+	def pulse(self, duration: float) -> tuple[ShutterEvent, ShutterEvent]:
+		# Open for duration seconds and close again without blocking the caller, who can measure meanwhile.
+		# Returns the opening and the scheduled closing edge, wait() returns once the pulse is over.
+		pass
+
+	@abstractmethod
+	def wait(self) -> None:
+		pass
@@ -1,18 +1,37 @@
+import time
+import threading
+
 from utils.logger_config import setup_logger
-from controllers.interfaces import ShutterContext
+from controllers.interfaces import ShutterContext, ShutterEvent
 from types import TracebackType
 from nidaqmx import Task  # type: ignore
+from nidaqmx.constants import AcquisitionType, SampleTimingType  # type: ignore
 from nidaqmx.errors import DaqError  # type: ignore
 from typing import Optional
 
 logger = setup_logger()
 
+SHUTTER_OPEN = False  # line level that opens the shutter
+SHUTTER_CLOSED = True
+
 
 class shutterUSB6501(ShutterContext):
-	def __init__(self, output_channel: str = "Testboard/port1/line0", enabled: bool = True) -> None:
+	def __init__(
+		self,
+		output_channel: str = "Testboard/port1/line0",
+		enabled: bool = True,
+		sample_rate: Optional[float] = None,
+	) -> None:
 		self.output_channel = output_channel
 		self.enabled = enabled
+		# Hz of hardware-timed pulses, for DAQ devices with a digital output sample clock. The USB-6501 itself only
+		# supports on-demand writes, so there pulses are timed by a software timer.
+		self.sample_rate = sample_rate
 		self.task: Optional[Task] = None  # type: ignore
+		self.timeline: list[ShutterEvent] = []
+		self._timer: Optional[threading.Timer] = None
+		self._hardware_pulse: bool = False
+		self._pulse_timeout: float = 10.0
 
 	def __enter__(self) -> Optional[Task]:
 		if self.enabled:
@@ -20,11 +39,11 @@ class shutterUSB6501(ShutterContext):
 				self.task = Task()
 				self.task.do_channels.add_do_chan(self.output_channel)  # type: ignore
 				self.task.start()  # type: ignore
-				self.task.write([False])  # type: ignore - Initialise shutter state OPEN
+				self._write(True)  # Initialise shutter state OPEN
 				logger.info("Shutter opened.")
 				return self.task  # type: ignore
 			except DaqError as e:
-				logger.error(f"Error communicating with shutter at channel {self.output_channel}: {e}.")
+				logger.error("Error communicating with shutter at channel %s: %s.", self.output_channel, e)
 				raise
 		else:
 			logger.info("Shutter control is disabled.")
@@ -37,9 +56,67 @@ class shutterUSB6501(ShutterContext):
 	) -> None:
 		if self.task:  # type: ignore
 			try:
-				logger.info(f"Closed shutter control at {self.output_channel}.")
-				self.task.write([True])  # type: ignore - Set shutter state CLOSED
+				logger.info("Closed shutter control at %s.", self.output_channel)
+				self.wait()
+				self._write(False)  # Set shutter state CLOSED
 				self.task.stop()  # type: ignore
 				self.task.close()  # type: ignore
 			except DaqError as e:
-				logger.error(f"Error releasing shutter control: {e}")
+				logger.error("Error releasing shutter control: %s", e)
+
+	def _write(self, state: bool) -> ShutterEvent:
+		# On-demand write, stamped at the middle of the driver call
+		if self.task is None:
+			raise RuntimeError("Shutter control is disabled.")
+		start = time.perf_counter_ns()
+		self.task.write([SHUTTER_OPEN if state else SHUTTER_CLOSED])  # type: ignore
+		event = ShutterEvent((start + time.perf_counter_ns()) // 2, state)
+		self.timeline.append(event)
+		return event
+
+	def open(self) -> ShutterEvent:
+		self.wait()
+		return self._write(True)
+
+	def close(self) -> ShutterEvent:
+		self.wait()
+		return self._write(False)
+
+	def pulse(self, duration: float) -> tuple[ShutterEvent, ShutterEvent]:
+		self.wait()
+		if self.task is None:
+			raise RuntimeError("Shutter control is disabled.")
+		if self.sample_rate is None:
+			opened = self._write(True)
+			self._timer = threading.Timer(duration, self._write, args=(False,))
+			self._timer.start()
+			return opened, ShutterEvent(opened.host_ns + round(duration * 1e9), False)
+
+		# Both edges are samples of one finite output buffer, so the pulse length is set by the DAQ clock
+		n_open = max(round(duration * self.sample_rate), 1)
+		pattern = [SHUTTER_OPEN] * n_open + [SHUTTER_CLOSED]
+		self.task.stop()  # type: ignore
+		self.task.timing.cfg_samp_clk_timing(  # type: ignore
+			self.sample_rate, sample_mode=AcquisitionType.FINITE, samps_per_chan=len(pattern)
+		)
+		self.task.write(pattern, auto_start=False)  # type: ignore
+		start = time.perf_counter_ns()
+		self.task.start()  # type: ignore
+		opened = ShutterEvent((start + time.perf_counter_ns()) // 2, True)
+		closed = ShutterEvent(opened.host_ns + round(n_open / self.sample_rate * 1e9), False)
+		self.timeline += [opened, closed]
+		self._hardware_pulse = True
+		self._pulse_timeout = duration + 10.0
+		return opened, closed
+
+	def wait(self) -> None:
+		if self._timer is not None:
+			self._timer.join()
+			self._timer = None
+		if self._hardware_pulse:
+			# back to on-demand writes once the buffer has played out
+			self._hardware_pulse = False
+			self.task.wait_until_done(timeout=self._pulse_timeout)  # type: ignore
+			self.task.stop()  # type: ignore
+			self.task.timing.samp_timing_type = SampleTimingType.ON_DEMAND  # type: ignore
+			self.task.start()  # type: ignore
@@ -0,0 +1,297 @@
+import time
+import numpy as np
+
+from numpy.typing import ArrayLike, NDArray
+from typing import TYPE_CHECKING, Optional, Sequence, Any
+
+from controllers.dummyK2400 import dummyK2400Controller
+from controllers.interfaces import SourcemeterSample, sourcemeterOutput, sourcemeterMode, sweepDirection
+
+from utils.logger_config import setup_logger
+from utils.custom_exceptions import OutputLimitsExceededError
+from utils.constants import (
+	SWEEP_RATE,
+	SOURCE_DELAY,
+	MAX_BUFFER_POINTS,
+	MAX_LIST_POINTS,
+	RAMP_SLEW_RATE,
+	VOLTAGE_STEP,
+)
+from utils.utils import ramp_levels
+
+if TYPE_CHECKING:
+	from pyvisa.resources import GPIBInstrument
+
+logger = setup_logger()
+
+BOLTZMANN_OVER_Q = 8.617333262e-5  # V/K
+
+
+class SingleDiodeModel:
+	# I = Iph - I0 (exp((V + I Rs) / (n Ns Vt)) - 1) - (V + I Rs) / Rsh for Ns series cells, I being the generated
+	# current in A. I0 is fixed by the reference Voc, so light drift moves Voc as it would in a real device.
+	# Optional ion migration: a mobile ion voltage relaxes towards the applied voltage with time constant ion_tau and
+	# shifts the recombination voltage by ion_amplitude * (V - V_ion), giving scan direction dependent JV curves.
+	def __init__(
+		self,
+		jsc_mA_cm2: float = 22.0,
+		area_cm2: float = 0.1,
+		voc_per_cell: float = 1.1,
+		n_cells: int = 3,
+		ideality: float = 1.6,
+		rs_ohm_cm2: float = 3.0,
+		rsh_ohm_cm2: float = 2000.0,
+		temperature_K: float = 298.15,
+		voc_temperature_coefficient: float = -0.002,  # V/K per cell
+		light_drift_per_hour: float = 0.0,  # fractional change of Jsc per hour
+		voc_drift_per_hour: float = 0.0,  # V per cell per hour, e.g. from degradation
+		temperature_drift_per_hour: float = 0.0,  # K per hour
+		ion_amplitude: float = 0.0,
+		ion_tau: float = 10.0,
+	):
+		self.jsc_mA_cm2 = jsc_mA_cm2
+		self.area_cm2 = area_cm2
+		self.voc_per_cell = voc_per_cell
+		self.n_cells = n_cells
+		self.ideality = ideality
+		self.rs = n_cells * rs_ohm_cm2 / area_cm2
+		self.rsh = n_cells * rsh_ohm_cm2 / area_cm2
+		self.temperature_K = temperature_K
+		self.voc_temperature_coefficient = voc_temperature_coefficient
+		self.light_drift_per_hour = light_drift_per_hour
+		self.voc_drift_per_hour = voc_drift_per_hour
+		self.temperature_drift_per_hour = temperature_drift_per_hour
+		self.ion_amplitude = ion_amplitude
+		self.ion_tau = ion_tau
+		self.v_ion: float = 0.0
+		self.illuminated: bool = True
+
+	def _state(self, t: float) -> tuple[float, float, float]:
+		# Photocurrent, saturation current and thermal voltage of the whole string at time t (s)
+		hours = t / 3600
+		temperature = self.temperature_K + self.temperature_drift_per_hour * hours
+		n_vt = self.n_cells * self.ideality * BOLTZMANN_OVER_Q * temperature
+
+		iph_ref = self.jsc_mA_cm2 * 1e-3 * self.area_cm2
+		voc_ref = self.n_cells * (
+			self.voc_per_cell
+			+ self.voc_drift_per_hour * hours
+			+ self.voc_temperature_coefficient * (temperature - self.temperature_K)
+		)
+		i0 = iph_ref / np.expm1(max(voc_ref, 1e-3) / n_vt)
+
+		iph = iph_ref * max(1 + self.light_drift_per_hour * hours, 0.0) if self.illuminated else 0.0
+		return iph, i0, n_vt
+
+	def current(self, v: ArrayLike, t: float = 0.0, v_ion: ArrayLike | None = None) -> NDArray[np.float64]:
+		# Generated current at voltage v, solved by damped Newton iteration on the implicit diode equation
+		v = np.asarray(v, dtype=np.float64)
+		iph, i0, n_vt = self._state(t)
+		v_rec = v if v_ion is None else v + self.ion_amplitude * (v - np.asarray(v_ion))
+
+		i = np.full_like(v, iph)
+		for _ in range(50):
+			x = np.minimum((v_rec + i * self.rs) / n_vt, 200.0)
+			diode = i0 * np.expm1(x)
+			f = iph - diode - (v + i * self.rs) / self.rsh - i
+			df = -i0 * np.exp(x) * self.rs / n_vt - self.rs / self.rsh - 1
+			step = f / df
+			i = i - step
+			if np.all(np.abs(step) < 1e-12):
+				break
+		return i
+
+	def voltage_at_current(self, i: float, t: float = 0.0) -> float:
+		# Bisection for the voltage at which the device delivers current i, i = 0 being open circuit
+		lo, hi = -1.0, 2.0 * self.n_cells * self.voc_per_cell + 1.0
+		for _ in range(100):
+			mid = 0.5 * (lo + hi)
+			if self.current(mid, t) > i:
+				lo = mid
+			else:
+				hi = mid
+		return 0.5 * (lo + hi)
+
+	def open_circuit_voltage(self, t: float = 0.0) -> float:
+		return self.voltage_at_current(0.0, t)
+
+	def max_power_point(self, t: float = 0.0, points: int = 2001) -> tuple[float, float]:
+		v = np.linspace(0.0, self.open_circuit_voltage(t), points)
+		p = v * self.current(v, t)
+		k = int(np.argmax(p))
+		return float(v[k]), float(p[k])
+
+	def relax_ions(self, v: float, dt: float) -> None:
+		if self.ion_amplitude:
+			self.v_ion += (v - self.v_ion) * -np.expm1(-dt / self.ion_tau)
+
+
+class simulatedK2400Controller(dummyK2400Controller):
+	# Dummy sourcemeter backed by a SingleDiodeModel. Simulated time (self.clock, in s) advances by the modelled GPIB
+	# latency of every transaction plus the settling time of every measurement, and follows wall time with realtime.
+	def __init__(
+		self,
+		resource: "GPIBInstrument",
+		voltage_protection: float,
+		current_compliance: float,
+		model: Optional[SingleDiodeModel] = None,
+		latency: float = 0.0,
+		settling_time: float = SOURCE_DELAY,
+		noise: float = 0.0,
+		realtime: bool = False,
+		seed: Optional[int] = None,
+		clock_drift: float = 0.0,
+	):
+		self.model = model if model is not None else SingleDiodeModel()
+		self.latency = latency
+		self.settling_time = settling_time
+		self.noise = noise  # relative standard deviation of current readings
+		self.realtime = realtime
+		self.rng = np.random.default_rng(seed)
+		self.clock: float = 0.0
+		self.clock_drift = clock_drift  # fractional rate error of the instrument timestamp against the host clock
+		self.shutter: Optional[Any] = None  # simulatedShutter lighting the model, attached by the shutter itself
+
+		self.output: sourcemeterOutput = sourcemeterOutput.VOLTAGE
+		self.level: float = 0.0
+		self.output_on: bool = False
+		self.sweep_levels: NDArray[np.float64] = np.zeros(0)
+		self.sweep_delay: float = SOURCE_DELAY
+
+		super().__init__(resource, voltage_protection, current_compliance)
+
+	def elapse(self, dt: float) -> None:
+		if dt <= 0:
+			return
+		if self.output_on and self.output == sourcemeterOutput.VOLTAGE:
+			self.model.relax_ions(self.level, dt)
+		self.clock += dt
+		if self.realtime:
+			time.sleep(dt)
+
+	def reset(self):
+		self.output_on = False
+		self.level = 0.0
+
+	def set_sm_output(
+		self,
+		output: sourcemeterOutput,
+		value: float,
+		mode: sourcemeterMode,
+		sweepdir: sweepDirection = sweepDirection.FORWARD,
+		sweep_rate: float = SWEEP_RATE,
+	):
+		self.check_output_limits(output, value)
+		if mode == sourcemeterMode.LIST:
+			raise ValueError("List mode needs a sequence of levels, use set_sm_list().")
+
+		self.elapse(self.latency)
+		self.output = output
+		self.sweep_delay = SOURCE_DELAY
+		if mode == sourcemeterMode.SWEEP:
+			nPoints = round(value / (SOURCE_DELAY * sweep_rate))  # voltage (V) / (delay (S) * sweep_rate (V/s))
+			nPoints = max(min(nPoints, MAX_BUFFER_POINTS), 2)
+			self.sweep_points = nPoints
+			levels = np.linspace(0.0, value, nPoints)
+			self.sweep_levels = levels if sweepdir == sweepDirection.FORWARD else levels[::-1]
+			self.level = float(self.sweep_levels[0])
+		else:
+			self.sweep_levels = np.zeros(0)
+			self.level = value
+		self.output_on = True
+
+	def set_sm_list(self, output: sourcemeterOutput, levels: Sequence[float], delay: float = SOURCE_DELAY):
+		if not 2 <= len(levels) <= MAX_LIST_POINTS:
+			raise ValueError(f"Source list must hold between 2 and {MAX_LIST_POINTS} points, got {len(levels)}.")
+		for level in levels:
+			self.check_output_limits(output, float(level))
+
+		self.elapse(self.latency)
+		self.output = output
+		self.sweep_levels = np.asarray(levels, dtype=np.float64)
+		self.sweep_points = len(levels)
+		self.sweep_delay = delay
+		self.level = float(self.sweep_levels[0])
+		self.output_on = True
+
+	def ramp_output(
+		self,
+		target: float,
+		output: sourcemeterOutput = sourcemeterOutput.VOLTAGE,
+		slew_rate: float = RAMP_SLEW_RATE,
+		max_step: float = VOLTAGE_STEP,
+	) -> None:
+		start = self.level if self.output_on and self.output == output and not len(self.sweep_levels) else 0.0
+		self.check_output_limits(output, start)
+		self.check_output_limits(output, target)
+		levels, delay = ramp_levels(start, target, slew_rate, max_step)
+
+		# one transaction per step, each held for the trigger delay on the instrument clock
+		self.output = output
+		self.sweep_levels = np.zeros(0)
+		self.output_on = True
+		for level in levels[1:]:
+			self.level = float(level)
+			self.elapse(delay + self.latency)
+
+	def check_output_limits(self, output: sourcemeterOutput, value: float) -> None:
+		max_value = self.current_compliance if output == sourcemeterOutput.CURRENT else self.voltage_protection
+		if not (0 <= value <= max_value):
+			raise OutputLimitsExceededError(
+				f"Attempted to set {output.value} to {value} which exceeds maximum safe value of {max_value}."
+			)
+
+	def _measure(self, level: float) -> tuple[float, float]:
+		if self.shutter is not None:
+			self.model.illuminated = self.shutter.is_open(self.host_time_ns())
+		if not self.output_on:
+			return 0.0, 0.0
+
+		if self.output == sourcemeterOutput.VOLTAGE:
+			v = level
+			i_gen = float(self.model.current(v, self.clock, self.model.v_ion if self.model.ion_amplitude else None))
+		else:
+			i_gen = -level
+			v = min(self.model.voltage_at_current(i_gen, self.clock), self.voltage_protection)
+
+		if self.noise:
+			i_gen *= 1 + self.noise * self.rng.standard_normal()
+		i = float(np.clip(-i_gen, -self.current_compliance, self.current_compliance))  # sourcemeter sinks photocurrent
+		return i, v
+
+	def read_output(self) -> Sequence[Any]:
+		self.elapse(self.latency + self.settling_time)
+		i, v = self._measure(self.level)
+		return [i, v, self.instrument_time()]
+
+	def set_and_read(self, value: float, output: sourcemeterOutput = sourcemeterOutput.VOLTAGE) -> SourcemeterSample:
+		# Like K2400Controller, only a step at an already sourcing output costs a single transaction
+		if not self.output_on or self.output != output or len(self.sweep_levels):
+			return super().set_and_read(value, output)
+
+		self.check_output_limits(output, value)
+		self.elapse(self.latency + self.settling_time)
+		self.level = value
+		i, v = self._measure(self.level)
+		return SourcemeterSample(i, v, self.instrument_time(), self.host_time_ns())
+
+	def instrument_time(self) -> float:
+		return self.clock * (1 + self.clock_drift)
+
+	def host_time_ns(self) -> int:
+		# The simulated clock stands in for the host clock, so runs faster than real time stay consistent
+		return round(self.clock * 1e9)
+
+	def read_sweep(self) -> NDArray[np.float64]:
+		rows = np.zeros((len(self.sweep_levels), 3))
+		for k, level in enumerate(self.sweep_levels):
+			self.level = float(level)
+			self.elapse(self.sweep_delay)
+			rows[k] = [*self._measure(self.level), self.instrument_time()]
+		self.elapse(self.latency)
+		return rows
+
+	def output_off(self) -> None:
+		self.elapse(self.latency)
+		self.output_on = False
+		self.level = 0.0
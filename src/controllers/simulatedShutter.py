@@ -0,0 +1,64 @@
+import bisect
+
+from types import TracebackType
+
+from controllers.interfaces import ShutterContext, ShutterEvent
+from controllers.simulatedK2400 import simulatedK2400Controller
+from utils.logger_config import setup_logger
+
+logger = setup_logger()
+
+
+class simulatedShutter(ShutterContext):
+	# Shutter in front of a simulatedK2400Controller. Edges are stamped on the simulated clock and every reading is
+	# lit or dark according to the timeline at its own time, so pulses show up in the readings taken meanwhile.
+	def __init__(self, sourcemeter: simulatedK2400Controller, enabled: bool = True) -> None:
+		self.sm = sourcemeter
+		self.enabled = enabled
+		self.timeline: list[ShutterEvent] = []
+		self.sm.shutter = self
+
+	def __enter__(self) -> None:
+		if self.enabled:
+			self.open()
+			logger.info("Shutter opened.")
+		else:
+			logger.info("Shutter control is disabled.")
+
+	def __exit__(
+		self,
+		exc_type: type[BaseException] | None,
+		exc_val: BaseException | None,
+		exc_tb: TracebackType | None,
+	) -> None:
+		if self.enabled:
+			self.close()
+			logger.info("Closed shutter.")
+
+	def is_open(self, host_ns: int) -> bool:
+		# A shutter that was never driven leaves the device lit
+		k = bisect.bisect_right([event.host_ns for event in self.timeline], host_ns)
+		return self.timeline[k - 1].open if k else True
+
+	def _record(self, state: bool, host_ns: int) -> ShutterEvent:
+		event = ShutterEvent(host_ns, state)
+		self.timeline.append(event)
+		return event
+
+	def open(self) -> ShutterEvent:
+		self.wait()
+		return self._record(True, self.sm.host_time_ns())
+
+	def close(self) -> ShutterEvent:
+		self.wait()
+		return self._record(False, self.sm.host_time_ns())
+
+	def pulse(self, duration: float) -> tuple[ShutterEvent, ShutterEvent]:
+		self.wait()
+		opened = self._record(True, self.sm.host_time_ns())
+		return opened, self._record(False, opened.host_ns + round(duration * 1e9))
+
+	def wait(self) -> None:
+		# Simulated time only moves with the sourcemeter, so waiting for a pulse advances its clock to the last edge
+		if self.timeline:
+			self.sm.elapse(self.timeline[-1].host_ns * 1e-9 - self.sm.clock)
@@ -0,0 +1,40 @@
+from typing import Mapping
+
+from controllers.interfaces import SwitchController
+from controllers.simulatedK2400 import simulatedK2400Controller, SingleDiodeModel
+from utils.logger_config import setup_logger
+from utils.constants import SWITCH_SETTLING_TIME
+
+logger = setup_logger()
+
+
+class simulatedSwitch(SwitchController):
+	# Relay matrix in front of a simulatedK2400Controller. Selecting a channel connects the sourcemeter to that
+	# channel's device model and costs the relay settling time on the simulated clock.
+	def __init__(
+		self,
+		sourcemeter: simulatedK2400Controller,
+		models: Mapping[str, SingleDiodeModel],
+		settling_time: float = SWITCH_SETTLING_TIME,
+	):
+		super().__init__(list(models), settling_time)
+		self.sm = sourcemeter
+		self.models = dict(models)
+		self.switch_count: int = 0
+
+	def select(self, channel: str) -> None:
+		if channel not in self.models:
+			raise ValueError(f"Switch channel {channel} is not one of the configured channels {self.channels}.")
+		if channel == self.selected:
+			return
+		if self.sm.output_on:
+			raise RuntimeError(f"Switching to channel {channel} with the sourcemeter output on.")
+
+		self.sm.model = self.models[channel]
+		self.sm.elapse(self.sm.latency + self.settling_time)
+		self.selected = channel
+		self.switch_count += 1
+		logger.debug("Switched to channel %s.", channel)
+
+	def disconnect(self) -> None:
+		self.selected = None
@@ -1 +1 @@
- 
+
@@ -0,0 +1,146 @@
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Any
+
+from utils.constants import VOLTAGE_STEP, MIN_VOLTAGE_STEP, MAX_VOLTAGE_STEP
+
+
+class trackingAlgorithm(Enum):
+	PERTURB_AND_OBSERVE = "po"
+	ADAPTIVE_PERTURB_AND_OBSERVE = "adaptive"
+	INCREMENTAL_CONDUCTANCE = "ic"
+
+
+class TrackingStrategy(ABC):
+	# Decides the next voltage set point from the latest measured voltage (V) and current (A) at the device
+
+	@abstractmethod
+	def reset(self, vmpp: float) -> None:
+		pass
+
+	@abstractmethod
+	def next_voltage(self, v: float, i: float) -> float:
+		pass
+
+	def state(self) -> dict[str, Any]:
+		# Step size, direction and last reading as plain values, so a checkpoint can carry them across a restart
+		return dict(vars(self))
+
+	def restore(self, state: dict[str, Any]) -> None:
+		vars(self).update(state)
+
+
+def head_for_seed(v: float, seed: float, step: float, direction: int) -> int:
+	# First step after a reset: back towards the seed when the reading is more than a step away from it
+	if seed > 0 and abs(v - seed) > step:
+		return 1 if v < seed else -1
+	return direction
+
+
+class PerturbAndObserve(TrackingStrategy):
+	def __init__(self, v_step: float = VOLTAGE_STEP):
+		self.v_step = v_step
+		self.reset(0.0)
+
+	def reset(self, vmpp: float) -> None:
+		# The seed counts as the last set point, with no power measured there yet. 0 V is no seed.
+		self.previous_v: float = vmpp
+		self.previous_power: float | None = None
+		self.direction: int = 1
+
+	def next_voltage(self, v: float, i: float) -> float:
+		power = abs(v * i)
+		if self.previous_power is None:
+			self.direction = head_for_seed(v, self.previous_v, self.v_step, self.direction)
+		elif power < self.previous_power:
+			self.direction *= -1
+		self.previous_v = v
+		self.previous_power = power
+		return v + self.direction * self.v_step
+
+
+class AdaptivePerturbAndObserve(TrackingStrategy):
+	# Step scales with the dimensionless power slope |dP/dV| * V / P, which is about 1 on the Jsc plateau and 0 at
+	# MPP whatever the device voltage: large steps far from MPP, fine steps close to it
+	def __init__(
+		self,
+		gain: float = MAX_VOLTAGE_STEP,
+		min_step: float = MIN_VOLTAGE_STEP,
+		max_step: float = MAX_VOLTAGE_STEP,
+	):
+		self.gain = gain  # V
+		self.min_step = min_step
+		self.max_step = max_step
+		self.reset(0.0)
+
+	def reset(self, vmpp: float) -> None:
+		# A seeded MPP starts with fine steps, an unseeded start with coarse ones
+		self.previous_v: float = vmpp
+		self.previous_power: float | None = None
+		self.direction: int = 1
+		self.step: float = self.min_step if vmpp > 0 else self.max_step
+
+	def next_voltage(self, v: float, i: float) -> float:
+		power = abs(v * i)
+		if self.previous_power is None:
+			self.direction = head_for_seed(v, self.previous_v, self.step, self.direction)
+		else:
+			dv = v - self.previous_v
+			dp = power - self.previous_power
+			if dp < 0:
+				self.direction *= -1
+			if dv != 0 and power > 0:
+				self.step = min(max(self.gain * abs(dp / dv) * v / power, self.min_step), self.max_step)
+			else:
+				self.step = self.min_step
+
+		self.previous_v = v
+		self.previous_power = power
+		return v + self.direction * self.step
+
+
+class IncrementalConductance(TrackingStrategy):
+	# At MPP dP/dV = 0, i.e. dI/dV = -I/V. Works on the magnitude of the generated current so the sourcemeter sign
+	# convention does not matter. Holds the set point once the conductance condition is met within tolerance.
+	def __init__(self, v_step: float = VOLTAGE_STEP, tolerance: float = 0.01):
+		self.v_step = v_step
+		self.tolerance = tolerance
+		self.reset(0.0)
+
+	def reset(self, vmpp: float) -> None:
+		self.previous_v: float | None = None
+		self.previous_i: float = 0.0
+		self.v_set: float = vmpp
+
+	def next_voltage(self, v: float, i: float) -> float:
+		i = abs(i)
+		if self.previous_v is None:
+			self.v_set = v + self.v_step
+		else:
+			dv = v - self.previous_v
+			di = i - self.previous_i
+			if dv == 0:
+				if di > 0:
+					self.v_set = v + self.v_step
+				elif di < 0:
+					self.v_set = v - self.v_step
+			elif v > 0 and i > 0:
+				slope = 1 + (di / dv) / (i / v)  # dP/dV normalised by I, zero at MPP
+				if abs(slope) > self.tolerance:
+					self.v_set = v + self.v_step if slope > 0 else v - self.v_step
+				else:
+					self.v_set = v
+
+		self.previous_v = v
+		self.previous_i = i
+		return self.v_set
+
+
+def create_tracking_algorithm(algorithm: trackingAlgorithm) -> TrackingStrategy:
+	match algorithm:
+		case trackingAlgorithm.PERTURB_AND_OBSERVE:
+			return PerturbAndObserve()
+		case trackingAlgorithm.ADAPTIVE_PERTURB_AND_OBSERVE:
+			return AdaptivePerturbAndObserve()
+		case trackingAlgorithm.INCREMENTAL_CONDUCTANCE:
+			return IncrementalConductance()
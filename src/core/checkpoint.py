@@ -0,0 +1,82 @@
+import os
+import json
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from utils.data_writer import StreamingDataWriter
+from utils.logger_config import setup_logger
+from utils.constants import CHECKPOINT_INTERVAL
+
+logger = setup_logger()
+
+
+class TrackerCheckpoint:
+	# Tracker state saved every interval seconds of tracking time to a small JSON file next to the data. The file is
+	# replaced atomically, so a crash at any point leaves the previous checkpoint readable.
+	def __init__(
+		self,
+		path: str | Path,
+		writers: Optional[dict[str, StreamingDataWriter]] = None,
+		interval: float = CHECKPOINT_INTERVAL,
+	):
+		if interval <= 0:
+			raise ValueError(f"Checkpoint interval must be positive, got {interval} s.")
+		self.path = Path(path)
+		self.writers = writers if writers is not None else {}
+		self.interval = interval
+		self.last_saved: Optional[float] = None
+
+	def due(self, t: float) -> bool:
+		return self.last_saved is None or t - self.last_saved >= self.interval
+
+	def save(self, state: dict[str, Any], t: float) -> None:
+		checkpoint = {
+			**state,
+			"paths": {name: str(writer.path) for name, writer in self.writers.items()},
+			"saved": datetime.now().isoformat(),
+		}
+		tmp = self.path.with_suffix(".json.tmp")
+		tmp.write_text(json.dumps(checkpoint, indent=2))
+		os.replace(tmp, self.path)
+		self.last_saved = t
+		logger.debug("Checkpoint saved to %s at %.0f s of tracking.", self.path, state.get("elapsed", 0.0))
+
+	def reconcile(self, checkpoint: dict[str, Any]) -> dict[str, int]:
+		# Bring each file back to the rows the checkpoint counted. Rows written after it are cut off, the resumed run
+		# tracks that time again. Rows lost with a chunk that never reached the disk are reported. Returns the rows
+		# each file now holds.
+		rows = dict(checkpoint.get("rows", {}))
+		for name, expected in rows.items():
+			writer = self.writers.get(name)
+			if writer is None:
+				continue
+			if writer.rows_written > expected:
+				logger.info(
+					"Dropping %s rows of %s written after the checkpoint.", writer.rows_written - expected, writer.path
+				)
+				writer.truncate(expected)
+			elif writer.rows_written < expected:
+				logger.warning(
+					"%s holds %s rows, %s fewer than the checkpoint. They were lost when the run stopped.",
+					writer.path,
+					writer.rows_written,
+					expected - writer.rows_written,
+				)
+				rows[name] = writer.rows_written
+		return rows
+
+
+def load_checkpoint(path: str | Path) -> dict[str, Any]:
+	path = Path(path)
+	if not path.exists():
+		raise FileNotFoundError(f"No checkpoint found at {path}, the run cannot be resumed.")
+	checkpoint = json.loads(path.read_text())
+	logger.info(
+		"Resuming from checkpoint saved %s after %.0f s of tracking at %.4f V.",
+		checkpoint["saved"],
+		checkpoint["elapsed"],
+		checkpoint["v_set"],
+	)
+	return checkpoint
@@ -0,0 +1,80 @@
+import math
+import time
+import numpy as np
+
+from numpy.typing import ArrayLike, NDArray
+
+from utils.logger_config import setup_logger
+from utils.constants import CLOCK_SYNC_TIME_CONSTANT, CLOCK_SYNC_MIN_SPAN
+
+logger = setup_logger()
+
+
+def host_clock_reference() -> dict[str, int]:
+	# perf_counter_ns is shared by all processes on the machine but has no fixed epoch, so runs store one pairing with
+	# wall clock time to put host timestamps on a calendar and merge files written by separate processes
+	return {"perf_counter_ns": time.perf_counter_ns(), "unix_time_ns": time.time_ns()}
+
+
+class ClockSync:
+	# Running least squares fit of host = offset + rate * instrument time for one instrument. Sums are decayed
+	# exponentially with instrument time, so the fit follows slow crystal drift over multi-day runs while the jitter of
+	# single host timestamps averages out over time_constant. Sums are kept about the first sample for precision.
+	def __init__(self, time_constant: float = CLOCK_SYNC_TIME_CONSTANT, min_span: float = CLOCK_SYNC_MIN_SPAN):
+		if time_constant <= 0:
+			raise ValueError(f"Clock fit time constant must be positive, got {time_constant} s.")
+		self.time_constant = time_constant
+		self.min_span = min_span
+		self.reset()
+
+	def reset(self) -> None:
+		self.samples: int = 0
+		self._origin: tuple[float, float] = (0.0, 0.0)  # instrument and host time of the first sample
+		self._last: float = 0.0
+		self._sums: tuple[float, float, float, float, float] = (0.0, 0.0, 0.0, 0.0, 0.0)  # weight, x, y, xx, xy
+
+	def update(self, instrument_t: float, host_t: float) -> None:
+		if self.samples and instrument_t < self._last:
+			logger.warning(
+				"Instrument clock went back from %.3f s to %.3f s, restarting the clock fit.", self._last, instrument_t
+			)
+			self.reset()
+		if not self.samples:
+			self._origin = (instrument_t, host_t)
+			self._last = instrument_t
+
+		x = instrument_t - self._origin[0]
+		y = host_t - self._origin[1]
+		decay = math.exp((self._last - instrument_t) / self.time_constant)
+		w, sx, sy, sxx, sxy = self._sums
+		self._sums = (w * decay + 1, sx * decay + x, sy * decay + y, sxx * decay + x * x, sxy * decay + x * y)
+		self._last = instrument_t
+		self.samples += 1
+
+	@property
+	def rate(self) -> float:
+		# Host seconds per instrument second, taken as exactly 1 until the samples span enough time to fit it
+		w, sx, sy, sxx, sxy = self._sums
+		if not self.samples:
+			return 1.0
+		variance = sxx / w - (sx / w) ** 2
+		if variance < self.min_span**2:
+			return 1.0
+		return (sxy / w - sx * sy / w**2) / variance
+
+	@property
+	def drift_ppm(self) -> float:
+		return (self.rate - 1) * 1e6
+
+	@property
+	def offset(self) -> float:
+		# Host minus instrument time at the latest sample, in s
+		return float(self.to_host(self._last)) - self._last if self.samples else math.nan
+
+	def to_host(self, instrument_t: ArrayLike) -> NDArray[np.float64] | float:
+		if not self.samples:
+			return np.full(np.shape(instrument_t), np.nan) if np.ndim(instrument_t) else math.nan
+		w, sx, sy, _, _ = self._sums
+		x = np.asarray(instrument_t, dtype=np.float64) - self._origin[0]
+		host = self._origin[1] + sy / w + self.rate * (x - sx / w)
+		return host if np.ndim(host) else float(host)
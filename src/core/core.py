@@ -1,21 +1,48 @@
 # type: ignore
 import time
+import threading
 import numpy as np
-import pandas as pd
 
-from typing import Sequence, Any
+from typing import Callable, NamedTuple, Optional, Sequence, Any
+
+from numpy.typing import NDArray
 
 from controllers.interfaces import SourcemeterController, sweepDirection, sourcemeterOutput, sourcemeterMode
+from core.algorithms import TrackingStrategy, PerturbAndObserve
+from core.clock_sync import ClockSync
+from core.checkpoint import TrackerCheckpoint
+from core.pipeline import AcquisitionPipeline
+from core.scheduler import JVScheduler
+from plotting.live_plot import LivePlot
+from analysis.hysteresis import HysteresisResult, analyse_hysteresis
+from analysis.mpp import calc_pv_parameters
+from analysis.sweep_planner import SweepPlan, plan_sweep, linear_plan
 
-# from utils.determine_vmpp import determine_mpp
-# from utils.custom_exceptions import OutputLimitsExceededError
+from utils.data_writer import StreamingDataWriter, JV_DTYPE
 from utils.logger_config import setup_logger
-from utils.constants import SWEEP_RATE
+from utils.constants import (
+	SWEEP_RATE,
+	RAMP_SLEW_RATE,
+	VOLTAGE_STEP,
+	SOURCE_DELAY,
+	JV_TIME_BUDGET,
+	JV_VOLTAGE_MARGIN,
+	COARSE_SWEEP_POINTS,
+	VOC_MAX_HOLD,
+	VOC_SETTLE_WINDOW,
+	VOC_SETTLE_TOLERANCE,
+)
 from utils.utils import calc_mpp_from_iv
 
 logger = setup_logger()
 
 
+class OpenCircuitVoltage(NamedTuple):
+	voc: float  # V, from the trend fitted over the final window
+	transient: NDArray[np.float64]  # n * 2 [t, V] with t in s since the output was opened
+	settled: bool
+
+
 class MaximumPowerPointTracker:
 	def __init__(
 		self,
@@ -23,23 +50,86 @@ class MaximumPowerPointTracker:
 		cell_area: float,
 		tracking_time: int,
 		dummyMode: bool,
+		algorithm: Optional[TrackingStrategy] = None,
+		v_step: float = VOLTAGE_STEP,
+		stop_event: Optional[threading.Event] = None,
+		data_writer: Optional[StreamingDataWriter] = None,
+		pipeline: Optional[AcquisitionPipeline] = None,
+		clock: Optional[Callable[[], float]] = None,
+		jv_scheduler: Optional[JVScheduler] = None,
+		jv_writer: Optional[StreamingDataWriter] = None,
+		live_plot: Optional[LivePlot] = None,
+		checkpoint: Optional[TrackerCheckpoint] = None,
 	):
 		self.dummyMode: bool = dummyMode
 		self.sm: SourcemeterController = sourcemeter
 		self.cell_area: float = cell_area
 		self.tracking_time: int = tracking_time
+		self.algorithm: TrackingStrategy = algorithm if algorithm is not None else PerturbAndObserve()
+		self.v_step: float = v_step
+		self.vmpp: float = 0.0
+		self.v_set: float = 0.0
+		self.stop_event: threading.Event = stop_event if stop_event is not None else threading.Event()
+		self.data_writer: Optional[StreamingDataWriter] = data_writer
+		self.pipeline: Optional[AcquisitionPipeline] = pipeline
+		self.clock: Optional[Callable[[], float]] = clock  # tracking time source, defaults to time.monotonic
+		self.last_sweep: Optional[NDArray[np.float64]] = (
+			None  # n * 2 [I, V] of the latest sweep, to plan the next one from
+		)
+		self.voc: float = 0.0
+		self.voc_transient: Optional[NDArray[np.float64]] = None
+		self.hysteresis: Optional[HysteresisResult] = None  # analysis of the latest forward and reverse sweep pair
+		self.jv_scheduler: Optional[JVScheduler] = jv_scheduler
+		self.jv_writer: Optional[StreamingDataWriter] = jv_writer  # JV stream, written on this thread between steps
+		self.live_plot: Optional[LivePlot] = live_plot  # tracking samples reach the plot through the pipeline
+		self.clock_sync: ClockSync = ClockSync()  # maps this instrument's timestamps onto the shared host clock
+		self.checkpoint: Optional[TrackerCheckpoint] = checkpoint
+		self.elapsed: float = 0.0  # tracking time in s completed so far, carried over when a run is resumed
+		self.rows_recorded: int = 0  # tracking samples sent to the data file, carried over when a run is resumed
 
-	def find_open_circuit_voltage(self, hold_time: int = 5) -> float:
+	def find_open_circuit_voltage(
+		self,
+		max_hold: float = VOC_MAX_HOLD,
+		window: float = VOC_SETTLE_WINDOW,
+		tolerance: float = VOC_SETTLE_TOLERANCE,
+	) -> OpenCircuitVoltage:
+		# Sample at 0 applied current until a straight line fitted over the trailing window is flatter than
+		# tolerance (V/s), or max_hold seconds have passed
+		clock = self.clock if self.clock is not None else time.monotonic
 		self.sm.set_sm_output(output=sourcemeterOutput.CURRENT, value=0, mode=sourcemeterMode.FIXED)
-		logger.info(
-			f"Holding device at 0 applied current for {hold_time} seconds before measuring open circuit voltage."
-		)
-		time.sleep(hold_time)
-		logger.info("Measuring open circuit voltage...")
-		_, Voc, _ = self.sm.read_output()
-		logger.info(f"Device Voc measured as {Voc} V.")
+		logger.info("Holding device at 0 applied current for up to %s seconds until Voc settles.", max_hold)
+
+		start = clock()
+		times: list[float] = []
+		voltages: list[float] = []
+		Voc, slope = 0.0, np.inf
+		while True:
+			_, v, _ = self.sm.read_output()
+			t = clock() - start
+			times.append(t)
+			voltages.append(v)
+			Voc = v
+
+			if t >= window:
+				recent = np.asarray(times) >= t - window
+				if np.count_nonzero(recent) >= 3:
+					slope, intercept = np.polyfit(np.asarray(times)[recent], np.asarray(voltages)[recent], 1)
+					Voc = float(slope * t + intercept)
+					if abs(slope) < tolerance:
+						break
+
+			if t >= max_hold or self.stop_event.is_set():
+				break
+
+		settled = bool(abs(slope) < tolerance)
+		if settled:
+			logger.info("Device Voc settled at %s V after %.1f seconds.", Voc, t)
+		else:
+			logger.warning("Device Voc still drifting at %.3g V/s after %.1f seconds, using %s V.", slope, t, Voc)
 		self.sm.output_off()
-		return Voc
+
+		self.voc_transient = np.column_stack([times, voltages])
+		return OpenCircuitVoltage(voc=Voc, transient=self.voc_transient, settled=settled)
 
 	def jv_sweep(self, max_voltage: float, sweep_direction: sweepDirection) -> Sequence[Any]:
 		if sweep_direction != sweepDirection.BOTH:
@@ -49,9 +139,9 @@ class MaximumPowerPointTracker:
 				mode=sourcemeterMode.SWEEP,
 				sweepdir=sweep_direction,
 			)
-			i, v, _ = self.sm.read_output()
+			sweep = self.sm.read_sweep()
 			self.sm.output_off()
-			return [i, v]
+			return [sweep[:, 0], sweep[:, 1]]
 
 		else:
 			self.sm.set_sm_output(
@@ -60,7 +150,7 @@ class MaximumPowerPointTracker:
 				mode=sourcemeterMode.SWEEP,
 				sweepdir=sweepDirection.FORWARD,
 			)
-			iFwd, vFwd, _ = self.sm.read_output()
+			fwd_sweep = self.sm.read_sweep()
 
 			self.sm.set_sm_output(
 				output=sourcemeterOutput.VOLTAGE,
@@ -68,11 +158,137 @@ class MaximumPowerPointTracker:
 				mode=sourcemeterMode.SWEEP,
 				sweepdir=sweepDirection.REVERSE,
 			)
-			iBcwd, vBcwd, _ = self.sm.read_output()
-			# TO DO: return proxy JV array for MPP calculation
-
+			bcwd_sweep = self.sm.read_sweep()
 			self.sm.output_off()
-			return [iFwd, iBcwd, vFwd, vBcwd]
+
+			# the averaged proxy curve stands in for the steady-state JV of a hysteretic device
+			self.hysteresis = analyse_hysteresis(fwd_sweep[:, :2], bcwd_sweep[:, :2])
+			logger.info(
+				"JV sweep hysteresis index %.3f, proxy curve Vmpp %.4f V.",
+				self.hysteresis.hysteresis_index,
+				self.hysteresis.average.vmpp,
+			)
+			return [fwd_sweep[:, 0], bcwd_sweep[:, 0], fwd_sweep[:, 1], bcwd_sweep[:, 1]]
+
+	def run_sweep_plan(
+		self, plan: SweepPlan, sweep_direction: sweepDirection = sweepDirection.REVERSE
+	) -> dict[sweepDirection, NDArray[np.float64]]:
+		# List sweeps of the planned levels, reversed for the forward direction, then the output is turned off
+		sweeps = {}
+		directions = (
+			[sweepDirection.REVERSE, sweepDirection.FORWARD]
+			if sweep_direction == sweepDirection.BOTH
+			else [sweep_direction]
+		)
+		for direction in directions:
+			levels = plan.levels if direction == sweepDirection.REVERSE else plan.levels[::-1]
+			self.sm.set_sm_list(output=sourcemeterOutput.VOLTAGE, levels=levels, delay=plan.delay)
+			sweeps[direction] = self.sm.read_sweep()
+		self.sm.output_off()
+		return sweeps
+
+	def run_planned_sweeps(
+		self,
+		max_voltage: float,
+		time_budget: float = JV_TIME_BUDGET,
+		sweep_direction: sweepDirection = sweepDirection.REVERSE,
+	) -> dict[sweepDirection, NDArray[np.float64]]:
+		# List sweeps with points concentrated around the knee and Voc, planned from the previous sweep or a short
+		# linear pre-scan whose duration is taken out of the time budget. Each direction gets the full budget.
+		previous = self.last_sweep
+		if previous is None:
+			coarse = np.linspace(max_voltage, 0.0, COARSE_SWEEP_POINTS)
+			self.sm.set_sm_list(output=sourcemeterOutput.VOLTAGE, levels=coarse, delay=SOURCE_DELAY)
+			previous = self.sm.read_sweep()[:, :2]
+			time_budget -= COARSE_SWEEP_POINTS * SOURCE_DELAY
+
+		plan = plan_sweep(previous, time_budget, v_max=max_voltage)
+		logger.info("Running planned JV sweep of %s points over %.1f s.", len(plan.levels), plan.duration)
+
+		sweeps = self.run_sweep_plan(plan, sweep_direction)
+		self.last_sweep = next(iter(sweeps.values()))[:, :2]
+		return sweeps
+
+	def run_dark_sweeps(
+		self,
+		max_voltage: float,
+		time_budget: float = JV_TIME_BUDGET,
+		sweep_direction: sweepDirection = sweepDirection.REVERSE,
+	) -> dict[sweepDirection, NDArray[np.float64]]:
+		# A dark curve has no knee to plan around, and must not become the sweep later light sweeps are planned from
+		plan = linear_plan(max_voltage, time_budget)
+		logger.info("Running dark JV sweep of %s points over %.1f s.", len(plan.levels), plan.duration)
+		return self.run_sweep_plan(plan, sweep_direction)
+
+	def planned_jv_sweep(
+		self,
+		max_voltage: float,
+		time_budget: float = JV_TIME_BUDGET,
+		sweep_direction: sweepDirection = sweepDirection.REVERSE,
+	) -> Sequence[Any]:
+		sweeps = self.run_planned_sweeps(max_voltage, time_budget, sweep_direction)
+		if sweep_direction != sweepDirection.BOTH:
+			return [sweeps[sweep_direction][:, 0], sweeps[sweep_direction][:, 1]]
+
+		fwd_sweep, bcwd_sweep = sweeps[sweepDirection.FORWARD], sweeps[sweepDirection.REVERSE]
+		return [fwd_sweep[:, 0], bcwd_sweep[:, 0], fwd_sweep[:, 1], bcwd_sweep[:, 1]]
+
+	def jv_limit(self) -> float:
+		# Sweeps run a little past the last Voc, or up to the protection limit before any Voc is known
+		if self.voc > 0:
+			return min(self.voc * JV_VOLTAGE_MARGIN, self.sm.voltage_protection)
+		return self.sm.voltage_protection
+
+	def record_jv(self, sweeps: dict[sweepDirection, NDArray[np.float64]], index: int, light: bool = True) -> None:
+		for direction, sweep in sweeps.items():
+			rows = np.rec.fromarrays(
+				[
+					np.full(len(sweep), index),
+					np.full(len(sweep), direction == sweepDirection.REVERSE),
+					np.full(len(sweep), light),
+					sweep[:, 2],
+					sweep[:, 1],
+					sweep[:, 0],
+				],
+				dtype=JV_DTYPE,
+			)
+			if self.jv_writer is not None:
+				self.jv_writer.extend(rows)
+			if self.live_plot is not None:
+				self.live_plot.send_jv(rows)
+
+	def periodic_jv_sweep(self, scheduler: JVScheduler) -> float:
+		# Pause tracking for a quick JV sweep, record it and re-seed the tracker at the sweep's MPP. The sweep ends with
+		# the output off, so tracking resumes after the same ramp up to Vmpp as at the start of the run.
+		vmpp = self.light_jv_sweep(scheduler.sweeps, scheduler.time_budget, scheduler.sweep_direction)
+		self.walk_to_initial_vmpp()
+		return vmpp
+
+	def light_jv_sweep(
+		self,
+		index: int,
+		time_budget: float = JV_TIME_BUDGET,
+		sweep_direction: sweepDirection = sweepDirection.BOTH,
+	) -> float:
+		sweeps = self.run_planned_sweeps(self.jv_limit(), time_budget, sweep_direction)
+		self.record_jv(sweeps, index)
+
+		if len(sweeps) == 2:
+			result = self.hysteresis = analyse_hysteresis(
+				sweeps[sweepDirection.FORWARD][:, :2], sweeps[sweepDirection.REVERSE][:, :2]
+			)
+			params = result.average
+			logger.info("JV sweep %s hysteresis index %.3f.", index, result.hysteresis_index)
+		else:
+			params = calc_pv_parameters(self.last_sweep)
+
+		if np.isfinite(params.voc) and params.voc > 0:
+			self.voc = float(params.voc)
+		self.vmpp = float(params.vmpp)
+		self.v_set = self.vmpp
+		self.algorithm.reset(self.vmpp)
+		logger.info("JV sweep %s re-seeded Vmpp at %.4f V, Voc %.4f V.", index, self.vmpp, self.voc)
+		return self.vmpp
 
 	@property
 	def nPoints(self):
@@ -83,59 +299,136 @@ class MaximumPowerPointTracker:
 		self._nPoints = Voc / (0.05 * SWEEP_RATE)  # voltage (V) / (delay (S) * sweep_rate (V/s))
 
 	def find_initial_vmpp(self):
-		Voc = self.find_open_circuit_voltage()
+		Voc = self.find_open_circuit_voltage().voc
+		self.voc = Voc
 		jv_sweep = self.jv_sweep(
 			max_voltage=Voc,
 			sweep_direction=sweepDirection.REVERSE,
 		)
-		if self.dummyMode:
-			jv_sweep = pd.read_csv("tests/data/jv_test_data.csv", header=None).to_numpy()
-		else:
-			jv_sweep = np.reshape(jv_sweep, (-1, 2))
+		jv_sweep = np.column_stack(jv_sweep)
+		self.last_sweep = jv_sweep  # later planned sweeps start from this one
 
 		initial_Vmpp = calc_mpp_from_iv(jv_sweep)
-		logger.info(f"Initial Vmpp found: {initial_Vmpp}")
+		logger.info("Initial Vmpp found: %s", initial_Vmpp)
 
 		return initial_Vmpp
 
-	# !--------------------- UNFISNISHED IMPLEMENTATIONS BELOW -----------------------------!
-
-	# def walk_to_initial_vmpp(self):
-	# 	Vset = 0
-	# 	while Vset < self._initial_vmpp:
-	# 		self._sm.set_sm_output(output=sourcemeterOutput.VOLTAGE)  # set to output voltage at vmpp
-	# 		Vset += self._vstep
-
-	# def run(self):
-	# 	self.find_initial_vmpp()
-	# 	self.walk_to_initial_vmpp()
-	# 	i, v, t0 = self.read_output()
-	# 	self._start_time = t0
-
-	# 	previous_power = abs(v * i)
-	# 	direction = 1
-
-	# 	try:
-	# 		while True:
-	# 			self._sm.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=self.vmpp)
-	# 			i, v, tx = self._sm.read_output()
-	# 			power = abs(v * i)
-
-	# 			self.check_runtime(tx)
-	# 			self.update_plot(i, v, tx)
-
-	# 			if power > previous_power:
-	# 				self.Vmpp += direction * self.v_step
-	# 			else:
-	# 				direction *= -1
-	# 				self.Vmpp += direction * self.v_step
-
-	# 			previous_power = power
-	# 	except KeyboardInterrupt:
-	# 		pass
-	# 	except OutputLimitsExceededError:  # if something is running away
-	# 		pass
-	# 	finally:
-	# 		# set output to 0 should be handled by context manager but just as fail safe
-	# 		self.sm.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0, mode=sourcemeterMode.FIXED)
-	# 		logger.info("Tracking finished.")
+	def walk_to_initial_vmpp(self) -> None:
+		logger.info("Walking output up to initial Vmpp of %s V.", self.vmpp)
+		self.sm.ramp_output(self.vmpp, output=sourcemeterOutput.VOLTAGE, slew_rate=RAMP_SLEW_RATE, max_step=self.v_step)
+		self.v_set = self.vmpp
+
+	def measure(self, v_set: float) -> list[float]:
+		# Apply a set point and read back one tracking data row
+		i, v, t, host_ns = self.sm.set_and_read(v_set)
+		self.clock_sync.update(t, host_ns * 1e-9)
+		return [t, v, i, abs(v * i), v_set, host_ns, self.clock_sync.to_host(t)]
+
+	def track_step(self) -> Sequence[float]:
+		# One perturbation: apply the set point, measure, and let the tracking algorithm choose the next set point
+		sample = self.measure(self.v_set)
+		self.v_set = self.algorithm.next_voltage(sample[1], sample[2])
+		return sample
+
+	def record(self, sample: Sequence[float]) -> None:
+		self.rows_recorded += 1
+		if self.pipeline is not None:
+			self.pipeline.publish(sample)  # writing and logging happen on the consumer threads
+		elif self.data_writer is not None:
+			self.data_writer.append(sample)
+
+	def track(self) -> int:
+		# Tracking loop from the current set point until tracking_time has elapsed or a stop is requested
+		if self.elapsed:
+			logger.info(
+				"Tracking maximum power point for the remaining %.0f seconds.", self.tracking_time - self.elapsed
+			)
+		else:
+			logger.info("Tracking maximum power point for %s seconds.", self.tracking_time)
+		clock = self.clock if self.clock is not None else time.monotonic
+		last = clock()
+		if self.jv_scheduler is not None:
+			self.jv_scheduler.start(last)
+		steps = 0
+		try:
+			while self.elapsed < self.tracking_time and not self.stop_event.is_set():
+				if self.checkpoint is not None and self.checkpoint.due(last):
+					self.checkpoint.save(self.checkpoint_state(), last)
+
+				sample = self.track_step()
+				now = clock()
+				self.elapsed += now - last  # only tracking steps count, not the JV sweeps between them
+				last = now
+				self.record(sample)
+				steps += 1
+
+				if self.jv_scheduler is not None:
+					reason = self.jv_scheduler.due(now, sample[3])
+					if reason is not None:
+						logger.info("Running JV sweep %s: %s.", self.jv_scheduler.sweeps, reason)
+						self.periodic_jv_sweep(self.jv_scheduler)
+						last = clock()
+						self.jv_scheduler.mark(last)
+		finally:
+			# also on a crash, so a resumed run continues from the last completed step
+			if self.checkpoint is not None:
+				self.checkpoint.save(self.checkpoint_state(), last)
+		logger.info("Tracking finished after %s steps.", steps)
+		if self.clock_sync.samples:
+			logger.info(
+				"Instrument clock drift %.1f ppm, offset %.6f s from the host clock.",
+				self.clock_sync.drift_ppm,
+				self.clock_sync.offset,
+			)
+		return steps
+
+	def checkpoint_state(self) -> dict[str, Any]:
+		return {
+			"elapsed": self.elapsed,
+			# rows of each file up to this point, a resumed run cuts off what was written after
+			"rows": {"data": self.rows_recorded, **({"jv": self.jv_writer.rows_written} if self.jv_writer else {})},
+			"vmpp": self.vmpp,
+			"v_set": self.v_set,
+			"voc": self.voc,
+			"algorithm": type(self.algorithm).__name__,
+			"algorithm_state": self.algorithm.state(),
+			"jv_sweeps": self.jv_scheduler.sweeps if self.jv_scheduler is not None else 0,
+			"last_sweep": self.last_sweep.tolist() if self.last_sweep is not None else None,
+		}
+
+	def restore(self, state: dict[str, Any]) -> None:
+		# Pick up a checkpointed run at its last set point, which the output is walked back to
+		self.elapsed = state["elapsed"]
+		self.rows_recorded = state.get("rows", {}).get("data", 0)
+		self.vmpp = state["v_set"]
+		self.voc = state["voc"]
+		if state.get("last_sweep") is not None:
+			self.last_sweep = np.asarray(state["last_sweep"], dtype=np.float64)
+		if self.jv_scheduler is not None:
+			self.jv_scheduler.sweeps = state["jv_sweeps"]
+
+		self.algorithm.reset(self.vmpp)
+		if state["algorithm"] == type(self.algorithm).__name__:
+			self.algorithm.restore(state["algorithm_state"])
+		else:
+			logger.warning("Checkpoint was tracked with %s, restarting the algorithm state.", state["algorithm"])
+
+	def run(self, resume_from: Optional[dict[str, Any]] = None) -> None:
+		# A resumed run skips the Voc hold and initial sweep, so the device sees no extra light soaking or bias history
+		if resume_from is None:
+			self.vmpp = self.find_initial_vmpp()
+		else:
+			self.restore(resume_from)
+
+		try:
+			self.walk_to_initial_vmpp()
+			if resume_from is None:
+				self.algorithm.reset(self.vmpp)
+			self.track()
+
+		except KeyboardInterrupt:
+			logger.info("Tracking interrupted by user.")
+			self.stop_event.set()  # also stops whatever would run after this tracker, such as the next queued job
+		finally:
+			# OutputLimitsExceededError propagates to the caller once the output is safely off
+			self.sm.output_off()
@@ -0,0 +1,161 @@
+import threading
+
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, Any, Optional, Sequence
+
+from controllers.interfaces import SourcemeterController
+from controllers.instrumentation import instrument_controller
+from core.algorithms import trackingAlgorithm, create_tracking_algorithm
+from core.core import MaximumPowerPointTracker
+from core.pipeline import create_tracking_pipeline
+from core.scheduler import create_jv_scheduler
+from plotting.live_plot import create_live_plot
+
+from utils.data_writer import StreamingDataWriter, make_run_path, jv_path, timing_path, JV_DTYPE
+from utils.logger_config import setup_logger, add_channel_log, remove_channel_log
+from utils.validator import ChannelSetting
+from utils.constants import VOLTAGE_PROTECTION, CURRENT_COMPLIANCE, SIMULATED_GPIB_LATENCY
+
+if TYPE_CHECKING:
+	import pyvisa as visa
+
+logger = setup_logger()
+
+
+def channel_name(channel: ChannelSetting) -> str:
+	return f"GPIB{channel.gpib_address}"
+
+
+class MultiChannelTracker:
+	# Tracks several sourcemeters from one process. Every channel gets its own thread, named after its GPIB address,
+	# while all channels share a single VISA resource manager.
+	def __init__(
+		self,
+		channels: Sequence[ChannelSetting],
+		tracking_time: int,
+		dummyMode: bool,
+		algorithm: trackingAlgorithm = trackingAlgorithm.PERTURB_AND_OBSERVE,
+		run_metadata: Optional[dict[str, Any]] = None,
+		jv_interval: Optional[float] = None,
+		jv_power_drop: Optional[float] = None,
+		plot: bool = False,
+		timing: bool = False,
+		log_json: bool = False,
+	):
+		addresses = [channel.gpib_address for channel in channels]
+		if len(set(addresses)) != len(addresses):
+			raise ValueError(f"Each channel needs a unique GPIB address, got {addresses}.")
+
+		self.channels = list(channels)
+		self.tracking_time = tracking_time
+		self.dummyMode = dummyMode
+		self.algorithm = algorithm
+		self.run_metadata = run_metadata if run_metadata is not None else {}
+		self.jv_interval = jv_interval
+		self.jv_power_drop = jv_power_drop
+		self.plot = plot
+		self.timing = timing
+		self.log_json = log_json
+		self.stop_event = threading.Event()
+		self.errors: dict[str, BaseException] = {}
+
+	def _open_channel(
+		self, stack: ExitStack, channel: ChannelSetting, rm: Optional["visa.ResourceManager"]
+	) -> SourcemeterController:
+		# controllers are imported on first use, a dummy bench never loads pyvisa
+		if self.dummyMode:
+			from controllers.dummyK2400 import dummyK2400Context
+			from controllers.simulatedK2400 import simulatedK2400Controller, SingleDiodeModel
+
+			resource = stack.enter_context(dummyK2400Context(address=channel.gpib_address))
+			return simulatedK2400Controller(
+				resource=resource,
+				voltage_protection=VOLTAGE_PROTECTION,
+				current_compliance=CURRENT_COMPLIANCE,
+				model=SingleDiodeModel(area_cm2=channel.device_area_cm2),
+				latency=SIMULATED_GPIB_LATENCY,
+			)
+
+		from controllers.K2400 import K2400Context, K2400Controller
+
+		resource = stack.enter_context(K2400Context(address=channel.gpib_address, resource_manager=rm))
+		return K2400Controller(
+			resource=resource, voltage_protection=VOLTAGE_PROTECTION, current_compliance=CURRENT_COMPLIANCE
+		)
+
+	def run_channel(self, channel: ChannelSetting, rm: Optional["visa.ResourceManager"]) -> None:
+		name = channel_name(channel)
+		path = make_run_path(channel.metadata, channel.gpib_address)
+		handler = add_channel_log(name, path.with_suffix(".log"), json_lines=self.log_json)  # next to its data
+		try:
+			with ExitStack() as stack:
+				sm = self._open_channel(stack, channel, rm)
+				metadata = {**self.run_metadata, "channel": channel.model_dump(mode="json")}
+				writer = stack.enter_context(StreamingDataWriter(path, metadata=metadata))
+				if self.timing:
+					stack.callback(instrument_controller(sm).report, timing_path(writer.path))
+
+				live_plot = create_live_plot(writer.path.stem) if self.plot else None  # one window per channel
+				if live_plot is not None:
+					stack.enter_context(live_plot)
+				pipeline = stack.enter_context(
+					create_tracking_pipeline(
+						writer.extend_buffered, live_plot.send_samples if live_plot else None, name=name
+					)
+				)
+
+				jv_scheduler = create_jv_scheduler(self.jv_interval, self.jv_power_drop)  # schedules are per channel
+				jv_writer = None
+				if jv_scheduler is not None:
+					jv_writer = stack.enter_context(
+						StreamingDataWriter(jv_path(writer.path), dtype=JV_DTYPE, metadata=metadata)
+					)
+				mppt = MaximumPowerPointTracker(
+					sourcemeter=sm,
+					cell_area=channel.device_area_cm2,
+					tracking_time=self.tracking_time,
+					dummyMode=self.dummyMode,
+					algorithm=create_tracking_algorithm(self.algorithm),
+					stop_event=self.stop_event,
+					pipeline=pipeline,
+					clock=(lambda: sm.clock) if self.dummyMode else None,  # type: ignore
+					jv_scheduler=jv_scheduler,
+					jv_writer=jv_writer,
+					live_plot=live_plot,
+				)
+				mppt.run()
+		except Exception as e:
+			# one failed channel must not take the rest of the bench down
+			self.errors[name] = e
+			logger.error("Channel %s stopped with an error: %s", name, e)
+		finally:
+			remove_channel_log(handler)
+
+	def run(self) -> None:
+		rm = None
+		if not self.dummyMode:
+			import pyvisa as visa
+
+			rm = visa.ResourceManager()
+		threads = [
+			threading.Thread(target=self.run_channel, args=(channel, rm), name=channel_name(channel))
+			for channel in self.channels
+		]
+
+		logger.info("Starting %s tracking channels.", len(threads))
+		try:
+			for thread in threads:
+				thread.start()
+			for thread in threads:
+				while thread.is_alive():
+					thread.join(timeout=0.5)  # short joins keep the main thread responsive to KeyboardInterrupt
+		except KeyboardInterrupt:
+			logger.info("Tracking interrupted by user, stopping all channels.")
+			self.stop_event.set()
+			for thread in threads:
+				thread.join()
+		finally:
+			if rm is not None:
+				rm.close()
+
+		logger.info("All channels finished, %s with errors.", len(self.errors))
@@ -0,0 +1,167 @@
+import math
+import time
+import threading
+
+from typing import Callable, Iterator, Optional, Sequence
+
+from controllers.interfaces import SourcemeterController, SwitchController
+from core.core import MaximumPowerPointTracker
+from utils.logger_config import setup_logger
+from utils.constants import MUX_MAX_OVERHEAD, MUX_MAX_REVISIT, MUX_SETTLE_READS
+
+logger = setup_logger()
+
+
+def pixel_name(channel: str) -> str:
+	# Switch channels such as 1!3 in a form fit for file names
+	return "CH" + channel.replace("!", "-")
+
+
+class VisitScheduler:
+	# Order and length of pixel visits. A switch costs the output off, the relay settling and the settle readings,
+	# so each visit takes enough tracking steps to keep switching below max_overhead of the time, as long as no pixel
+	# waits much longer than max_revisit for its next visit. Both costs are running means of the measured times.
+	def __init__(
+		self,
+		max_overhead: float = MUX_MAX_OVERHEAD,
+		max_revisit: float = MUX_MAX_REVISIT,
+		smoothing: float = 0.2,
+	):
+		if not 0 < max_overhead < 1:
+			raise ValueError(f"max_overhead must lie between 0 and 1, got {max_overhead}.")
+		self.max_overhead = max_overhead
+		self.max_revisit = max_revisit
+		self.smoothing = smoothing
+		self.switch_time: Optional[float] = None  # s per switch
+		self.step_time: Optional[float] = None  # s per tracking step
+		self.n_channels: int = 1
+
+	def order(self, channels: Sequence[str]) -> Iterator[str]:
+		# Passes alternate direction, so the pixel ending one pass opens the next without a switch. That saves one
+		# switch per pass, half of them with two pixels.
+		self.n_channels = len(channels)
+		passes = list(channels)
+		while True:
+			yield from passes
+			passes.reverse()
+
+	def _update(self, mean: Optional[float], value: float) -> float:
+		return value if mean is None else mean + self.smoothing * (value - mean)
+
+	def record_switch(self, seconds: float) -> None:
+		self.switch_time = self._update(self.switch_time, seconds)
+
+	def record_steps(self, seconds: float, steps: int) -> None:
+		if steps:
+			self.step_time = self._update(self.step_time, seconds / steps)
+
+	@property
+	def dwell(self) -> int:
+		# Tracking steps per visit, one until both costs have been measured
+		if self.switch_time is None or not self.step_time:
+			return 1
+		amortised = self.switch_time * (1 - self.max_overhead) / (self.max_overhead * self.step_time)
+
+		# a pixel at the end of a pass waits for the visits of all others twice before its next visit
+		waiting = 2 * (self.n_channels - 1)
+		if waiting:
+			longest = (self.max_revisit / waiting - self.switch_time) / self.step_time
+		else:
+			longest = self.max_revisit / self.step_time
+		return max(1, math.ceil(min(amortised, longest)))
+
+
+class MultiplexedTracker:
+	# Time-slices one sourcemeter across the pixels behind a switch. Every pixel keeps its own tracker, so set point,
+	# algorithm state, clock fit and data stream are per pixel, while this class only decides which pixel is on.
+	def __init__(
+		self,
+		switch: SwitchController,
+		trackers: dict[str, MaximumPowerPointTracker],
+		tracking_time: int,
+		scheduler: Optional[VisitScheduler] = None,
+		settle_reads: int = MUX_SETTLE_READS,
+		clock: Optional[Callable[[], float]] = None,
+		stop_event: Optional[threading.Event] = None,
+	):
+		unknown = sorted(set(trackers) - set(switch.channels))
+		if unknown:
+			raise ValueError(f"Pixels {unknown} are not channels of the switch {switch.channels}.")
+		if len({id(tracker.sm) for tracker in trackers.values()}) > 1:
+			raise ValueError("Multiplexed pixels must all be tracked with the same sourcemeter.")
+
+		self.switch = switch
+		self.trackers = trackers
+		self.sm: SourcemeterController = next(iter(trackers.values())).sm
+		self.tracking_time = tracking_time
+		self.scheduler = scheduler if scheduler is not None else VisitScheduler()
+		self.settle_reads = settle_reads
+		self.clock: Optional[Callable[[], float]] = clock  # defaults to time.monotonic
+		self.stop_event: threading.Event = stop_event if stop_event is not None else threading.Event()
+		self.switches: int = 0
+		self.visits: int = 0
+
+	def select(self, channel: str) -> None:
+		self.sm.output_off()
+		self.switch.select(channel)
+		self.switches += 1
+
+	def visit(self, channel: str) -> int:
+		# Switch to the pixel if needed, let it settle at its own set point, then run one dwell of tracking steps
+		clock = self.clock if self.clock is not None else time.monotonic
+		tracker = self.trackers[channel]
+		if channel != self.switch.selected:
+			start = clock()
+			self.select(channel)
+			for _ in range(self.settle_reads):
+				self.sm.set_and_read(tracker.v_set)
+			self.scheduler.record_switch(clock() - start)
+
+		start = clock()
+		steps = 0
+		for _ in range(self.scheduler.dwell):
+			if self.stop_event.is_set():
+				break
+			tracker.record(tracker.track_step())
+			steps += 1
+		self.scheduler.record_steps(clock() - start, steps)
+		self.visits += 1
+		return steps
+
+	def find_initial_vmpp(self) -> None:
+		# Voc hold and initial sweep pixel by pixel. There is no slow walk up to Vmpp: every visit starts from open
+		# circuit once the switch has opened, so each pixel simply starts tracking from its initial Vmpp.
+		for channel, tracker in self.trackers.items():
+			self.select(channel)
+			tracker.vmpp = tracker.find_initial_vmpp()
+			tracker.v_set = tracker.vmpp
+			tracker.algorithm.reset(tracker.vmpp)
+
+	def track(self) -> int:
+		logger.info("Tracking %s pixels on one sourcemeter for %s seconds.", len(self.trackers), self.tracking_time)
+		clock = self.clock if self.clock is not None else time.monotonic
+		order = self.scheduler.order(list(self.trackers))
+		start = clock()
+		steps = 0
+		while clock() - start < self.tracking_time and not self.stop_event.is_set():
+			steps += self.visit(next(order))
+
+		logger.info(
+			"Tracking finished after %s steps in %s visits with %s switches, %s steps per visit at the end.",
+			steps,
+			self.visits,
+			self.switches,
+			self.scheduler.dwell,
+		)
+		return steps
+
+	def run(self) -> None:
+		try:
+			self.find_initial_vmpp()
+			self.track()
+
+		except KeyboardInterrupt:
+			logger.info("Tracking interrupted by user.")
+		finally:
+			self.sm.output_off()
+			self.switch.disconnect()
@@ -0,0 +1,175 @@
+import threading
+import numpy as np
+
+from types import TracebackType
+from typing import Any, Callable, Sequence
+
+from numpy.typing import NDArray
+
+from utils.data_writer import TRACKING_DTYPE
+from utils.logger_config import setup_logger
+
+logger = setup_logger()
+
+
+class SampleRingBuffer:
+	# Buffer of structured samples. push() never blocks the producer: once full, the oldest samples are overwritten
+	# and counted in dropped, or with overwrite=False the buffer doubles, for consumers that must see every sample.
+	def __init__(self, capacity: int = 65536, dtype: np.dtype = TRACKING_DTYPE, overwrite: bool = True):
+		self.capacity = capacity
+		self.overwrite = overwrite
+		self.dropped: int = 0
+		self._data: NDArray[Any] = np.zeros(capacity, dtype=dtype)
+		self._head: int = 0
+		self._count: int = 0
+		self._not_empty = threading.Condition()
+
+	def __len__(self) -> int:
+		return self._count
+
+	def _ordered(self) -> NDArray[Any]:
+		# Buffered samples oldest first, as at most two slices of the ring
+		start = (self._head - self._count) % self.capacity
+		end = start + self._count
+		if end <= self.capacity:
+			return self._data[start:end].copy()
+		return np.concatenate([self._data[start:], self._data[: end - self.capacity]])
+
+	def _grow(self) -> None:
+		data = np.zeros(2 * self.capacity, dtype=self._data.dtype)
+		data[: self._count] = self._ordered()
+		self._data = data
+		self._head = self._count
+		self.capacity *= 2
+
+	def push(self, sample: Sequence[float]) -> None:
+		with self._not_empty:
+			if self._count == self.capacity and not self.overwrite:
+				self._grow()
+			self._data[self._head] = tuple(sample)
+			self._head = (self._head + 1) % self.capacity
+			if self._count == self.capacity:
+				self.dropped += 1
+			else:
+				self._count += 1
+			self._not_empty.notify()
+
+	def drain(self, timeout: float | None = None) -> NDArray[Any]:
+		# Returns every buffered sample, oldest first, waiting up to timeout for at least one
+		with self._not_empty:
+			if not self._count:
+				self._not_empty.wait(timeout)
+			batch = self._ordered()
+			self._count = 0
+			return batch
+
+
+class PipelineConsumer(threading.Thread):
+	def __init__(
+		self, name: str, handler: Callable[[NDArray[Any]], None], capacity: int = 65536, overwrite: bool = True
+	):
+		super().__init__(name=name, daemon=True)
+		self.handler = handler
+		self.buffer = SampleRingBuffer(capacity, overwrite=overwrite)
+		self.errors: int = 0
+		self._stopping = threading.Event()
+
+	def run(self) -> None:
+		while not (self._stopping.is_set() and not len(self.buffer)):
+			batch = self.buffer.drain(timeout=0.1)
+			if not len(batch):
+				continue
+			try:
+				self.handler(batch)
+			except Exception as e:
+				# a failing consumer must never stall acquisition
+				self.errors += 1
+				logger.error("Pipeline consumer '%s' failed on a batch of %s samples: %s", self.name, len(batch), e)
+
+	def stop(self) -> None:
+		self._stopping.set()
+		self.join()
+
+
+class AcquisitionPipeline:
+	# Fans samples out from the acquisition thread to consumer threads (file writing, logging, plotting) so slow
+	# I/O never stretches the tracking step period. Each consumer drains its own ring buffer in batches.
+	def __init__(self, capacity: int = 65536):
+		self.capacity = capacity
+		self.consumers: list[PipelineConsumer] = []
+
+	def add_consumer(
+		self, name: str, handler: Callable[[NDArray[Any]], None], overwrite: bool = True
+	) -> PipelineConsumer:
+		consumer = PipelineConsumer(name=name, handler=handler, capacity=self.capacity, overwrite=overwrite)
+		self.consumers.append(consumer)
+		return consumer
+
+	def publish(self, sample: Sequence[float]) -> None:
+		for consumer in self.consumers:
+			consumer.buffer.push(sample)
+
+	@property
+	def dropped(self) -> int:
+		return sum(consumer.buffer.dropped for consumer in self.consumers)
+
+	def start(self) -> "AcquisitionPipeline":
+		for consumer in self.consumers:
+			consumer.start()
+		return self
+
+	def stop(self) -> None:
+		for consumer in self.consumers:
+			consumer.stop()
+		if self.dropped:
+			logger.warning("Acquisition pipeline dropped %s samples because consumers fell behind.", self.dropped)
+
+	def __enter__(self) -> "AcquisitionPipeline":
+		return self.start()
+
+	def __exit__(
+		self,
+		exc_type: type[BaseException] | None,
+		exc_val: BaseException | None,
+		exc_tb: TracebackType | None,
+	) -> None:
+		self.stop()
+
+
+class TrackingSummaryLogger:
+	# Logging consumer: one summary line per interval instead of a log call on every tracking step
+	def __init__(self, interval: float = 60.0, name: str | None = None):
+		self.interval = interval
+		self.prefix = f"{name}: " if name else ""  # tells the devices apart when several share a log
+		self._last_logged: float | None = None
+
+	def __call__(self, batch: NDArray[Any]) -> None:
+		t = float(batch["t"][-1])
+		if self._last_logged is not None and t - self._last_logged < self.interval:
+			return
+		self._last_logged = t
+		logger.info(
+			"%sTracking at t = %.1f s: V = %.4f V, P = %.4e W (mean P = %.4e W over %d samples).",
+			self.prefix,
+			t,
+			batch["v"][-1],
+			batch["p"][-1],
+			batch["p"].mean(),
+			len(batch),
+		)
+
+
+def create_tracking_pipeline(
+	writer: Callable[[NDArray[Any]], None] | None = None,
+	plot: Callable[[NDArray[Any]], None] | None = None,
+	name: str | None = None,
+) -> AcquisitionPipeline:
+	# Consumer threads are named after the device, e.g. GPIB20-logger, so its channel log picks up their records
+	prefix = f"{name}-" if name else ""
+	pipeline = AcquisitionPipeline()
+	if writer is not None:
+		pipeline.add_consumer(f"{prefix}writer", writer, overwrite=False)  # the data file must get every sample
+	pipeline.add_consumer(f"{prefix}logger", TrackingSummaryLogger(name=name))
+	if plot is not None:
+		pipeline.add_consumer(f"{prefix}plot", plot)
+	return pipeline
@@ -0,0 +1,53 @@
+from typing import Optional
+
+from controllers.interfaces import sweepDirection
+
+from utils.constants import JV_TIME_BUDGET
+
+
+class JVScheduler:
+	# Decides when tracking pauses for a quick JV sweep: every interval seconds of tracking time, and/or whenever the
+	# tracked power falls power_drop (a fraction) below its peak since the previous sweep
+	def __init__(
+		self,
+		interval: Optional[float] = None,
+		power_drop: Optional[float] = None,
+		time_budget: float = JV_TIME_BUDGET,
+		sweep_direction: sweepDirection = sweepDirection.BOTH,
+	):
+		if interval is None and power_drop is None:
+			raise ValueError("A JV schedule needs an interval, a power drop threshold or both.")
+		if interval is not None and interval <= 0:
+			raise ValueError(f"JV interval must be positive, got {interval} s.")
+		if power_drop is not None and not 0 < power_drop < 1:
+			raise ValueError(f"JV power drop threshold must lie between 0 and 1, got {power_drop}.")
+
+		self.interval = interval
+		self.power_drop = power_drop
+		self.time_budget = time_budget
+		self.sweep_direction = sweep_direction
+		self.sweeps: int = 0
+		self.start(0.0)
+
+	def start(self, t: float) -> None:
+		self.last_sweep_time = t
+		self.peak_power = 0.0
+
+	def due(self, t: float, p: float) -> Optional[str]:
+		# Reason a sweep is due at tracking time t with tracked power p, or None
+		self.peak_power = max(self.peak_power, p)
+		if self.interval is not None and t - self.last_sweep_time >= self.interval:
+			return f"{self.interval} s interval elapsed"
+		if self.power_drop is not None and p < (1 - self.power_drop) * self.peak_power:
+			return f"power fell {self.power_drop:.0%} below {self.peak_power:.3g} W"
+		return None
+
+	def mark(self, t: float) -> None:
+		self.sweeps += 1
+		self.start(t)
+
+
+def create_jv_scheduler(interval: Optional[float], power_drop: Optional[float]) -> Optional[JVScheduler]:
+	if interval is None and power_drop is None:
+		return None
+	return JVScheduler(interval=interval, power_drop=power_drop)
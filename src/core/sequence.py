@@ -0,0 +1,180 @@
+import time
+import numpy as np
+
+from enum import Enum
+from typing import TYPE_CHECKING, Callable, NamedTuple, Optional, Sequence
+
+from controllers.interfaces import ShutterContext, sweepDirection
+from utils.data_writer import StreamingDataWriter, SHUTTER_DTYPE
+from utils.logger_config import setup_logger
+from utils.constants import VOC_MAX_HOLD, JV_TIME_BUDGET
+
+if TYPE_CHECKING:
+	from core.core import MaximumPowerPointTracker
+
+logger = setup_logger()
+
+
+class sequenceStep(Enum):
+	VOC = "voc"  # open circuit hold in the light until Voc settles
+	JV = "jv"  # light JV sweep, re-seeding the tracked Vmpp
+	DARK_JV = "dark_jv"  # JV sweep with the shutter closed
+	TRACK = "track"  # MPP tracking in the light
+	DARK = "dark"  # output off and shutter closed
+	PULSE = "pulse"  # light pulse at the held set point, sampled through a dark tail as long as the pulse
+
+
+DARK_STEPS = {sequenceStep.DARK_JV, sequenceStep.DARK, sequenceStep.PULSE}
+TIMED_STEPS = {sequenceStep.DARK, sequenceStep.PULSE}  # steps without a sensible default duration
+
+
+class SequenceStep(NamedTuple):
+	kind: sequenceStep
+	# s: hold limit for voc, time budget per direction for JV steps and the length of the others. 0 takes the
+	# default, the run tracking time for track steps.
+	duration: float = 0.0
+
+
+def parse_step(spec: str) -> SequenceStep:
+	# Steps given on the command line as STEP[:SECONDS], e.g. track:3600
+	name, _, duration = spec.partition(":")
+	kind = sequenceStep(name)
+	if not duration:
+		if kind in TIMED_STEPS:
+			raise ValueError(f"Sequence step '{name}' needs a duration, e.g. {name}:60.")
+		return SequenceStep(kind)
+	if float(duration) <= 0:
+		raise ValueError(f"Sequence step '{name}' needs a positive duration, got {duration} s.")
+	return SequenceStep(kind, float(duration))
+
+
+class MeasurementSequence:
+	# Runs measurement steps back to back on one tracker, switching the light with the shutter in between. Shutter
+	# edges are written with their host time, the clock of the host_ns column of the tracking data, so transients
+	# line up with the edges that caused them.
+	def __init__(
+		self,
+		tracker: "MaximumPowerPointTracker",
+		steps: Sequence[SequenceStep],
+		shutter: Optional[ShutterContext] = None,
+		events_writer: Optional[StreamingDataWriter] = None,
+		sleep: Callable[[float], None] = time.sleep,
+	):
+		dark = sorted({step.kind.value for step in steps if step.kind in DARK_STEPS})
+		if dark and shutter is None:
+			raise ValueError(f"Sequence steps {dark} need shutter control.")
+
+		self.tracker = tracker
+		self.steps = list(steps)
+		self.shutter = shutter
+		self.events_writer = events_writer
+		self.sleep = sleep  # waits out dark steps, the simulated sourcemeter passes its own clock
+		self.tracking_time = tracker.tracking_time
+		self.light: Optional[bool] = None  # unknown until the shutter is first driven
+		self.sweeps: int = 0
+		self._recorded: int = 0  # shutter events already written
+
+	def record_events(self) -> None:
+		if self.shutter is None:
+			return
+		events = self.shutter.timeline[self._recorded :]
+		self._recorded += len(events)
+		if events and self.events_writer is not None:
+			self.events_writer.extend(
+				np.rec.fromarrays([[e.host_ns for e in events], [e.open for e in events]], dtype=SHUTTER_DTYPE)
+			)
+
+	def set_light(self, on: bool) -> None:
+		if self.shutter is None or self.light == on:
+			return
+		if on:
+			self.shutter.open()
+		else:
+			self.shutter.close()
+		self.light = on
+		self.record_events()
+
+	def next_sweep(self) -> int:
+		# Sequence sweeps share their numbering with periodic sweeps during tracking, and reset that schedule
+		scheduler = self.tracker.jv_scheduler
+		if scheduler is None:
+			self.sweeps += 1
+			return self.sweeps - 1
+		index = scheduler.sweeps
+		scheduler.mark(self.tracker.clock() if self.tracker.clock is not None else time.monotonic())
+		return index
+
+	def voc(self, step: SequenceStep) -> None:
+		self.set_light(True)
+		self.tracker.voc = self.tracker.find_open_circuit_voltage(max_hold=step.duration or VOC_MAX_HOLD).voc
+
+	def jv(self, step: SequenceStep) -> None:
+		self.set_light(True)
+		self.tracker.light_jv_sweep(self.next_sweep(), step.duration or JV_TIME_BUDGET)
+
+	def dark_jv(self, step: SequenceStep) -> None:
+		self.set_light(False)
+		tracker = self.tracker
+		sweeps = tracker.run_dark_sweeps(tracker.jv_limit(), step.duration or JV_TIME_BUDGET, sweepDirection.BOTH)
+		tracker.record_jv(sweeps, self.next_sweep(), light=False)
+
+	def track(self, step: SequenceStep) -> None:
+		self.set_light(True)
+		tracker = self.tracker
+		if tracker.vmpp <= 0:  # no light JV earlier in the sequence to start from
+			tracker.vmpp = tracker.find_initial_vmpp()
+		tracker.walk_to_initial_vmpp()
+		tracker.algorithm.reset(tracker.vmpp)
+		tracker.tracking_time = step.duration or self.tracking_time
+		tracker.elapsed = 0.0
+		tracker.track()
+		tracker.vmpp = tracker.v_set  # the next track step picks up where this one stopped
+
+	def dark(self, step: SequenceStep) -> None:
+		self.tracker.sm.output_off()
+		self.set_light(False)
+		self.sleep(step.duration)
+
+	def pulse(self, step: SequenceStep) -> None:
+		# Readings at the held set point from the opening edge until the shutter has been closed as long as it was
+		# open. The edges are timed by the shutter, never by this loop.
+		assert self.shutter is not None
+		self.set_light(False)
+		tracker = self.tracker
+		bias = tracker.v_set
+		tracker.record(tracker.measure(bias))  # output on and settled in the dark before the edge
+
+		opened, closed = self.shutter.pulse(step.duration)
+		end_ns = 2 * closed.host_ns - opened.host_ns
+		while not tracker.stop_event.is_set():
+			sample = tracker.measure(bias)
+			tracker.record(sample)
+			if sample[5] >= end_ns:
+				break
+		self.shutter.wait()
+		self.record_events()
+
+	def run(self) -> None:
+		handlers = {
+			sequenceStep.VOC: self.voc,
+			sequenceStep.JV: self.jv,
+			sequenceStep.DARK_JV: self.dark_jv,
+			sequenceStep.TRACK: self.track,
+			sequenceStep.DARK: self.dark,
+			sequenceStep.PULSE: self.pulse,
+		}
+		try:
+			for n, step in enumerate(self.steps, 1):
+				if self.tracker.stop_event.is_set():
+					break
+				logger.info("Sequence step %s of %s: %s (%s s).", n, len(self.steps), step.kind.value, step.duration)
+				handlers[step.kind](step)
+
+		except KeyboardInterrupt:
+			logger.info("Sequence interrupted by user.")
+			self.tracker.stop_event.set()
+		finally:
+			self.tracker.sm.output_off()
+			if self.shutter is not None:
+				self.shutter.wait()
+				self.record_events()
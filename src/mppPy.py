@@ -1,116 +1,413 @@
 import sys
+import time
 
-from core.core import MaximumPowerPointTracker
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional
 
-from utils.logger_config import setup_logger, LogLevel
 from utils.parser import parse_arguments
-from utils.validator import UserSetting
+from utils.logger_config import setup_logger, queued_logging, LogLevel, CHANNEL_LOG_FORMAT
 from utils.custom_exceptions import OutputLimitsExceededError
 
-from pyvisa import VisaIOError
-from nidaqmx.errors import DaqError  # type: ignore
+# Only argument parsing is imported up front, so `mppPy.py -h` returns at once. Everything else is imported on the
+# path that needs it: numpy and the tracker once a run starts, pyvisa and NI-DAQmx only for real hardware.
+if TYPE_CHECKING:
+	import threading
 
-from controllers.K2400 import K2400Context, K2400Controller
-from controllers.shutterUSB6501 import shutterUSB6501
+	from pathlib import Path
 
-from controllers.dummyK2400 import dummyK2400Context, dummyK2400Controller
-from controllers.dummyShutter import dummyShutter
+	from controllers.interfaces import ShutterContext, SourcemeterController, SwitchController
+	from utils.validator import CampaignSetting, UserSetting
 
-from pydantic import ValidationError
 
-from contextlib import ExitStack
+def is_session_error(e: BaseException) -> bool:
+	# Instrument errors are recognised by module, so neither pyvisa nor NI-DAQmx is imported just to catch them
+	return type(e).__module__.startswith(("pyvisa", "nidaqmx"))
+
+
+def describe_error(e: Exception) -> str:
+	module = type(e).__module__
+	if module.startswith("pyvisa"):
+		return "Keithley communication error has occured. Exiting."
+	if module.startswith("nidaqmx"):
+		return "Shutter communication error has occured. Exiting."
+	if isinstance(e, OutputLimitsExceededError):
+		return f"Safe output limits exceeded: {e}"
+	return f"An unexpected error has occured: {e}"
+
+
+def open_shutter(
+	stack: ExitStack, tracker_config: "UserSetting", sm: Optional["SourcemeterController"] = None
+) -> Optional["ShutterContext"]:
+	# In dummy mode a shutter in front of the simulated sourcemeter darkens its device model, so dark steps read dark
+	if not tracker_config.shutter:
+		setup_logger().info("Shutter control disabled.")
+		return None
+
+	if tracker_config.dummy:
+		from controllers.simulatedK2400 import simulatedK2400Controller
+
+		if isinstance(sm, simulatedK2400Controller):
+			from controllers.simulatedShutter import simulatedShutter
+
+			shutter: "ShutterContext" = simulatedShutter(sm)
+		else:
+			from controllers.dummyShutter import dummyShutter
+
+			shutter = dummyShutter(enabled=tracker_config.shutter)
+	else:
+		from controllers.shutterUSB6501 import shutterUSB6501
+
+		shutter = shutterUSB6501(enabled=tracker_config.shutter)
+	stack.enter_context(shutter)  # entering yields the DAQ task, not the shutter
+	return shutter
+
+
+def open_sourcemeter(
+	stack: ExitStack, tracker_config: "UserSetting"
+) -> tuple["SourcemeterController", Optional[Callable[[], float]]]:
+	# The sourcemeter and the clock to track on: a simulated device on simulated time in dummy mode, so dummy runs
+	# fast-forward, otherwise the Keithley at the GPIB address on the host clock
+	from utils.constants import VOLTAGE_PROTECTION, CURRENT_COMPLIANCE, SIMULATED_GPIB_LATENCY
+
+	if tracker_config.dummy:
+		from controllers.dummyK2400 import dummyK2400Context
+		from controllers.simulatedK2400 import simulatedK2400Controller, SingleDiodeModel
+
+		resource = stack.enter_context(dummyK2400Context(address=tracker_config.gpib_address))
+		sm = simulatedK2400Controller(
+			resource=resource,
+			voltage_protection=VOLTAGE_PROTECTION,
+			current_compliance=CURRENT_COMPLIANCE,
+			model=SingleDiodeModel(area_cm2=tracker_config.device_area_cm2),
+			latency=SIMULATED_GPIB_LATENCY,
+		)
+		return sm, lambda: sm.clock
+
+	from controllers.K2400 import K2400Context, K2400Controller
+
+	resource = stack.enter_context(K2400Context(address=tracker_config.gpib_address))
+	sm = K2400Controller(
+		resource=resource,
+		voltage_protection=VOLTAGE_PROTECTION,
+		current_compliance=CURRENT_COMPLIANCE,
+	)
+	return sm, None
+
+
+class InstrumentSession(NamedTuple):
+	# Open instruments a run tracks with. A campaign keeps them open from one job to the next.
+	sm: "SourcemeterController"
+	clock: Optional[Callable[[], float]]
+	shutter: Optional["ShutterContext"]
+
+
+def track_device(
+	stack: ExitStack,
+	tracker_config: "UserSetting",
+	run_metadata: dict[str, Any],
+	session: InstrumentSession,
+	path: "Path",
+	stop_event: Optional["threading.Event"] = None,
+) -> None:
+	# One run on open instruments: its data streams and tracker, then either a tracking run or a measurement sequence
+	from core.core import MaximumPowerPointTracker
+	from core.algorithms import create_tracking_algorithm
+	from core.pipeline import create_tracking_pipeline
+	from core.scheduler import create_jv_scheduler
+	from core.checkpoint import TrackerCheckpoint, load_checkpoint
+	from core.sequence import MeasurementSequence
+	from plotting.live_plot import create_live_plot
+	from utils.data_writer import StreamingDataWriter, jv_path, checkpoint_path, shutter_path, JV_DTYPE, SHUTTER_DTYPE
+
+	resuming = tracker_config.resume is not None
+	writer = stack.enter_context(StreamingDataWriter(path, metadata=run_metadata, append=resuming))
+
+	live_plot = create_live_plot(writer.path.stem) if tracker_config.plot else None
+	if live_plot is not None:
+		stack.enter_context(live_plot)
+	pipeline = stack.enter_context(
+		create_tracking_pipeline(writer.extend_buffered, live_plot.send_samples if live_plot else None)
+	)
+
+	jv_scheduler = create_jv_scheduler(tracker_config.jv_interval, tracker_config.jv_power_drop)
+	jv_writer = None
+	if jv_scheduler is not None or tracker_config.sequence:  # sequence JV steps are written without a schedule
+		jv_writer = stack.enter_context(
+			StreamingDataWriter(jv_path(writer.path), dtype=JV_DTYPE, metadata=run_metadata, append=resuming)
+		)
+	checkpoint = TrackerCheckpoint(
+		checkpoint_path(writer.path),
+		writers={"data": writer, "jv": jv_writer} if jv_writer is not None else {"data": writer},
+	)
+
+	mppt = MaximumPowerPointTracker(
+		sourcemeter=session.sm,
+		cell_area=tracker_config.device_area_cm2,
+		tracking_time=tracker_config.tracking_time_seconds,
+		dummyMode=tracker_config.dummy,
+		algorithm=create_tracking_algorithm(tracker_config.algorithm),
+		pipeline=pipeline,
+		clock=session.clock,
+		jv_scheduler=jv_scheduler,
+		jv_writer=jv_writer,
+		live_plot=live_plot,
+		checkpoint=checkpoint,
+		stop_event=stop_event,
+	)
+
+	if not tracker_config.sequence:
+		resume_from = None
+		if resuming:
+			resume_from = load_checkpoint(checkpoint.path)
+			resume_from["rows"] = checkpoint.reconcile(resume_from)
+		mppt.run(resume_from=resume_from)
+		return
+
+	events_writer = None
+	if session.shutter is not None:
+		events_writer = stack.enter_context(
+			StreamingDataWriter(shutter_path(writer.path), dtype=SHUTTER_DTYPE, metadata=run_metadata)
+		)
+	MeasurementSequence(
+		mppt,
+		tracker_config.sequence,
+		shutter=session.shutter,
+		events_writer=events_writer,
+		sleep=session.sm.elapse if tracker_config.dummy else time.sleep,  # type: ignore
+	).run()
+
+
+def run_single_channel(tracker_config: "UserSetting", run_metadata: dict[str, Any]) -> None:
+	from controllers.instrumentation import instrument_controller
+	from utils.data_writer import make_run_path, timing_path
+
+	with ExitStack() as stack:
+		sm, clock = open_sourcemeter(stack, tracker_config)
+		shutter = open_shutter(stack, tracker_config, sm)
 
+		path = tracker_config.resume or make_run_path(tracker_config.metadata, tracker_config.gpib_address)
+		if tracker_config.timing:
+			stack.callback(instrument_controller(sm).report, timing_path(path))
+		track_device(stack, tracker_config, run_metadata, InstrumentSession(sm, clock, shutter), path)
 
-from controllers.interfaces import (
-	sweepDirection,
-)
 
-from utils.constants import VOLTAGE_PROTECTION, CURRENT_COMPLIANCE
+def run_campaign(campaign: "CampaignSetting", run_metadata: dict[str, Any]) -> None:
+	# Jobs run back to back on sessions opened once per sourcemeter address, so each Keithley is reset and set up once
+	# per campaign rather than once per job. A job failing on its device is logged and the queue moves on, while
+	# interrupting a job or losing the VISA or DAQ session stops it.
+	import threading
+	from controllers.instrumentation import instrument_controller
+	from utils.data_writer import make_run_path, timing_path
 
-import os
+	logger = setup_logger()
+	stop_event = threading.Event()
+	sessions: dict[str, InstrumentSession] = {}
+	shutter: Optional["ShutterContext"] = None
+	errors: dict[int, Exception] = {}
+	with ExitStack() as stack:
+		for n, job in enumerate(campaign.jobs, 1):
+			if stop_event.is_set():
+				logger.info(
+					"Campaign stopped with %s of %s jobs not run.", len(campaign.jobs) - n + 1, len(campaign.jobs)
+				)
+				break
+			logger.info(
+				"Campaign job %s of %s: %s at GPIB address %s.", n, len(campaign.jobs), job.metadata, job.gpib_address
+			)
+			path = make_run_path(f"{job.metadata or 'mppPy'}_job{n}", job.gpib_address)
+
+			session = sessions.get(job.gpib_address)
+			if session is None:
+				sm, clock = open_sourcemeter(stack, job)
+				if shutter is None or job.dummy:  # every simulated device sits behind its own simulated shutter
+					shutter = open_shutter(stack, job, sm)
+				if job.timing:  # one summary per sourcemeter, kept next to the data of its first job
+					stack.callback(instrument_controller(sm).report, timing_path(path))
+				session = sessions[job.gpib_address] = InstrumentSession(sm, clock, shutter)
+			elif job.dummy:
+				from controllers.simulatedK2400 import SingleDiodeModel
+
+				session.sm.model = SingleDiodeModel(area_cm2=job.device_area_cm2)  # type: ignore
+			if n > 1 and session.shutter is not None:  # every job starts in the light, as a single run does
+				session.shutter.open()
+
+			job_metadata = {
+				**run_metadata,
+				"metadata": job.metadata,
+				"settings": job.model_dump(mode="json"),
+				"campaign": {"metadata": campaign.metadata, "job": n, "jobs": len(campaign.jobs)},
+			}
+			try:
+				with ExitStack() as job_stack:
+					track_device(job_stack, job, job_metadata, session, path, stop_event)
+			except Exception as e:
+				if is_session_error(e):
+					raise
+				errors[n] = e
+				logger.error("Campaign job %s stopped with an error. %s", n, describe_error(e))
+
+	logger.info("Campaign finished, %s of %s jobs with errors.", len(errors), len(campaign.jobs))
+
+
+def open_switch(stack: ExitStack, tracker_config: "UserSetting", sm: "SourcemeterController") -> "SwitchController":
+	# In dummy mode every pixel is a slightly different simulated device, so the pixels track apart
+	from utils.constants import SWITCH_SETTLING_TIME
+
+	if tracker_config.dummy:
+		from controllers.simulatedK2400 import SingleDiodeModel
+		from controllers.simulatedSwitch import simulatedSwitch
+
+		models = {
+			channel: SingleDiodeModel(area_cm2=tracker_config.device_area_cm2, jsc_mA_cm2=22.0 * (1 - 0.05 * k))
+			for k, channel in enumerate(tracker_config.pixels)
+		}
+		return simulatedSwitch(sm, models, settling_time=SWITCH_SETTLING_TIME)  # type: ignore
+
+	from controllers.K7001 import K7001Context, K7001Switch
+
+	resource = stack.enter_context(K7001Context(address=tracker_config.switch_address))
+	return K7001Switch(resource, tracker_config.pixels, settling_time=SWITCH_SETTLING_TIME)
+
+
+def run_multiplexed(tracker_config: "UserSetting", run_metadata: dict[str, Any]) -> None:
+	from core.core import MaximumPowerPointTracker
+	from core.multiplexed import MultiplexedTracker, pixel_name
+	from core.algorithms import create_tracking_algorithm
+	from core.pipeline import create_tracking_pipeline
+	from controllers.instrumentation import instrument_controller
+	from plotting.live_plot import create_live_plot
+	from utils.data_writer import StreamingDataWriter, make_run_path, timing_path
+
+	with ExitStack() as stack:
+		sm, clock = open_sourcemeter(stack, tracker_config)
+		open_shutter(stack, tracker_config, sm)
+		switch = open_switch(stack, tracker_config, sm)
+
+		trackers = {}
+		for channel in tracker_config.pixels:
+			name = pixel_name(channel)
+			writer = stack.enter_context(
+				StreamingDataWriter(
+					make_run_path(f"{tracker_config.metadata or 'mppPy'}_{name}", tracker_config.gpib_address),
+					metadata={**run_metadata, "pixel": channel},
+				)
+			)
+			live_plot = create_live_plot(writer.path.stem) if tracker_config.plot else None  # one window per pixel
+			if live_plot is not None:
+				stack.enter_context(live_plot)
+			pipeline = stack.enter_context(
+				create_tracking_pipeline(
+					writer.extend_buffered, live_plot.send_samples if live_plot else None, name=name
+				)
+			)
+			trackers[channel] = MaximumPowerPointTracker(
+				sourcemeter=sm,
+				cell_area=tracker_config.device_area_cm2,
+				tracking_time=tracker_config.tracking_time_seconds,
+				dummyMode=tracker_config.dummy,
+				algorithm=create_tracking_algorithm(tracker_config.algorithm),
+				pipeline=pipeline,
+				clock=clock,
+				live_plot=live_plot,
+			)
+		if tracker_config.timing:  # one sourcemeter, so one summary, kept next to the last pixel's data
+			stack.callback(instrument_controller(sm).report, timing_path(writer.path))
 
-print(os.getcwd())
+		MultiplexedTracker(switch, trackers, tracker_config.tracking_time_seconds, clock=clock).run()
+
+
+def run_multichannel(tracker_config: "UserSetting", run_metadata: dict[str, Any]) -> None:
+	from core.multichannel import MultiChannelTracker
+
+	setup_logger(level=LogLevel.DEBUG, fmt=CHANNEL_LOG_FORMAT)
+	with ExitStack() as stack:
+		open_shutter(stack, tracker_config)
+		MultiChannelTracker(
+			channels=tracker_config.channels,
+			tracking_time=tracker_config.tracking_time_seconds,
+			dummyMode=tracker_config.dummy,
+			algorithm=tracker_config.algorithm,
+			run_metadata=run_metadata,
+			jv_interval=tracker_config.jv_interval,
+			jv_power_drop=tracker_config.jv_power_drop,
+			plot=tracker_config.plot,
+			timing=tracker_config.timing,
+			log_json=tracker_config.log_json,
+		).run()
 
 
 def main() -> None:
 	args = parse_arguments(sys.argv[1:])
 
+	from pydantic import ValidationError
+	from utils.validator import CampaignSetting, UserSetting, load_campaign
+	from core.clock_sync import host_clock_reference
+	from utils.data_writer import log_path
+
+	tracker_config: UserSetting | CampaignSetting
 	try:
-		tracker_config = UserSetting(
-			tracking_time_seconds=args.tracking_time_seconds,
-			device_area_cm2=args.device_area_cm2,
-			gpib_address=args.gpib_address,
-			shutter=args.shutter,
-			dummy=args.dummyMode,
-			metadata=args.metadata,
-		)
+		if args.config is not None:
+			tracker_config = load_campaign(
+				args.config,
+				dummy=args.dummyMode,
+				shutter=args.shutter,
+				plot=args.plot,
+				timing=args.timing,
+				log_json=args.log_json,
+			)
+		else:
+			tracker_config = UserSetting(
+				tracking_time_seconds=args.tracking_time_seconds,
+				device_area_cm2=args.device_area_cm2,
+				gpib_address=args.gpib_address,
+				shutter=args.shutter,
+				dummy=args.dummyMode,
+				plot=args.plot,
+				timing=args.timing,
+				log_json=args.log_json,
+				metadata=args.metadata,
+				algorithm=args.algorithm,
+				channels=args.channels,
+				pixels=args.pixels,
+				switch_address=args.switch_address,
+				jv_interval=args.jv_interval,
+				jv_power_drop=args.jv_power_drop,
+				sequence=args.sequence,
+				resume=args.resume,
+			)
 
 	except ValidationError as e:
 		print(f"The tracker configuration settings could not be validated: {e}.")
 		sys.exit(1)
+	except (OSError, ValueError) as e:  # unreadable files and TOML syntax errors
+		print(f"The run configuration file could not be read: {e}.")
+		sys.exit(1)
 
-	logger = setup_logger(level=LogLevel.DEBUG)
-	logger.info("Log initiated.")
-
-	if tracker_config.dummy:
-		try:
-			with ExitStack() as stack:
-				resource = stack.enter_context(dummyK2400Context(address=tracker_config.gpib_address))
-
-				if tracker_config.shutter:
-					stack.enter_context(dummyShutter(enabled=tracker_config.shutter))
-				else:
-					logger.info("Shutter control disabled.")
-
-				sm = dummyK2400Controller(
-					resource=resource,
-					voltage_protection=VOLTAGE_PROTECTION,
-					current_compliance=CURRENT_COMPLIANCE,
-				)
-
-				mppt = MaximumPowerPointTracker(
-					sourcemeter=sm,
-					cell_area=tracker_config.device_area_cm2,
-					tracking_time=tracker_config.tracking_time_seconds,
-					dummyMode=tracker_config.dummy,
-				)
+	logger = setup_logger(
+		logfile=log_path(tracker_config.metadata), level=LogLevel.DEBUG, json_lines=tracker_config.log_json
+	)
 
-				mppt.find_initial_vmpp()
+	# Console and file output happen on the queue listener thread, off the acquisition threads
+	with queued_logging():
+		logger.info("Log initiated.")
 
-		except OutputLimitsExceededError as e:
-			logger.error(f"Safe output limits exceeded: {e}")
-		except Exception as e:
-			logger.error(f"An unexpected error has occured: {e}")
-		finally:
-			logger.info("Program finished.")
-			# shutdown interactive plot
-			# close log file
-			# write to console
+		run_metadata = {
+			"metadata": tracker_config.metadata,
+			"settings": tracker_config.model_dump(mode="json"),
+			"host_clock": host_clock_reference(),
+		}
 
-	else:
 		try:
-			with ExitStack() as stack:
-				resource = stack.enter_context(K2400Context(address=tracker_config.gpib_address))
-
-				if tracker_config.shutter:
-					stack.enter_context(shutterUSB6501(enabled=tracker_config.shutter))
-				else:
-					logger.info("Shutter control disabled.")
-
-				sm = K2400Controller(
-					resource=resource,
-					voltage_protection=VOLTAGE_PROTECTION,
-					current_compliance=CURRENT_COMPLIANCE,
-				)
-
-		except VisaIOError:
-			logger.error("Keithley communication error has occured. Exiting.")
-		except DaqError:
-			logger.error("Shutter communication error has occured. Exiting.")
-		except OutputLimitsExceededError as e:
-			logger.error(f"Safe output limits exceeded: {e}")
+			if isinstance(tracker_config, CampaignSetting):
+				run_campaign(tracker_config, run_metadata)
+			elif tracker_config.channels:
+				run_multichannel(tracker_config, run_metadata)
+			elif tracker_config.pixels:
+				run_multiplexed(tracker_config, run_metadata)
+			else:
+				run_single_channel(tracker_config, run_metadata)
 		except Exception as e:
-			logger.error(f"An unexpected error has occured: {e}")
+			logger.error(describe_error(e))
 		finally:
 			logger.info("Program finished.")
 
@@ -0,0 +1,69 @@
+import math
+import numpy as np
+
+from typing import Optional
+
+from numpy.typing import ArrayLike, NDArray
+
+
+def _keep_bin_extremes(
+	x: NDArray[np.float64], y: NDArray[np.float64], bin_id: NDArray[np.int64]
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+	# Keep the minimum and maximum y of every non-empty bin, in x order, with the end points kept so the plotted range
+	# never shrinks. bin_id must be ascending, as it is for bins of ascending x.
+	order = np.lexsort((y, bin_id))  # grouped by bin, ascending y within each bin
+	starts = np.flatnonzero(np.diff(bin_id, prepend=bin_id[0] - 1))
+	ends = np.append(starts[1:], len(x)) - 1
+	keep = np.unique(np.concatenate([[0, len(x) - 1], order[starts], order[ends]]))
+	return x[keep], y[keep]
+
+
+def minmax_decimate(x: ArrayLike, y: ArrayLike, n_bins: int) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+	# Split ascending x into n_bins equal-count bins and keep only the minimum and maximum y of each, in x order,
+	# so a plot of the result shows the same envelope as the full series with at most 2 * n_bins + 2 points
+	x = np.asarray(x, dtype=np.float64)
+	y = np.asarray(y, dtype=np.float64)
+	n = len(x)
+	if n <= 2 * n_bins:
+		return x, y
+
+	edges = np.linspace(0, n, n_bins + 1).astype(np.int64)
+	return _keep_bin_extremes(x, y, np.repeat(np.arange(n_bins), np.diff(edges)))
+
+
+class MinMaxDecimator:
+	# Growing series held to at most max_points. Once full, the stored series is min-max decimated into x-range bins
+	# of a width fixed from the first x, doubled whenever the span outgrows max_points // 4 bins. A coarser bin is
+	# the union of two finer ones, so re-decimating keeps the extremes and old data keeps its share of points,
+	# while memory use and drawing cost stay constant however long the run.
+	def __init__(self, max_points: int = 4000):
+		if max_points < 8:
+			raise ValueError(f"A decimated series needs room for at least 8 points, got {max_points}.")
+		self.max_points = max_points
+		self.x: NDArray[np.float64] = np.zeros(0)
+		self.y: NDArray[np.float64] = np.zeros(0)
+		self.points_seen: int = 0
+		self.bin_width: Optional[float] = None
+
+	def __len__(self) -> int:
+		return len(self.x)
+
+	def extend(self, x: ArrayLike, y: ArrayLike) -> None:
+		x = np.asarray(x, dtype=np.float64)
+		self.points_seen += len(x)
+		self.x = np.concatenate([self.x, x])
+		self.y = np.concatenate([self.y, np.asarray(y, dtype=np.float64)])
+		if len(self.x) <= self.max_points:
+			return
+
+		n_bins = self.max_points // 4
+		span = self.x[-1] - self.x[0]
+		if span <= 0:  # no x-range to bin over yet
+			self.x, self.y = minmax_decimate(self.x, self.y, n_bins)
+			return
+		if self.bin_width is None:
+			self.bin_width = span / n_bins
+		if span > n_bins * self.bin_width:
+			self.bin_width *= 2.0 ** math.ceil(math.log2(span / (n_bins * self.bin_width)))
+		bin_id = np.floor((self.x - self.x[0]) / self.bin_width).astype(np.int64)
+		self.x, self.y = _keep_bin_extremes(self.x, self.y, bin_id)
@@ -0,0 +1,156 @@
+import time
+import queue
+import importlib.util
+import multiprocessing as mp
+import numpy as np
+
+from types import TracebackType
+from typing import Any, Optional
+
+from numpy.typing import NDArray
+
+from plotting.decimation import MinMaxDecimator
+from utils.logger_config import setup_logger
+
+logger = setup_logger()
+
+JV_HISTORY = 5  # number of most recent JV sweeps kept on the dashboard
+
+
+def plotting_available() -> bool:
+	return importlib.util.find_spec("matplotlib") is not None
+
+
+class DashboardState:
+	# Plot data held by the dashboard process: decimated power and set point traces and the latest JV sweeps
+	def __init__(self, max_points: int = 4000):
+		self.power = MinMaxDecimator(max_points)
+		self.v_set = MinMaxDecimator(max_points)
+		self.jv: dict[int, NDArray[Any]] = {}
+
+	def handle(self, kind: str, data: NDArray[Any]) -> None:
+		if kind == "samples":
+			self.power.extend(data["t"], data["p"])
+			self.v_set.extend(data["t"], data["v_set"])
+		elif kind == "jv":
+			for sweep in np.unique(data["sweep"]):
+				self.jv[int(sweep)] = data[data["sweep"] == sweep]
+			for sweep in sorted(self.jv)[:-JV_HISTORY]:
+				del self.jv[sweep]
+
+
+def run_dashboard(messages: Any, title: str, refresh_interval: float, max_points: int) -> None:
+	# Entry point of the plotting process. matplotlib is only ever imported here, never in the acquisition process.
+	import matplotlib.pyplot as plt
+
+	state = DashboardState(max_points)
+	fig, (ax_power, ax_vmpp, ax_jv) = plt.subplots(3, 1, figsize=(8, 10))
+	fig.suptitle(title)
+	(power_line,) = ax_power.plot([], [], lw=0.8)
+	ax_power.set(xlabel="Time (s)", ylabel="Power (W)")
+	(vmpp_line,) = ax_vmpp.plot([], [], lw=0.8, color="tab:orange")
+	ax_vmpp.set(xlabel="Time (s)", ylabel="Vmpp set point (V)")
+	ax_jv.set(xlabel="Voltage (V)", ylabel="Current (mA)")
+	fig.tight_layout()
+	plt.show(block=False)
+
+	running = True
+	while running and plt.fignum_exists(fig.number):
+		deadline = time.monotonic() + refresh_interval
+		while (remaining := deadline - time.monotonic()) > 0:
+			try:
+				message = messages.get(timeout=remaining)
+			except queue.Empty:
+				break
+			if message is None:
+				running = False
+				break
+			state.handle(*message)
+
+		power_line.set_data(state.power.x, state.power.y)
+		vmpp_line.set_data(state.v_set.x, state.v_set.y)
+		ax_jv.clear()
+		ax_jv.set(xlabel="Voltage (V)", ylabel="Current (mA)")
+		for sweep, rows in state.jv.items():
+			for reverse, style in ((True, "-"), (False, "--")):
+				curve = rows[rows["reverse"] == reverse]
+				if len(curve):
+					ax_jv.plot(curve["v"], -1e3 * curve["i"], style, label=f"{sweep} {'rev' if reverse else 'fwd'}")
+		if state.jv:
+			ax_jv.legend(fontsize="small")
+		for ax in (ax_power, ax_vmpp):
+			ax.relim()
+			ax.autoscale_view()
+		plt.pause(0.01)
+
+	plt.close(fig)
+
+
+class LivePlot:
+	# Handle to a dashboard running in its own process. Data crosses over a bounded queue and every send is
+	# non-blocking: when the dashboard falls behind, batches are dropped rather than slowing acquisition.
+	def __init__(self, title: str = "mppPy", refresh_interval: float = 1.0, max_points: int = 4000, maxsize: int = 256):
+		self.title = title
+		self.refresh_interval = refresh_interval
+		self.max_points = max_points
+		self.dropped: int = 0
+		# spawn keeps the dashboard free of the VISA sessions and threads of the acquisition process
+		self._context = mp.get_context("spawn")
+		self._queue = self._context.Queue(maxsize=maxsize)
+		self._process: Optional[Any] = None
+
+	def _send(self, kind: str, data: NDArray[Any]) -> None:
+		try:
+			self._queue.put_nowait((kind, np.asarray(data)))
+		except queue.Full:
+			self.dropped += 1
+
+	def send_samples(self, batch: NDArray[Any]) -> None:
+		self._send("samples", batch)
+
+	def send_jv(self, rows: NDArray[Any]) -> None:
+		self._send("jv", rows)
+
+	def start(self) -> "LivePlot":
+		self._process = self._context.Process(
+			target=run_dashboard,
+			args=(self._queue, self.title, self.refresh_interval, self.max_points),
+			name="live-plot",
+			daemon=True,
+		)
+		self._process.start()
+		logger.info("Live plot started in process %s.", self._process.pid)
+		return self
+
+	def stop(self, timeout: float = 5.0) -> None:
+		if self._process is None:
+			return
+		try:
+			self._queue.put(None, timeout=timeout)
+		except queue.Full:
+			pass
+		self._process.join(timeout)
+		if self._process.is_alive():
+			self._process.terminate()
+		self._queue.cancel_join_thread()  # never hang on exit over undelivered plot data
+		self._process = None
+		if self.dropped:
+			logger.warning("Live plot skipped %s batches because the dashboard fell behind.", self.dropped)
+
+	def __enter__(self) -> "LivePlot":
+		return self.start()
+
+	def __exit__(
+		self,
+		exc_type: type[BaseException] | None,
+		exc_val: BaseException | None,
+		exc_tb: TracebackType | None,
+	) -> None:
+		self.stop()
+
+
+def create_live_plot(title: str) -> Optional[LivePlot]:
+	if not plotting_available():
+		logger.warning("Live plotting needs matplotlib, which is not installed. Continuing without a plot.")
+		return None
+	return LivePlot(title=title)
@@ -3,3 +3,24 @@
 VOLTAGE_PROTECTION = 3.6
 CURRENT_COMPLIANCE = 0.058
 SWEEP_RATE = 0.04  # Target sweep rate in V/s for JV scans
+RAMP_SLEW_RATE = 0.5  # Maximum slew rate in V/s when ramping the output to a new level
+SOURCE_DELAY = 0.05  # Settling time in seconds between sweep points
+MAX_BUFFER_POINTS = 2500  # K2400 trace buffer and trigger count limit
+MAX_LIST_POINTS = 100  # K2400 source list memory limit
+VOLTAGE_STEP = 0.01  # Fixed perturbation in V for MPP tracking
+MIN_VOLTAGE_STEP = 0.002  # Adaptive perturbation limits in V
+MAX_VOLTAGE_STEP = 0.05
+VOC_MAX_HOLD = 30.0  # Longest open circuit hold in s while waiting for Voc to settle
+VOC_SETTLE_WINDOW = 1.0  # Trailing window in s over which the Voc trend is fitted
+VOC_SETTLE_TOLERANCE = 0.001  # Voc counts as settled below this |dV/dt| in V/s
+JV_TIME_BUDGET = 5.0  # Target duration in s of a planned list sweep
+JV_VOLTAGE_MARGIN = 1.05  # Periodic JV sweeps run to this multiple of the last Voc
+COARSE_SWEEP_POINTS = 15  # Linear pre-scan points when no previous sweep is available to plan from
+SIMULATED_GPIB_LATENCY = 0.005  # Modelled time in s per GPIB transaction in dummy mode
+CLOCK_SYNC_TIME_CONSTANT = 3600.0  # Memory in s of the running instrument to host clock fit
+CLOCK_SYNC_MIN_SPAN = 10.0  # Spread in s of instrument timestamps needed before the clock rate is fitted
+CHECKPOINT_INTERVAL = 60.0  # Tracking time in s between saved tracker checkpoints
+SWITCH_SETTLING_TIME = 0.02  # Relay settling time in s after a switch closes a channel
+MUX_MAX_OVERHEAD = 0.1  # Largest fraction of multiplexed tracking time spent switching between pixels
+MUX_MAX_REVISIT = 10.0  # Longest time in s a multiplexed pixel should wait between visits
+MUX_SETTLE_READS = 1  # Readings discarded after switching to a pixel, while it settles at its set point
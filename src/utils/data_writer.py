@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import numpy as np
+
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Optional, Sequence
+
+from numpy.typing import NDArray
+
+from utils.logger_config import setup_logger
+
+logger = setup_logger()
+
+DATA_DIRECTORY = "data"
+
+TRACKING_DTYPE = np.dtype(
+	[
+		("t", "<f8"),  # instrument time in s
+		("v", "<f8"),  # measured voltage in V
+		("i", "<f8"),  # measured current in A
+		("p", "<f8"),  # |V * I| in W
+		("v_set", "<f8"),  # applied voltage set point in V
+		("host_ns", "<i8"),  # host time.perf_counter_ns() of the reading
+		("t_host", "<f8"),  # instrument time mapped onto the host clock in s, see core.clock_sync
+	]
+)
+
+JV_DTYPE = np.dtype(
+	[
+		("sweep", "<i8"),  # index of the periodic JV sweep
+		("reverse", "?"),  # True for the Voc to 0 V direction
+		("light", "?"),  # False for sweeps taken with the shutter closed
+		("t", "<f8"),  # instrument time in s
+		("v", "<f8"),  # measured voltage in V
+		("i", "<f8"),  # measured current in A
+	]
+)
+
+SHUTTER_DTYPE = np.dtype(
+	[
+		("host_ns", "<i8"),  # host time.perf_counter_ns() of the edge, the clock of the tracking data host_ns
+		("open", "?"),
+	]
+)
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def make_run_path(metadata: Optional[str], gpib_address: str, directory: str = DATA_DIRECTORY) -> Path:
+	stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+	return Path(directory) / f"{stamp}_{metadata or 'mppPy'}_GPIB{gpib_address}.npy"
+
+
+def log_path(metadata: Optional[str], directory: str = DATA_DIRECTORY) -> Path:
+	# One log per run, named like the data it describes
+	stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+	return Path(directory) / f"{stamp}_{metadata or 'mppPy'}.log"
+
+
+def jv_path(path: str | Path) -> Path:
+	# JV sweeps are stored next to the tracking data they interrupt
+	path = Path(path)
+	return path.with_name(f"{path.stem}_jv{path.suffix}")
+
+
+def timing_path(path: str | Path) -> Path:
+	path = Path(path)
+	return path.with_name(f"{path.stem}_timing.json")
+
+
+def shutter_path(path: str | Path) -> Path:
+	path = Path(path)
+	return path.with_name(f"{path.stem}_shutter{path.suffix}")
+
+
+def checkpoint_path(path: str | Path) -> Path:
+	path = Path(path)
+	return path.with_name(f"{path.stem}_checkpoint.json")
+
+
+class StreamingDataWriter:
+	# Appends records to a .npy file in chunks. The header is padded so the row count can be rewritten in place
+	# after each chunk is synced to disk, so a crash loses at most the unflushed chunk and the file always loads
+	# with np.load(path, mmap_mode="r"). Run metadata lives in a JSON sidecar because .npy headers cannot hold it.
+	# With append=True an existing file is continued after its last committed row, e.g. when a run is resumed.
+	def __init__(
+		self,
+		path: str | Path,
+		dtype: np.dtype = TRACKING_DTYPE,
+		metadata: Optional[dict[str, Any]] = None,
+		chunk_size: int = 4096,
+		flush_interval: float = 10.0,
+		append: bool = False,
+	):
+		self.path = Path(path)
+		self.metadata_path = self.path.with_suffix(".json")
+		self.dtype = np.dtype(dtype)
+		self.metadata = metadata if metadata is not None else {}
+		self.chunk_size = chunk_size
+		self.flush_interval = flush_interval
+		self.append_mode = append
+
+		self.rows_written: int = 0
+		self._buffer: NDArray[Any] = np.zeros(chunk_size, dtype=self.dtype)
+		self._buffered: int = 0
+		self._last_flush: float = time.monotonic()
+		self._file: Optional[Any] = None
+		self._header_size = self._header_length()
+
+	def _header(self, rows: int) -> bytes:
+		descr = np.lib.format.dtype_to_descr(self.dtype)
+		header = f"{{'descr': {descr!r}, 'fortran_order': False, 'shape': ({rows},), }}"
+		return header.encode("latin1")
+
+	def _header_length(self) -> int:
+		# Room for a 20 digit row count, padded to the 64 byte alignment numpy expects
+		unpadded = len(NPY_MAGIC) + 2 + len(self._header(10**20)) + 1
+		return -(-unpadded // 64) * 64
+
+	def _write_header(self) -> None:
+		assert self._file is not None
+		header = self._header(self.rows_written)
+		header = header + b" " * (self._header_size - len(NPY_MAGIC) - 2 - len(header) - 1) + b"\n"
+
+		self._file.seek(0)
+		self._file.write(NPY_MAGIC + len(header).to_bytes(2, "little") + header)
+		self._file.seek(0, os.SEEK_END)
+
+	def _write_metadata(self, metadata: dict[str, Any]) -> None:
+		tmp = self.metadata_path.with_suffix(".json.tmp")
+		tmp.write_text(json.dumps(metadata, indent=2, default=str))
+		os.replace(tmp, self.metadata_path)
+
+	def open(self) -> "StreamingDataWriter":
+		if self.append_mode and self.path.exists():
+			return self._reopen()
+
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		self._write_metadata(
+			{"columns": list(self.dtype.names or ()), "created": datetime.now().isoformat(), **self.metadata}
+		)
+
+		self._file = open(self.path, "wb")
+		self._write_header()
+		self._sync()
+		self._last_flush = time.monotonic()
+		logger.info("Writing data to %s.", self.path)
+		return self
+
+	def _reopen(self) -> "StreamingDataWriter":
+		# Continue after the rows the header commits to. Bytes past them belong to a chunk that was being written when
+		# the previous run died and are cut off, so the file never holds a torn row.
+		self._file = open(self.path, "r+b")
+		try:
+			np.lib.format.read_magic(self._file)
+			shape, _, dtype = np.lib.format.read_array_header_1_0(self._file)
+			if dtype != self.dtype or self._file.tell() != self._header_size:
+				raise ValueError(f"Data file {self.path} does not hold {self.dtype} records, it cannot be appended to.")
+		except ValueError:
+			self._file.close()
+			self._file = None
+			raise
+
+		self.rows_written = shape[0]
+		self._file.truncate(self._header_size + self.rows_written * self.dtype.itemsize)
+		self._file.seek(0, os.SEEK_END)
+		self._sync()
+
+		# the original metadata stays, each resumed session is recorded with its own
+		metadata = json.loads(self.metadata_path.read_text()) if self.metadata_path.exists() else {}
+		metadata["resumed"] = metadata.get("resumed", []) + [{"time": datetime.now().isoformat(), **self.metadata}]
+		self._write_metadata(metadata)
+		self._last_flush = time.monotonic()
+		logger.info("Appending data to %s after %s rows.", self.path, self.rows_written)
+		return self
+
+	def append(self, row: Sequence[float]) -> None:
+		self._buffer[self._buffered] = tuple(row)
+		self._buffered += 1
+		if self._buffered == self.chunk_size or time.monotonic() - self._last_flush >= self.flush_interval:
+			self.flush()
+
+	def extend(self, rows: NDArray[Any]) -> None:
+		# Written through at once, for out-of-band streams such as JV sweeps and shutter edges
+		self.flush()
+		self._write_rows(self._records(rows))
+
+	def extend_buffered(self, rows: NDArray[Any]) -> None:
+		# Batches go through the chunk buffer like append(), so the file is only written by chunk size or interval
+		rows = self._records(rows)
+		while len(rows):
+			n = min(len(rows), self.chunk_size - self._buffered)
+			self._buffer[self._buffered : self._buffered + n] = rows[:n]
+			self._buffered += n
+			rows = rows[n:]
+			if self._buffered == self.chunk_size:
+				self.flush()
+		if self._buffered and time.monotonic() - self._last_flush >= self.flush_interval:
+			self.flush()
+
+	def _records(self, rows: NDArray[Any]) -> NDArray[Any]:
+		rows = np.asarray(rows)
+		if rows.dtype != self.dtype:
+			rows = np.rec.fromarrays(np.asarray(rows, dtype=np.float64).T, dtype=self.dtype)
+		return rows
+
+	def truncate(self, rows: int) -> None:
+		# Cut the file back to its first rows, e.g. to what a resumed run picks up from
+		if self._file is None:
+			raise ValueError(f"Data file {self.path} is not open.")
+		self.flush()
+		self.rows_written = min(rows, self.rows_written)
+		self._write_header()  # the header never claims rows the file no longer holds
+		self._sync()
+		self._file.truncate(self._header_size + self.rows_written * self.dtype.itemsize)
+		self._file.seek(0, os.SEEK_END)
+		self._sync()
+
+	def flush(self) -> None:
+		if self._buffered:
+			self._write_rows(self._buffer[: self._buffered])
+			self._buffered = 0
+		self._last_flush = time.monotonic()
+
+	def _write_rows(self, rows: NDArray[Any]) -> None:
+		if self._file is None:
+			raise ValueError(f"Data file {self.path} is not open.")
+		if not len(rows):
+			return
+
+		# data must be on disk before the header claims it
+		self._file.write(rows.tobytes())
+		self._sync()
+		self.rows_written += len(rows)
+		self._write_header()
+		self._sync()
+
+	def _sync(self) -> None:
+		assert self._file is not None
+		self._file.flush()
+		os.fsync(self._file.fileno())
+
+	def close(self) -> None:
+		if self._file is not None:
+			self.flush()
+			self._file.close()
+			self._file = None
+			logger.info("Closed data file %s after %s rows.", self.path, self.rows_written)
+
+	def __enter__(self) -> "StreamingDataWriter":
+		return self.open()
+
+	def __exit__(
+		self,
+		exc_type: type[BaseException] | None,
+		exc_val: BaseException | None,
+		exc_tb: TracebackType | None,
+	) -> None:
+		self.close()
@@ -1,5 +1,13 @@
+import json
+import queue
 import logging
+import logging.handlers
+
+from contextlib import contextmanager
+from datetime import datetime
 from enum import Enum
+from pathlib import Path
+from typing import Iterator, Optional
 
 
 class LogLevel(Enum):
@@ -10,22 +18,155 @@ class LogLevel(Enum):
 	CRITICAL = logging.CRITICAL
 
 
-def setup_logger(logfile: str | None = None, level: LogLevel = LogLevel.INFO) -> logging.Logger:
-	logger = logging.getLogger("mppPy")
-	logger.setLevel(level.value)
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+CHANNEL_LOG_FORMAT = "%(asctime)s - %(threadName)s - %(levelname)s - %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d - %H:%M:%S"
+CONSOLE_HANDLER_NAME = "console"
+
+# Listener draining the package log queue while queued logging is active, None otherwise
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class ThreadNameFilter(logging.Filter):
+	# Passes records of the named thread and of the helper threads named after it, such as GPIB20-writer
+	def __init__(self, thread_name: str):
+		super().__init__()
+		self.thread_name = thread_name
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		name = record.threadName or ""
+		return name == self.thread_name or name.startswith(f"{self.thread_name}-")
+
+
+class JsonLinesFormatter(logging.Formatter):
+	# One JSON object per record, so run logs can be loaded line by line without parsing the text format
+	def format(self, record: logging.LogRecord) -> str:
+		entry = {
+			"time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+			"level": record.levelname,
+			"thread": record.threadName,
+			"module": record.module,
+			"message": record.getMessage(),
+		}
+		if record.exc_info:
+			entry["exception"] = self.formatException(record.exc_info)
+		return json.dumps(entry)
+
 
-	formatter = logging.Formatter(fmt="%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d - %H:%M:%S")
+def file_formatter(json_lines: bool = False, fmt: str = LOG_FORMAT) -> logging.Formatter:
+	return JsonLinesFormatter() if json_lines else logging.Formatter(fmt=fmt, datefmt=LOG_DATE_FORMAT)
 
-	if logger.hasHandlers():
-		logger.handlers.clear()
 
-	ch = logging.StreamHandler()
-	ch.setFormatter(formatter)
-	logger.addHandler(ch)
+def log_handlers() -> list[logging.Handler]:
+	# Handlers doing the actual output, behind the queue when queued logging is active
+	if _listener is not None:
+		return list(_listener.handlers)
+	return list(logging.getLogger("mppPy").handlers)
+
+
+def _add_handler(handler: logging.Handler) -> None:
+	if _listener is not None:
+		_listener.handlers = (*_listener.handlers, handler)
+	else:
+		logging.getLogger("mppPy").addHandler(handler)
+
+
+def _remove_handler(handler: logging.Handler) -> None:
+	if _listener is not None:
+		# Records for the handler may still be queued, so let the listener drain the queue before taking it off
+		_listener.stop()
+		_listener.handlers = tuple(h for h in _listener.handlers if h is not handler)
+		_listener.start()
+	else:
+		logging.getLogger("mppPy").removeHandler(handler)
+
+
+def setup_logger(
+	logfile: str | Path | None = None,
+	level: Optional[LogLevel] = None,
+	fmt: Optional[str] = None,
+	json_lines: bool = False,
+) -> logging.Logger:
+	# Modules call this bare at import: the first call adds the console handler at INFO and later ones leave the
+	# configuration alone, so importing a module mid-run never resets the level or drops the run log file.
+	# Passing a level or console format changes them, passing a logfile adds a file handler.
+	logger = logging.getLogger("mppPy")
+
+	console = next((h for h in log_handlers() if h.get_name() == CONSOLE_HANDLER_NAME), None)
+	if console is None:
+		console = logging.StreamHandler()
+		console.set_name(CONSOLE_HANDLER_NAME)
+		console.setFormatter(logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+		_add_handler(console)
+		logger.setLevel(logging.INFO)
+
+	if level is not None:
+		logger.setLevel(level.value)
+	if fmt is not None:
+		console.setFormatter(logging.Formatter(fmt=fmt, datefmt=LOG_DATE_FORMAT))
 
 	if logfile:
+		Path(logfile).parent.mkdir(parents=True, exist_ok=True)
 		fh = logging.FileHandler(logfile)
-		fh.setFormatter(formatter)
-		logger.addHandler(fh)
+		fh.setFormatter(file_formatter(json_lines, fmt or LOG_FORMAT))
+		_add_handler(fh)
 
 	return logger
+
+
+def start_log_queue() -> None:
+	# Move the package handlers behind a QueueListener, so console and file I/O happen on a background thread and a
+	# log call on the acquisition thread costs a queue put
+	global _listener
+	if _listener is not None:
+		return
+
+	logger = logging.getLogger("mppPy")
+	handlers = list(logger.handlers)
+	log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+	_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+	for handler in handlers:
+		logger.removeHandler(handler)
+	logger.addHandler(logging.handlers.QueueHandler(log_queue))
+	_listener.start()
+
+
+def stop_log_queue() -> None:
+	# Put the handlers back on the logger, then flush whatever is still queued
+	global _listener
+	if _listener is None:
+		return
+
+	listener, _listener = _listener, None
+	logger = logging.getLogger("mppPy")
+	for handler in list(logger.handlers):
+		if isinstance(handler, logging.handlers.QueueHandler):
+			logger.removeHandler(handler)
+	for handler in listener.handlers:
+		logger.addHandler(handler)
+	listener.stop()
+
+
+@contextmanager
+def queued_logging() -> Iterator[None]:
+	start_log_queue()
+	try:
+		yield
+	finally:
+		stop_log_queue()
+
+
+def add_channel_log(thread_name: str, logfile: str | Path, json_lines: bool = False) -> logging.Handler:
+	# Channel trackers each run on their own named thread, so a per-channel log only needs a thread filter
+	Path(logfile).parent.mkdir(parents=True, exist_ok=True)
+	fh = logging.FileHandler(logfile)
+	fh.setFormatter(file_formatter(json_lines))
+	fh.addFilter(ThreadNameFilter(thread_name))
+	_add_handler(fh)
+
+	return fh
+
+
+def remove_channel_log(handler: logging.Handler) -> None:
+	_remove_handler(handler)
+	handler.close()
@@ -1,13 +1,35 @@
 import argparse
 
+from core.algorithms import trackingAlgorithm
+
+# Options of a single run that a run configuration file sets per job instead
+JOB_OPTIONS = {
+	"gpib_address": "-g",
+	"algorithm": "-a",
+	"metadata": "-m",
+	"channels": "-c",
+	"pixels": "-x",
+	"switch_address": "--switch_address",
+	"jv_interval": "--jv_interval",
+	"jv_power_drop": "--jv_power_drop",
+	"sequence": "--sequence",
+	"resume": "--resume",
+}
+
 
 def parse_arguments(args: list[str]) -> argparse.Namespace:
 	parser = argparse.ArgumentParser(
 		description="Maximum power point tracking for PV devices using GPIB connected sourcemeter and optional shutter control."
 	)
 
-	parser.add_argument("tracking_time_seconds", type=int, help="Total number of seconds to MPP track for.")
-	parser.add_argument("device_area_cm2", type=float, help="Device active area in cm^2.")
+	parser.add_argument("tracking_time_seconds", type=int, nargs="?", help="Total number of seconds to MPP track for.")
+	parser.add_argument("device_area_cm2", type=float, nargs="?", help="Device active area in cm^2.")
+	parser.add_argument(
+		"--config",
+		type=str,
+		metavar="CONFIG_FILE",
+		help="Run a queue of jobs from a TOML run configuration file instead of one run, e.g. --config campaign.toml. Replaces the tracking time and device area, flags such as -d switch options on for every job.",
+	)
 	parser.add_argument(
 		"-g",
 		"--gpib_address",
@@ -29,6 +51,77 @@ def parse_arguments(args: list[str]) -> argparse.Namespace:
 		action="store_true",
 		help="Optional flag to run mppPy in dummy mode.",
 	)
+	parser.add_argument(
+		"-p",
+		"--plot",
+		default=False,
+		action="store_true",
+		help="Optional flag to show a live plot of power, Vmpp and JV sweeps in a separate process. Requires matplotlib.",
+	)
+	parser.add_argument(
+		"--timing",
+		default=False,
+		action="store_true",
+		help="Optional flag to record per-command instrument latency histograms, summarised at the end of the run.",
+	)
+	parser.add_argument(
+		"-a",
+		"--algorithm",
+		default=trackingAlgorithm.PERTURB_AND_OBSERVE.value,
+		choices=[algorithm.value for algorithm in trackingAlgorithm],
+		help="MPP tracking algorithm: fixed step perturb and observe (po), adaptive step perturb and observe (adaptive) or incremental conductance (ic).",
+	)
+	parser.add_argument(
+		"-c",
+		"--channels",
+		nargs="+",
+		default=[],
+		metavar="ADDRESS[:AREA[:METADATA]]",
+		help="Track several sourcemeters concurrently, e.g. -c 20 21:0.09 22:0.1:Device3. Channels without an area or metadata use the run values.",
+	)
+	parser.add_argument(
+		"-x",
+		"--pixels",
+		nargs="+",
+		default=[],
+		metavar="CHANNEL",
+		help="Track several pixels with one sourcemeter by switching between them, e.g. -x 1!1 1!2 1!3 for channels of a Keithley 7001 switch.",
+	)
+	parser.add_argument(
+		"--switch_address",
+		default="7",
+		type=str,
+		help="GPIB address number for the switch used with --pixels, e.g. --switch_address 7",
+	)
+	parser.add_argument(
+		"--jv_interval",
+		type=float,
+		help="Optional interval in seconds between quick JV sweeps during tracking, each re-seeds the tracked Vmpp.",
+	)
+	parser.add_argument(
+		"--jv_power_drop",
+		type=float,
+		help="Optional fractional drop in tracked power below its peak since the last sweep that triggers a JV sweep, e.g. 0.1",
+	)
+	parser.add_argument(
+		"--sequence",
+		nargs="+",
+		default=[],
+		metavar="STEP[:SECONDS]",
+		help="Run measurement steps in order instead of one tracking run: voc, jv, dark_jv, track, dark and pulse, e.g. --sequence voc jv dark_jv track:3600 dark:60 pulse:5. Track steps without a duration use the tracking time, dark steps need -s.",
+	)
+	parser.add_argument(
+		"--resume",
+		type=str,
+		metavar="DATA_FILE",
+		help="Resume an interrupted run from the checkpoint saved next to its data file and keep appending to it, e.g. --resume data/20240101_120000_Device21_GPIB20.npy",
+	)
+	parser.add_argument(
+		"--log_json",
+		default=False,
+		action="store_true",
+		help="Optional flag to write the run log as JSON lines, one object per record, instead of plain text.",
+	)
 	parser.add_argument(
 		"-m",
 		"--metadata",
@@ -36,4 +129,13 @@ def parse_arguments(args: list[str]) -> argparse.Namespace:
 		help="Add metadata to data outputs, e.g. -m Device21_triple_cat_spin",
 	)
 
-	return parser.parse_args(args)
+	parsed = parser.parse_args(args)
+	if parsed.config is None and (parsed.tracking_time_seconds is None or parsed.device_area_cm2 is None):
+		parser.error("the following arguments are required: tracking_time_seconds, device_area_cm2")
+	if parsed.config is not None and (parsed.tracking_time_seconds is not None or parsed.device_area_cm2 is not None):
+		parser.error("a run configuration file sets the tracking time and device area of each job")
+	if parsed.config is not None:
+		ignored = [flag for dest, flag in JOB_OPTIONS.items() if getattr(parsed, dest) != parser.get_default(dest)]
+		if ignored:
+			parser.error(f"a run configuration file sets {', '.join(ignored)} for each job")
+	return parsed
@@ -1,12 +1,26 @@
+import math
 import numpy as np
+
+from typing import Optional
 from numpy.typing import NDArray
 
+from analysis.mpp import calc_pv_parameters
+
 
 def calc_mpp_from_iv(iv_data_array: NDArray[np.float64]) -> float:
 	# iv_data_array must be n * 2 array of current (I) and voltage (V) data
-	i = iv_data_array[:, 0]
-	v = iv_data_array[:, 1]
-	p = abs(v * i)
-	mpp_ind = np.argmax(p)
-	Vmpp = v[mpp_ind]
-	return Vmpp
+	return float(calc_pv_parameters(iv_data_array).vmpp)
+
+
+def ramp_levels(
+	start: float, stop: float, slew_rate: float, max_step: float, max_points: Optional[int] = None
+) -> tuple[NDArray[np.float64], float]:
+	# Staircase from start to stop in equal steps of at most max_step, widened if needed to fit in max_points, with
+	# the per point delay in s that keeps the slew rate (units per s) at or below slew_rate
+	if slew_rate <= 0:
+		raise ValueError(f"Ramp slew rate must be positive, got {slew_rate}.")
+	n_points = max(math.ceil(abs(stop - start) / max_step - 1e-9), 1) + 1
+	if max_points is not None:
+		n_points = min(n_points, max_points)
+	levels = np.linspace(start, stop, n_points)
+	return levels, abs(stop - start) / (n_points - 1) / slew_rate
@@ -1,10 +1,37 @@
 import re
-from typing import Optional
+import tomllib
 
-from pydantic import BaseModel, Field, field_validator
+from pathlib import Path
+from typing import Any, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator, model_validator
+
+from core.algorithms import trackingAlgorithm
+from core.sequence import SequenceStep, DARK_STEPS, parse_step
+from utils.data_writer import checkpoint_path
 
 VALID_GPIB_ADDRESS_REGEX = re.compile(r"^[0-9]{1,2}$")
 
+# Switches that hold for every job of a campaign, as they decide which instruments are opened and how
+CAMPAIGN_SETTINGS = ("dummy", "shutter", "plot", "timing", "log_json")
+
+
+def validate_gpib_address(v: str) -> str:
+	if not VALID_GPIB_ADDRESS_REGEX.match(v):
+		raise ValueError(f"GPIB address '{v}' is invalid. Should be a two digit number, typically between 0 and 30.")
+	return v
+
+
+class ChannelSetting(BaseModel):
+	gpib_address: str
+	device_area_cm2: float = Field(gt=0)
+	metadata: Optional[str] = None
+
+	@field_validator("gpib_address", mode="after")
+	@classmethod
+	def validate_gpib_address(cls, v: str) -> str:
+		return validate_gpib_address(v)
+
 
 class UserSetting(BaseModel):
 	tracking_time_seconds: int = Field(gt=0)
@@ -12,13 +39,145 @@ class UserSetting(BaseModel):
 	gpib_address: str
 	shutter: bool
 	dummy: bool
+	plot: bool = False
+	timing: bool = False
+	log_json: bool = False
 	metadata: Optional[str]
+	algorithm: trackingAlgorithm = trackingAlgorithm.PERTURB_AND_OBSERVE
+	channels: list[ChannelSetting] = []
+	pixels: list[str] = []
+	switch_address: str = "7"
+	jv_interval: Optional[float] = Field(default=None, gt=0)
+	jv_power_drop: Optional[float] = Field(default=None, gt=0, lt=1)
+	sequence: list[SequenceStep] = []
+	resume: Optional[Path] = None
 
 	@field_validator("gpib_address", mode="after")
 	@classmethod
 	def validate_gpib_address(cls, v: str) -> str:
-		if not VALID_GPIB_ADDRESS_REGEX.match(v):
-			raise ValueError(
-				f"GPIB address '{v}' is invalid. Should be a two digit number, typically between 0 and 30."
-			)
+		return validate_gpib_address(v)
+
+	@field_validator("switch_address", mode="after")
+	@classmethod
+	def validate_switch_address(cls, v: str) -> str:
+		return validate_gpib_address(v)
+
+	@field_validator("resume", mode="after")
+	@classmethod
+	def validate_resume(cls, v: Optional[Path]) -> Optional[Path]:
+		if v is not None and not checkpoint_path(v).exists():
+			raise ValueError(f"Cannot resume {v}, no checkpoint found at {checkpoint_path(v)}.")
 		return v
+
+	@model_validator(mode="after")
+	def check_resume_single_channel(self) -> "UserSetting":
+		if self.resume is not None and self.channels:
+			raise ValueError("Resuming is only supported for single channel runs.")
+		return self
+
+	@model_validator(mode="after")
+	def check_pixels_single_sourcemeter(self) -> "UserSetting":
+		if not self.pixels:
+			return self
+		if len(set(self.pixels)) != len(self.pixels):
+			raise ValueError(f"Each pixel needs a unique switch channel, got {self.pixels}.")
+		if self.channels or self.resume is not None:
+			raise ValueError("Multiplexed pixels cannot be combined with channels or resuming.")
+		if self.jv_interval is not None or self.jv_power_drop is not None:
+			raise ValueError("Periodic JV sweeps are not supported when multiplexing pixels.")
+		return self
+
+	@field_validator("sequence", mode="before")
+	@classmethod
+	def parse_sequence_steps(cls, v: Any) -> Any:
+		# Steps given on the command line as STEP[:SECONDS]
+		if not isinstance(v, list):
+			return v
+		return [parse_step(step) if isinstance(step, str) else step for step in v]
+
+	@model_validator(mode="after")
+	def check_sequence(self) -> "UserSetting":
+		if not self.sequence:
+			return self
+		if self.channels or self.pixels or self.resume is not None:
+			raise ValueError("Measurement sequences are only supported for single channel runs.")
+		dark = sorted({step.kind.value for step in self.sequence if step.kind in DARK_STEPS})
+		if dark and not self.shutter:
+			raise ValueError(f"Sequence steps {dark} need shutter control, add -s.")
+		return self
+
+	@field_validator("channels", mode="before")
+	@classmethod
+	def parse_channel_specs(cls, v: Any, info: ValidationInfo) -> Any:
+		# Channels given on the command line as ADDRESS[:AREA[:METADATA]] fall back to the run area and metadata
+		if not isinstance(v, list):
+			return v
+
+		channels = []
+		for channel in v:
+			if isinstance(channel, str):
+				address, area, metadata = (channel.split(":", 2) + [None, None])[:3]
+				channel = {
+					"gpib_address": address,
+					"device_area_cm2": area or info.data.get("device_area_cm2"),
+					"metadata": metadata or info.data.get("metadata"),
+				}
+			channels.append(channel)
+		return channels
+
+
+class JobSetting(UserSetting):
+	# One queued run of a campaign, on one device. Run-wide switches come from the campaign.
+	model_config = ConfigDict(extra="forbid")
+
+	shutter: bool = False
+	dummy: bool = False
+	metadata: Optional[str] = None
+
+	@model_validator(mode="after")
+	def check_single_device(self) -> "JobSetting":
+		if self.channels or self.pixels or self.resume is not None:
+			raise ValueError("Campaign jobs track one device each and cannot use channels, pixels or resume.")
+		return self
+
+
+class CampaignSetting(BaseModel):
+	# A queue of jobs read from a run configuration file and run back to back on the same instrument sessions
+	model_config = ConfigDict(extra="forbid")
+
+	metadata: Optional[str] = None  # names the campaign log
+	dummy: bool = False
+	shutter: bool = False
+	plot: bool = False
+	timing: bool = False
+	log_json: bool = False
+	jobs: list[JobSetting] = Field(min_length=1)
+
+	@model_validator(mode="before")
+	@classmethod
+	def fill_jobs(cls, data: Any) -> Any:
+		# Every job starts from the [defaults] table and takes the run-wide switches of the campaign
+		if not isinstance(data, dict) or not isinstance(data.get("jobs"), list):
+			return data
+		data = dict(data)
+		defaults = data.pop("defaults", {})
+		switches = {key: data[key] for key in CAMPAIGN_SETTINGS if key in data}
+
+		jobs = []
+		for job in data["jobs"]:
+			if isinstance(job, dict):
+				per_job = sorted(set(CAMPAIGN_SETTINGS) & (set(defaults) | set(job)))
+				if per_job:
+					raise ValueError(f"{per_job} apply to the whole campaign and cannot be set for single jobs.")
+				job = {**defaults, **job, **switches}
+			jobs.append(job)
+		data["jobs"] = jobs
+		return data
+
+
+def load_campaign(path: str | Path, **switches: bool) -> CampaignSetting:
+	# Run configuration files are TOML. Switches set on the command line, such as dummy=True, are added on top.
+	with open(path, "rb") as f:
+		data = tomllib.load(f)
+	data.update({key: True for key, on in switches.items() if on})
+	return CampaignSetting.model_validate(data)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from analysis.hysteresis import analyse_hysteresis, resample_pairs
+from analysis.mpp import calc_pv_parameters, resample_rows
+
+
+def diode_current(v, isc=0.02, i0=1e-10, n_vt=0.045):
+	return -(isc - i0 * (np.exp(v / n_vt) - 1))
+
+
+def sweep_pair(isc_fwd=0.018, isc_rev=0.02, fwd_points=91, rev_points=61):
+	v_fwd = np.linspace(0.0, 0.9, fwd_points)
+	v_rev = np.linspace(0.9, 0.0, rev_points)
+	forward = np.column_stack([diode_current(v_fwd, isc=isc_fwd), v_fwd])
+	reverse = np.column_stack([diode_current(v_rev, isc=isc_rev), v_rev])
+	return forward, reverse
+
+
+def test_resample_rows_matches_np_interp_per_row():
+	rng = np.random.default_rng(1)
+	x = np.sort(rng.uniform(-1.0, 2.0, (5, 30)), axis=1)
+	y = rng.standard_normal((5, 30))
+	x_new = rng.uniform(-1.5, 2.5, (5, 40))
+
+	expected = np.array([np.interp(x_new[r], x[r], y[r]) for r in range(5)])
+	np.testing.assert_allclose(resample_rows(x, y, x_new), expected)
+
+
+def test_resample_pairs_uses_overlapping_voltage_range():
+	forward, reverse = sweep_pair()
+	grid, i_fwd, i_rev, single = resample_pairs(forward, reverse[5:], grid_points=11)
+
+	assert single
+	assert grid[0, 0] == 0.0
+	assert grid[0, -1] == pytest.approx(reverse[5, 1])
+	np.testing.assert_allclose(i_fwd[0], diode_current(grid[0], isc=0.018), atol=1e-4)
+
+
+def test_identical_sweeps_have_no_hysteresis():
+	forward, reverse = sweep_pair(isc_fwd=0.02)
+	result = analyse_hysteresis(forward, reverse)
+
+	assert result.hysteresis_index == pytest.approx(0.0, abs=1e-3)
+	assert result.area_index == pytest.approx(0.0, abs=1e-3)
+	assert result.average.vmpp == pytest.approx(result.reverse.vmpp, abs=5e-3)
+
+
+def test_hysteresis_index_and_proxy_curve_of_a_single_pair():
+	forward, reverse = sweep_pair()
+	result = analyse_hysteresis(forward, reverse)
+
+	expected_index = (result.reverse.pmpp - result.forward.pmpp) / result.reverse.pmpp
+	assert result.hysteresis_index == pytest.approx(expected_index)
+	assert 0.05 < result.hysteresis_index < 0.15
+	assert 0.05 < result.area_index < 0.15
+	assert result.voltage.shape == result.current.shape == (201,)
+	assert result.forward.pmpp < result.average.pmpp < result.reverse.pmpp
+	assert np.ndim(result.average.vmpp) == 0
+
+
+def test_batch_matches_single_pairs():
+	pairs = [sweep_pair(isc_fwd=isc) for isc in (0.016, 0.018, 0.02)]
+	forward = np.stack([f for f, _ in pairs])
+	reverse = np.stack([r for _, r in pairs])
+	batch = analyse_hysteresis(forward, reverse)
+
+	assert batch.current.shape == (3, 201)
+	for k, (f, r) in enumerate(pairs):
+		single = analyse_hysteresis(f, r)
+		assert batch.hysteresis_index[k] == pytest.approx(single.hysteresis_index)
+		assert batch.area_index[k] == pytest.approx(single.area_index)
+		assert batch.average.vmpp[k] == pytest.approx(single.average.vmpp)
+	assert batch.average.pmpp == pytest.approx(calc_pv_parameters(np.stack([batch.current, batch.voltage], -1)).pmpp)
+
+
+def test_mismatched_pairs_raise():
+	forward, reverse = sweep_pair()
+	with pytest.raises(ValueError, match="do not pair up"):
+		analyse_hysteresis(np.stack([forward, forward]), reverse)
+	with pytest.raises(ValueError, match="overlap"):
+		analyse_hysteresis(forward[:10], reverse[:10])
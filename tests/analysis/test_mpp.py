@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from analysis.mpp import calc_pv_parameters, interp_rows
+
+
+def diode_current(v, isc=0.02, i0=1e-10, n_vt=0.045):
+	# Photocurrent sunk by the sourcemeter is negative, as in the K2400 data
+	return -(isc - i0 * (np.exp(v / n_vt) - 1))
+
+
+@pytest.fixture
+def true_mpp():
+	v = np.linspace(0, 0.83, 400001)
+	p = np.abs(v * diode_current(v))
+	return v[np.argmax(p)], p.max()
+
+
+def test_fit_resolves_vmpp_below_sweep_step(true_mpp):
+	v = np.arange(0, 0.9, 0.05)
+	params = calc_pv_parameters(np.column_stack([diode_current(v), v]))
+
+	argmax_vmpp = v[np.argmax(np.abs(v * diode_current(v)) * (diode_current(v) < 0))]
+	assert abs(params.vmpp - true_mpp[0]) < abs(argmax_vmpp - true_mpp[0])
+	assert params.pmpp == pytest.approx(true_mpp[1], rel=0.02)
+
+
+def test_pv_parameters_of_fine_sweep(true_mpp):
+	v = np.linspace(0, 0.9, 451)
+	params = calc_pv_parameters(np.column_stack([diode_current(v), v]))
+
+	voc = 0.045 * np.log(0.02 / 1e-10 + 1)
+	assert params.voc == pytest.approx(voc, abs=1e-3)
+	assert params.isc == pytest.approx(0.02)
+	assert params.vmpp == pytest.approx(true_mpp[0], abs=1e-3)
+	assert params.impp == pytest.approx(true_mpp[1] / true_mpp[0], rel=1e-3)
+	assert params.ff == pytest.approx(true_mpp[1] / (voc * 0.02), rel=1e-2)
+
+
+def test_batch_matches_single_sweeps_and_sweep_direction():
+	v = np.linspace(0, 0.9, 91)
+	sweeps = np.stack(
+		[
+			np.column_stack([diode_current(v, isc=0.02), v]),
+			np.column_stack([diode_current(v, isc=0.015), v])[::-1],
+		]
+	)
+
+	batch = calc_pv_parameters(sweeps)
+	assert batch.vmpp.shape == (2,)
+	for k in range(2):
+		single = calc_pv_parameters(sweeps[k])
+		assert batch.vmpp[k] == pytest.approx(single.vmpp)
+		assert batch.voc[k] == pytest.approx(single.voc)
+		assert batch.pmpp[k] == pytest.approx(single.pmpp)
+
+
+def test_rejects_malformed_input():
+	with pytest.raises(ValueError):
+		calc_pv_parameters(np.zeros((10, 3)))
+	with pytest.raises(ValueError):
+		calc_pv_parameters(np.zeros((2, 2)))
+
+
+def test_interp_rows_extrapolates_off_the_end():
+	x = np.array([[0.0, 1.0, 2.0]])
+	y = np.array([[0.0, 2.0, 4.0]])
+	assert interp_rows(x, y, np.array([3.0])) == pytest.approx([6.0])
+	assert interp_rows(x, y, np.array([0.5])) == pytest.approx([1.0])
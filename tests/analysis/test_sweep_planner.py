@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from analysis.mpp import calc_pv_parameters
+from analysis.sweep_planner import SweepPlan, plan_sweep, point_density, linear_plan
+from controllers.simulatedK2400 import SingleDiodeModel
+
+
+@pytest.fixture(scope="module")
+def coarse_iv() -> np.ndarray:
+	model = SingleDiodeModel()
+	v = np.linspace(model.open_circuit_voltage(), 0.0, 15)
+	return np.column_stack([-model.current(v), v])
+
+
+def test_plan_fills_time_budget_at_minimum_delay(coarse_iv: np.ndarray):
+	plan = plan_sweep(coarse_iv, time_budget=3.0, min_delay=0.05)
+	assert len(plan.levels) == 60
+	assert plan.delay == pytest.approx(0.05)
+	assert plan.duration == pytest.approx(3.0)
+
+
+def test_plan_stretches_delay_once_list_memory_is_full(coarse_iv: np.ndarray):
+	plan = plan_sweep(coarse_iv, time_budget=20.0, min_delay=0.05, max_points=100)
+	assert len(plan.levels) == 100
+	assert plan.delay == pytest.approx(0.2)
+
+
+def test_plan_spans_zero_to_limit_in_sweep_order(coarse_iv: np.ndarray):
+	v_max = float(coarse_iv[0, 1])
+	reverse = plan_sweep(coarse_iv, time_budget=3.0)
+	forward = plan_sweep(coarse_iv, time_budget=3.0, reverse=False)
+
+	assert reverse.levels[0] == pytest.approx(v_max)
+	assert reverse.levels[-1] == pytest.approx(0.0)
+	assert np.all(np.diff(reverse.levels) < 0)
+	np.testing.assert_allclose(forward.levels, reverse.levels[::-1])
+
+
+def test_plan_concentrates_points_near_mpp_and_voc(coarse_iv: np.ndarray):
+	params = calc_pv_parameters(coarse_iv)
+	plan = plan_sweep(coarse_iv, time_budget=3.0)
+
+	def near_knee(v: np.ndarray) -> np.ndarray:
+		return (np.abs(v - params.vmpp) < 0.1) | (np.abs(v - params.voc) < 0.1)
+
+	window_share = near_knee(np.linspace(0.0, coarse_iv[0, 1], 10001)).mean()  # share a linear sweep would get
+	assert near_knee(plan.levels).mean() > 2 * window_share
+
+
+def test_planned_sweep_resolves_mpp_as_well_as_a_dense_linear_sweep(coarse_iv: np.ndarray):
+	model = SingleDiodeModel()
+	true_vmpp, _ = model.max_power_point()
+	plan = plan_sweep(coarse_iv, time_budget=2.0)
+	v = plan.levels
+	planned = calc_pv_parameters(np.column_stack([-model.current(v), v]))
+
+	v_lin = np.linspace(model.open_circuit_voltage(), 0.0, len(v))
+	linear = calc_pv_parameters(np.column_stack([-model.current(v_lin), v_lin]))
+
+	assert abs(planned.vmpp - true_vmpp) <= abs(linear.vmpp - true_vmpp) + 1e-3
+
+
+def test_point_density_falls_back_to_uniform_without_voc():
+	grid = np.linspace(0.0, 1.0, 101)
+	density = point_density(grid, vmpp=np.nan, voc=np.nan, knee_width=0.05, uniform_fraction=0.25)
+	np.testing.assert_allclose(density, 1.0)
+
+
+def test_plan_rejects_bad_inputs(coarse_iv: np.ndarray):
+	with pytest.raises(ValueError, match="uniform_fraction"):
+		plan_sweep(coarse_iv, time_budget=3.0, uniform_fraction=1.5)
+	with pytest.raises(ValueError, match="Sweep limit"):
+		plan_sweep(coarse_iv, time_budget=3.0, v_max=0.0)
+	assert isinstance(plan_sweep(coarse_iv, time_budget=0.0), SweepPlan)
+
+
+def test_linear_plan_is_evenly_spaced_within_budget():
+	plan = linear_plan(v_max=3.0, time_budget=2.0, min_delay=0.05, max_points=100)
+	assert len(plan.levels) == 40 and plan.delay == pytest.approx(0.05)
+	assert plan.levels[0] == 3.0 and plan.levels[-1] == 0.0
+	assert np.allclose(np.diff(plan.levels), -3.0 / 39)
@@ -1,13 +1,16 @@
 import pytest
 import pyvisa as visa
 import logging
+import numpy as np
 
 from unittest.mock import MagicMock, patch
 
 from pyvisa.resources import GPIBInstrument
 from pyvisa import VisaIOError
 
-from controllers.K2400 import K2400Context
+from controllers.K2400 import K2400Context, K2400Controller
+from controllers.interfaces import SourcemeterSample, sourcemeterOutput, sourcemeterMode, sweepDirection
+from utils.custom_exceptions import OutputLimitsExceededError
 
 
 @pytest.fixture
@@ -18,6 +21,12 @@ def mock_pyvisa_resource_manager():
 		yield mock_K2400GPIB
 
 
+@pytest.fixture
+def controller() -> K2400Controller:
+	mock_resource = MagicMock(spec=GPIBInstrument)
+	return K2400Controller(resource=mock_resource, voltage_protection=3.6, current_compliance=0.058)
+
+
 # Testing __init__()
 
 
@@ -112,3 +121,261 @@ def test_K2400context_exit_releases_resource_if_exception_during_exit(
 
 	assert expected_exit_message in caplog.records[0].message
 	mock_pyvisa_resource_manager.close.assert_called_once()  # type: ignore
+
+
+# Testing K2400Controller sweeps
+
+
+def test_K2400controller_sweep_arms_integer_point_count(controller: K2400Controller):
+	controller.set_sm_output(
+		output=sourcemeterOutput.VOLTAGE,
+		value=1.0,
+		mode=sourcemeterMode.SWEEP,
+		sweepdir=sweepDirection.REVERSE,
+		sweep_rate=0.2,
+	)
+	assert controller.sweep_points == 100
+	controller.resource.write.assert_any_call(":trigger:count 100")  # type: ignore
+	controller.resource.write.assert_any_call(":source:sweep:points 100")  # type: ignore
+
+
+def test_K2400controller_sweep_points_limited_to_trace_buffer(controller: K2400Controller):
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=3.6, mode=sourcemeterMode.SWEEP, sweep_rate=0.001)
+	assert controller.sweep_points == 2500
+
+
+def test_K2400controller_read_sweep_fetches_binary_trace(controller: K2400Controller):
+	controller.sweep_points = 4
+	controller.resource.query_binary_values.return_value = np.arange(12, dtype=np.float32)  # type: ignore
+
+	with patch("controllers.K2400.time.sleep"):
+		sweep = controller.read_sweep()
+
+	controller.resource.write.assert_any_call(":format:data real,32")  # type: ignore
+	controller.resource.write.assert_any_call(":trace:points 4")  # type: ignore
+	controller.resource.query_binary_values.assert_called_once_with(  # type: ignore
+		":trace:data?", datatype="f", is_big_endian=False, container=np.array
+	)
+	controller.resource.write.assert_called_with(":format:data ascii")  # type: ignore
+	assert sweep.shape == (4, 3)
+	assert sweep.dtype == np.float64
+	assert sweep[1].tolist() == [4.0, 3.0, 5.0]  # sent as V, I, t
+
+
+# Testing K2400Controller cached state
+
+
+def test_K2400controller_fixed_step_only_writes_changed_level(controller: K2400Controller):
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	controller.resource.write.reset_mock()  # type: ignore
+
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.51, mode=sourcemeterMode.FIXED)
+	controller.resource.write.assert_called_once_with(":source:voltage 0.51")  # type: ignore
+
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.51, mode=sourcemeterMode.FIXED)
+	controller.resource.write.assert_called_once()  # type: ignore
+
+
+def test_K2400controller_fixed_after_sweep_restores_mode_and_trigger_count(controller: K2400Controller):
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=1.0, mode=sourcemeterMode.SWEEP, sweep_rate=0.2)
+	controller.resource.write.reset_mock()  # type: ignore
+
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	written = [c.args[0] for c in controller.resource.write.call_args_list]  # type: ignore
+	assert written == [":source:voltage:mode fixed", ":trigger:count 1", ":trigger:delay 0.0", ":source:voltage 0.5"]
+
+
+def test_K2400controller_reset_invalidates_cached_state(controller: K2400Controller):
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	controller.reset()
+	controller.resource.write.reset_mock()  # type: ignore
+
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	controller.resource.write.assert_any_call(":source:function voltage")  # type: ignore
+	controller.resource.write.assert_any_call(":output on")  # type: ignore
+
+
+def test_K2400controller_visa_error_invalidates_cached_state(controller: K2400Controller):
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	controller.resource.query_ascii_values.side_effect = VisaIOError(-1073807339)  # type: ignore  # VI_ERROR_TMO
+
+	with pytest.raises(VisaIOError):
+		controller.read_output()
+
+	controller.resource.write.reset_mock()  # type: ignore
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	assert controller.resource.write.call_count == 6  # type: ignore
+
+
+def test_K2400controller_output_off_always_written(controller: K2400Controller):
+	controller.output_off()
+	controller.output_off()
+	assert controller.resource.write.call_args_list[-2:] == [((":output off",),), ((":output off",),)]  # type: ignore
+
+	controller.resource.write.reset_mock()  # type: ignore
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	controller.resource.write.assert_any_call(":output on")  # type: ignore
+
+
+# Testing K2400Controller set_and_read()
+
+
+def test_K2400controller_set_and_read_arms_fixed_mode_first(controller: K2400Controller):
+	controller.resource.query_ascii_values.return_value = [0.5, -0.01, 1.0]  # type: ignore
+	sample = controller.set_and_read(0.5)
+
+	controller.resource.write.assert_any_call(":source:voltage 0.5")  # type: ignore
+	controller.resource.query_ascii_values.assert_called_once_with(message="READ?")  # type: ignore
+	assert sample[:3] == (-0.01, 0.5, 1.0)
+
+
+def test_K2400controller_set_and_read_sends_one_compound_message(controller: K2400Controller):
+	controller.resource.query_ascii_values.return_value = [0.5, -0.01, 1.0]  # type: ignore
+	controller.set_and_read(0.5)
+	controller.resource.write.reset_mock()  # type: ignore
+	controller.resource.query_ascii_values.return_value = [0.51, -0.011, 1.1]  # type: ignore
+
+	sample = controller.set_and_read(0.51)
+
+	controller.resource.write.assert_not_called()  # type: ignore
+	controller.resource.query_ascii_values.assert_called_with(message=":source:voltage 0.51;:READ?")  # type: ignore
+	assert (sample.current, sample.voltage, sample.time) == (-0.011, 0.51, 1.1)
+
+
+def test_K2400controller_set_and_read_stamps_host_time_around_the_transaction(controller: K2400Controller):
+	controller.resource.query_ascii_values.return_value = [0.5, -0.01, 1.0]  # type: ignore
+	with patch("controllers.K2400.time.perf_counter_ns", side_effect=[1_000, 3_000]):
+		sample = controller.set_and_read(0.5)
+
+	assert sample.host_ns == 2_000
+
+
+def test_K2400controller_set_and_read_checks_limits(controller: K2400Controller):
+	controller.resource.query_ascii_values.return_value = [0.5, -0.01, 1.0]  # type: ignore
+	controller.set_and_read(0.5)
+
+	with pytest.raises(OutputLimitsExceededError):
+		controller.set_and_read(4.0)
+	assert controller.resource.query_ascii_values.call_count == 1  # type: ignore
+
+
+def test_K2400controller_ascii_and_binary_readings_agree(controller: K2400Controller):
+	reply = [0.5, -0.01, 1.0]  # V, I, t as the K2400 sends them
+	controller.resource.query_ascii_values.return_value = reply  # type: ignore
+	controller.resource.query_binary_values.return_value = np.array(reply, dtype=np.float32)  # type: ignore
+	with patch("controllers.K2400.time.perf_counter_ns", return_value=2_000):
+		samples = [
+			SourcemeterSample(*controller.read_output(), 2_000),
+			controller.set_and_read(0.5),
+			controller.set_and_read(0.51),
+		]
+	controller.sweep_points = 1
+	with patch("controllers.K2400.time.sleep"):
+		(row,) = controller.read_sweep()
+	samples.append(SourcemeterSample(*row.tolist(), 2_000))
+
+	expected = SourcemeterSample(-0.01, 0.5, 1.0, 2_000)
+	for sample in samples:
+		assert sample == pytest.approx(expected)
+
+
+# Testing K2400Controller ramp_output()
+
+
+def ramp_levels_written(resource: MagicMock) -> list[float]:
+	# Every voltage level sent to the instrument in order, whether alone or ahead of a READ?
+	levels = []
+	for call in resource.method_calls:
+		if call[0] in ("write", "query_ascii_values"):
+			message = call.args[0] if call.args else call.kwargs["message"]
+			for part in message.split(";"):
+				if part.startswith(":source:voltage "):
+					levels.append(float(part.split(" ", 1)[1]))
+	return levels
+
+
+def test_K2400controller_ramp_steps_fixed_levels_timed_by_trigger_delay(controller: K2400Controller):
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	controller.resource.write.reset_mock()  # type: ignore
+	controller.resource.query_ascii_values.return_value = [0.5, 0.0, 1.0]  # type: ignore
+	controller.resource.query.return_value = "+5.000000E-02"  # type: ignore
+	controller.ramp_output(1.0, slew_rate=0.5, max_step=0.01)
+
+	# steps run with no source delay, so the trigger delay alone sets the slew rate, then the source delay is restored
+	controller.resource.query.assert_called_once_with(":source:delay?")  # type: ignore
+	writes = [c.args[0] for c in controller.resource.write.call_args_list]  # type: ignore
+	assert writes == [":source:delay 0.0", ":trigger:delay 0.02", ":source:delay 0.05", ":trigger:delay 0.0"]
+	steps = controller.resource.query_ascii_values.call_args_list  # type: ignore
+	assert len(steps) == 50
+	assert steps[-1].kwargs["message"] == ":source:voltage 1.0;:READ?"
+
+	# Left armed at target, so tracking carries on with single round trips
+	controller.set_and_read(0.99)
+	assert controller.resource.query_ascii_values.call_args.kwargs["message"] == ":source:voltage 0.99;:READ?"  # type: ignore
+
+
+def test_K2400controller_ramp_after_sweep_clears_the_sweep_source_delay(controller: K2400Controller):
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=1.0, mode=sourcemeterMode.SWEEP, sweep_rate=0.2)
+	controller.resource.write.reset_mock()  # type: ignore
+	controller.resource.query_ascii_values.return_value = [0.5, 0.0, 1.0]  # type: ignore
+	controller.ramp_output(0.5, slew_rate=0.5, max_step=0.01)
+
+	controller.resource.query.assert_not_called()  # type: ignore
+	delays = [c.args[0] for c in controller.resource.write.call_args_list if "delay" in c.args[0]]  # type: ignore
+	assert delays == [
+		":trigger:delay 0.0",
+		":source:delay 0.0",
+		":trigger:delay 0.02",
+		":source:delay 0.05",
+		":trigger:delay 0.0",
+	]
+	assert controller._state[":source:delay"] == 0.05  # what the next tracking step settles on
+
+
+@pytest.mark.parametrize(("start", "target"), [(0.5, 1.0), (2.0, 0.1), (0.0, 0.333)])
+def test_K2400controller_ramp_never_jumps_more_than_max_step(controller: K2400Controller, start: float, target: float):
+	replies = {":output?": "1", ":source:function?": "VOLT", ":source:voltage?": str(start), ":source:delay?": "0"}
+	controller.resource.query.side_effect = replies.get  # type: ignore
+	controller.resource.query_ascii_values.return_value = [0.0, 0.0, 0.0]  # type: ignore
+	controller.ramp_output(target, slew_rate=0.5, max_step=0.01)
+
+	levels = [start, *ramp_levels_written(controller.resource)]  # type: ignore
+	assert levels[-1] == pytest.approx(target)
+	assert np.abs(np.diff(levels)).max() <= 0.01 + 1e-12
+
+
+def test_K2400controller_ramp_checks_limits_up_front(controller: K2400Controller):
+	controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	controller.resource.write.reset_mock()  # type: ignore
+	with pytest.raises(OutputLimitsExceededError):
+		controller.ramp_output(4.0)
+	controller.resource.write.assert_not_called()  # type: ignore
+
+
+# Testing K2400Controller list mode
+
+
+def test_K2400controller_list_uploads_levels_and_arms_trigger(controller: K2400Controller):
+	controller.set_sm_list(output=sourcemeterOutput.VOLTAGE, levels=[0.5, 0.52, 0.51, 0.5], delay=0.01)
+
+	controller.resource.write.assert_any_call(":source:voltage:mode list")  # type: ignore
+	controller.resource.write.assert_any_call(":source:list:voltage 0.5,0.52,0.51,0.5")  # type: ignore
+	controller.resource.write.assert_any_call(":source:delay 0.01")  # type: ignore
+	controller.resource.write.assert_any_call(":trigger:count 4")  # type: ignore
+	assert controller.sweep_points == 4
+
+	controller.resource.query_binary_values.return_value = np.zeros(12, dtype=np.float32)  # type: ignore
+	with patch("controllers.K2400.time.sleep") as sleep:
+		controller.read_sweep()
+	sleep.assert_called_once_with(pytest.approx(0.04))
+
+
+def test_K2400controller_list_rejects_unsafe_or_oversized_lists(controller: K2400Controller):
+	controller.resource.write.reset_mock()  # type: ignore
+	with pytest.raises(OutputLimitsExceededError):
+		controller.set_sm_list(output=sourcemeterOutput.VOLTAGE, levels=[0.5, 4.0])
+	with pytest.raises(ValueError, match="between 2 and 100 points"):
+		controller.set_sm_list(output=sourcemeterOutput.VOLTAGE, levels=np.linspace(0, 1, 101))  # type: ignore
+	with pytest.raises(ValueError, match="set_sm_list"):
+		controller.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.LIST)
+	controller.resource.write.assert_not_called()  # type: ignore
@@ -0,0 +1,54 @@
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+from pyvisa.resources import GPIBInstrument
+
+from controllers.K7001 import K7001Context, K7001Switch
+
+
+@pytest.fixture
+def switch() -> K7001Switch:
+	with patch("controllers.K7001.time.sleep"):
+		yield K7001Switch(resource=MagicMock(spec=GPIBInstrument), channels=["1!1", "1!2"], settling_time=0.02)
+
+
+def test_K7001context_requires_address():
+	assert K7001Context("7").address == "GPIB0::7::INSTR"
+	with pytest.raises(ValueError, match="Switch GPIB connection"):
+		K7001Context("")
+
+
+def test_K7001context_opens_all_channels_on_exit():
+	with patch("pyvisa.ResourceManager") as mock_rm:
+		with K7001Context("7") as resource:
+			pass
+	resource.write.assert_called_once_with(":open all")
+	mock_rm.return_value.open_resource.return_value.close.assert_called_once()
+
+
+def test_switch_starts_with_all_channels_open(switch: K7001Switch):
+	switch.resource.write.assert_called_once_with(":open all")
+	assert switch.selected is None
+
+
+def test_select_breaks_before_make_and_waits_for_completion(switch: K7001Switch):
+	switch.select("1!2")
+	switch.resource.write.assert_called_with(":open all;:close (@1!2)")
+	switch.resource.query.assert_called_once_with("*OPC?")
+	assert switch.selected == "1!2"
+
+	switch.select("1!2")  # already closed, no transaction
+	assert switch.resource.write.call_count == 2
+
+
+def test_select_rejects_unknown_channel(switch: K7001Switch):
+	with pytest.raises(ValueError, match="not one of the configured channels"):
+		switch.select("2!1")
+
+
+def test_disconnect_opens_all_channels(switch: K7001Switch):
+	switch.select("1!1")
+	switch.disconnect()
+	switch.resource.write.assert_called_with(":open all")
+	assert switch.selected is None
@@ -33,3 +33,12 @@ def test_shutter_releases_resource(caplog: pytest.LogCaptureFixture):
 		pass
 
 	assert caplog.records[-1].message == "Closed shutter."
+
+
+def test_shutter_pulse_records_scheduled_edges():
+	shutter = dummyShutter(enabled=True)
+	with shutter:
+		opened, closed = shutter.pulse(2.0)
+
+	assert closed.host_ns - opened.host_ns == 2_000_000_000
+	assert [event.open for event in shutter.timeline] == [True, True, False, False]
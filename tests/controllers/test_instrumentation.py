@@ -0,0 +1,86 @@
+import json
+import math
+import pytest
+
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from pyvisa.resources import GPIBInstrument
+
+from controllers.K2400 import K2400Controller
+from controllers.simulatedK2400 import simulatedK2400Controller
+from controllers.instrumentation import LatencyHistogram, LatencyRecorder, instrument_controller, scpi_header
+
+
+@pytest.fixture
+def controller() -> K2400Controller:
+	resource = MagicMock(spec=GPIBInstrument)
+	resource.query_ascii_values.return_value = [-0.01, 0.5, 1.0]
+	return K2400Controller(resource=resource, voltage_protection=3.6, current_compliance=0.058)
+
+
+@pytest.mark.parametrize(
+	"message, header",
+	[
+		(":source:voltage 0.51", ":source:voltage"),
+		(":source:voltage 0.51;:READ?", ":source:voltage;:READ?"),
+		('  :sense:function "current:dc", "voltage:dc"', ":sense:function"),
+		("READ?", "READ?"),
+	],
+)
+def test_scpi_header_strips_arguments(message: str, header: str):
+	assert scpi_header(message) == header
+
+
+def test_histogram_percentiles_land_in_the_right_bin():
+	histogram = LatencyHistogram()
+	for _ in range(90):
+		histogram.record(0.001)
+	for _ in range(10):
+		histogram.record(0.1)
+
+	assert histogram.count == 100
+	assert histogram.percentile(50) == pytest.approx(0.001, rel=0.12)
+	assert histogram.percentile(95) == pytest.approx(0.1)  # clamped to the largest recorded latency
+	assert histogram.summary()["max_us"] == pytest.approx(1e5)
+	assert math.isnan(LatencyHistogram().percentile(50))
+
+
+def test_controller_records_scpi_and_operation_latency(controller: K2400Controller):
+	recorder = instrument_controller(controller)
+	controller.set_and_read(0.5)
+	controller.set_and_read(0.51)
+
+	summary = recorder.summary()
+	assert summary["op set_and_read"]["count"] == 2
+	assert summary["scpi :source:voltage;:READ?"]["count"] == 1
+	assert summary["scpi READ?"]["count"] == 1
+	assert summary["scpi :source:voltage"]["count"] == 1
+	assert summary["python set_and_read"]["p50_us"] <= summary["op set_and_read"]["p99_us"]
+
+
+def test_python_overhead_excludes_instrument_time(controller: K2400Controller):
+	recorder = instrument_controller(controller)
+	clock = iter([0.0, 1.0, 1.5, 1.6])  # operation start, query start, query end, operation end
+	with patch("controllers.instrumentation.time.perf_counter", side_effect=lambda: next(clock)):
+		controller.read_output()
+
+	assert recorder.histograms["scpi READ?"].total == pytest.approx(0.5)
+	assert recorder.histograms["op read_output"].total == pytest.approx(1.6)
+	assert recorder.histograms["python read_output"].total == pytest.approx(1.1)
+
+
+def test_controller_without_visa_resource_times_operations_only():
+	sm = simulatedK2400Controller(resource="GPIB0::20::INSTR", voltage_protection=3.6, current_compliance=0.058)  # type: ignore
+	recorder = instrument_controller(sm)
+	sm.set_and_read(1.0)
+	assert set(recorder.summary()) == {"op set_and_read", "op set_sm_output", "op read_output"}
+
+
+def test_report_logs_and_dumps_summary(tmp_path: Path, caplog: pytest.LogCaptureFixture):
+	recorder = LatencyRecorder()
+	recorder.record("op read_output", 0.02)
+	recorder.report(tmp_path / "timing.json")
+
+	assert json.loads((tmp_path / "timing.json").read_text())["op read_output"]["count"] == 1
+	assert "op read_output: 1 calls" in caplog.text
@@ -1,6 +1,6 @@
 import pytest
 
-from controllers.interfaces import SourcemeterContext, SourcemeterController, ShutterContext
+from controllers.interfaces import SourcemeterContext, SourcemeterController, ShutterContext, SwitchController
 
 
 def test_sourcemeter_context_cannot_be_instantiated():
@@ -16,3 +16,8 @@ def test_sourcemeter_controller_cannot_be_instantiated():
 def test_shutter_context_cannot_be_instantiated():
 	with pytest.raises(TypeError):
 		ShutterContext()  # type: ignore
+
+
+def test_switch_controller_cannot_be_instantiated():
+	with pytest.raises(TypeError):
+		SwitchController()  # type: ignore
@@ -6,6 +6,8 @@ from unittest.mock import MagicMock, patch
 from nidaqmx import Task  # type: ignore
 
 
+from nidaqmx.constants import SampleTimingType  # type: ignore
+
 from controllers.shutterUSB6501 import shutterUSB6501
 
 # !----------------------------Issue with patching NIDAQMX Task----------------------------!
@@ -61,3 +63,50 @@ def test_shutter_disabled_prints_correct_message():
 
 
 # Test __exit__():
+
+
+# Test sequencing:
+
+
+def test_open_and_close_write_line_levels_and_record_timeline(mock_nidaqmx_task: MagicMock) -> None:
+	shutter = shutterUSB6501(enabled=True)
+	with shutter:
+		shutter.close()
+		shutter.open()
+
+	writes = [c.args[0] for c in mock_nidaqmx_task.write.call_args_list]
+	assert writes[-4:] == [[False], [True], [False], [True]]  # low opens the shutter
+	assert [event.open for event in shutter.timeline] == [True, False, True, False]
+	assert all(a.host_ns <= b.host_ns for a, b in zip(shutter.timeline, shutter.timeline[1:]))
+
+
+def test_software_timed_pulse_closes_after_duration(mock_nidaqmx_task: MagicMock) -> None:
+	shutter = shutterUSB6501(enabled=True)
+	with shutter:
+		opened, closed = shutter.pulse(0.02)
+		shutter.wait()
+
+	assert closed.host_ns - opened.host_ns == 20_000_000
+	pulse_close = shutter.timeline[2]
+	assert pulse_close.open is False and pulse_close.host_ns - opened.host_ns >= 20_000_000
+
+
+def test_hardware_timed_pulse_plays_one_buffer(mock_nidaqmx_task: MagicMock) -> None:
+	shutter = shutterUSB6501(enabled=True, sample_rate=1000.0)
+	with shutter:
+		opened, closed = shutter.pulse(0.05)
+		mock_nidaqmx_task.timing.cfg_samp_clk_timing.assert_called_once()
+		assert mock_nidaqmx_task.timing.cfg_samp_clk_timing.call_args.kwargs["samps_per_chan"] == 51
+		assert mock_nidaqmx_task.write.call_args.args[0] == [False] * 50 + [True]
+		shutter.wait()
+
+	assert closed.host_ns - opened.host_ns == 50_000_000
+	mock_nidaqmx_task.wait_until_done.assert_called_once()
+	assert mock_nidaqmx_task.timing.samp_timing_type == SampleTimingType.ON_DEMAND
+
+
+def test_sequencing_a_disabled_shutter_raises() -> None:
+	shutter = shutterUSB6501(enabled=False)
+	with shutter:
+		with pytest.raises(RuntimeError, match="disabled"):
+			shutter.pulse(1.0)
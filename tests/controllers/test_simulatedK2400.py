@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+
+from unittest.mock import patch
+
+from controllers.interfaces import sourcemeterMode, sourcemeterOutput, sweepDirection
+from controllers.simulatedK2400 import SingleDiodeModel, simulatedK2400Controller
+from utils.custom_exceptions import OutputLimitsExceededError
+
+
+@pytest.fixture
+def sm() -> simulatedK2400Controller:
+	return simulatedK2400Controller(resource="GPIB0::20::INSTR", voltage_protection=3.6, current_compliance=0.058)  # type: ignore
+
+
+# Testing SingleDiodeModel
+
+
+def test_model_short_circuit_and_open_circuit():
+	model = SingleDiodeModel(jsc_mA_cm2=20.0, area_cm2=0.1, voc_per_cell=1.1, n_cells=3)
+	assert model.current(0.0) == pytest.approx(2e-3, rel=0.01)
+	voc = model.open_circuit_voltage()
+	assert voc == pytest.approx(3.3, abs=0.01)
+	assert model.current(voc) == pytest.approx(0.0, abs=1e-8)
+
+
+def test_model_mpp_lies_between_zero_and_voc():
+	model = SingleDiodeModel()
+	vmpp, pmpp = model.max_power_point()
+	assert 0 < vmpp < model.open_circuit_voltage()
+	assert pmpp == pytest.approx(vmpp * model.current(vmpp), rel=1e-6)
+
+
+def test_model_drifts_with_simulated_time():
+	model = SingleDiodeModel(light_drift_per_hour=-0.1, voc_drift_per_hour=-0.01)
+	assert model.current(0.0, t=3600) == pytest.approx(0.9 * model.current(0.0, t=0), rel=0.01)
+	assert model.open_circuit_voltage(t=3600) < model.open_circuit_voltage(t=0)
+
+
+def test_model_dark_current_is_not_generated():
+	model = SingleDiodeModel()
+	model.illuminated = False
+	assert model.current(0.0) == pytest.approx(0.0, abs=1e-9)
+	assert model.current(2.0) < 0
+
+
+# Testing simulatedK2400Controller
+
+
+def test_fixed_voltage_reading_sinks_photocurrent_and_advances_clock():
+	sm = simulatedK2400Controller(
+		resource="GPIB0::20::INSTR",  # type: ignore
+		voltage_protection=3.6,
+		current_compliance=0.058,
+		latency=0.01,
+		settling_time=0.05,
+	)
+	sm.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=1.0, mode=sourcemeterMode.FIXED)
+	i, v, t = sm.read_output()
+
+	assert v == 1.0
+	assert i == pytest.approx(-sm.model.current(1.0), rel=1e-6)
+	assert t == pytest.approx(0.01 + 0.01 + 0.05)
+
+
+def test_set_and_read_costs_one_transaction_once_sourcing():
+	sm = simulatedK2400Controller(
+		resource="GPIB0::20::INSTR",  # type: ignore
+		voltage_protection=3.6,
+		current_compliance=0.058,
+		latency=0.01,
+		settling_time=0.05,
+	)
+	first = sm.set_and_read(1.0)
+	assert first.time == pytest.approx(0.01 + 0.01 + 0.05)
+
+	second = sm.set_and_read(1.1)
+	assert second.voltage == 1.1
+	assert second.current == pytest.approx(-sm.model.current(1.1), rel=1e-6)
+	assert second.time - first.time == pytest.approx(0.01 + 0.05)
+
+
+def test_ramp_follows_slew_rate_and_leaves_fixed_output_at_target(sm: simulatedK2400Controller):
+	sm.set_and_read(0.5)
+	start = sm.clock
+	sm.ramp_output(1.5, slew_rate=0.5, max_step=0.01)
+
+	assert sm.clock - start == pytest.approx(2.0)  # 1 V at 0.5 V/s
+	assert sm.set_and_read(1.5).voltage == 1.5
+	with pytest.raises(OutputLimitsExceededError):
+		sm.ramp_output(4.0)
+
+
+def test_instrument_timestamps_drift_against_host_clock():
+	sm = simulatedK2400Controller(
+		resource="GPIB0::20::INSTR",  # type: ignore
+		voltage_protection=3.6,
+		current_compliance=0.058,
+		clock_drift=100e-6,
+	)
+	sm.elapse(1000.0)
+	sample = sm.set_and_read(1.0)
+
+	assert sample.host_ns == round(sm.clock * 1e9)
+	assert sample.time == pytest.approx(sm.clock * (1 + 100e-6))
+
+
+def test_zero_current_reading_returns_voc(sm: simulatedK2400Controller):
+	sm.set_sm_output(output=sourcemeterOutput.CURRENT, value=0, mode=sourcemeterMode.FIXED)
+	i, v, _ = sm.read_output()
+	assert i == pytest.approx(0.0, abs=1e-9)
+	assert v == pytest.approx(sm.model.open_circuit_voltage(), abs=1e-6)
+
+
+@pytest.mark.parametrize("sweepdir", [sweepDirection.FORWARD, sweepDirection.REVERSE])
+def test_sweep_returns_instrument_timed_jv_curve(sm: simulatedK2400Controller, sweepdir: sweepDirection):
+	sm.set_sm_output(
+		output=sourcemeterOutput.VOLTAGE, value=3.3, mode=sourcemeterMode.SWEEP, sweepdir=sweepdir, sweep_rate=0.5
+	)
+	sweep = sm.read_sweep()
+
+	assert sweep.shape == (132, 3)
+	assert np.all(np.diff(sweep[:, 2]) == pytest.approx(0.05))
+	v = sweep[:, 1] if sweepdir == sweepDirection.FORWARD else sweep[::-1, 1]
+	assert v[0] == 0.0 and v[-1] == 3.3
+
+
+def test_list_runs_arbitrary_levels_with_its_own_delay(sm: simulatedK2400Controller):
+	levels = [2.0, 2.5, 2.4, 3.0]
+	sm.set_sm_list(output=sourcemeterOutput.VOLTAGE, levels=levels, delay=0.01)
+	start = sm.clock
+	sweep = sm.read_sweep()
+
+	assert sweep[:, 1].tolist() == levels
+	assert np.diff(sweep[:, 2]) == pytest.approx([0.01, 0.01, 0.01])
+	assert sweep[0, 2] - start == pytest.approx(0.01)
+
+
+def test_ion_migration_gives_scan_direction_hysteresis():
+	sm = simulatedK2400Controller(
+		resource="GPIB0::20::INSTR",  # type: ignore
+		voltage_protection=3.6,
+		current_compliance=0.058,
+		model=SingleDiodeModel(ion_amplitude=0.3, ion_tau=5.0),
+	)
+
+	def pmpp(sweepdir: sweepDirection) -> float:
+		sm.set_sm_output(
+			output=sourcemeterOutput.VOLTAGE, value=3.3, mode=sourcemeterMode.SWEEP, sweepdir=sweepdir, sweep_rate=0.2
+		)
+		sweep = sm.read_sweep()
+		return float(np.max(-sweep[:, 0] * sweep[:, 1]))
+
+	sm.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=3.3, mode=sourcemeterMode.FIXED)
+	sm.elapse(60)  # precondition near Voc as before a reverse scan
+	reverse = pmpp(sweepDirection.REVERSE)
+	forward = pmpp(sweepDirection.FORWARD)
+	assert reverse > forward
+
+
+def test_unsafe_output_raises(sm: simulatedK2400Controller):
+	with pytest.raises(OutputLimitsExceededError):
+		sm.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=4.0, mode=sourcemeterMode.FIXED)
+
+
+def test_output_off_reads_zero(sm: simulatedK2400Controller):
+	sm.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=1.0, mode=sourcemeterMode.FIXED)
+	sm.output_off()
+	i, v, _ = sm.read_output()
+	assert (i, v) == (0.0, 0.0)
+
+
+def test_realtime_mode_sleeps_for_modelled_time():
+	sm = simulatedK2400Controller(
+		resource="GPIB0::20::INSTR",  # type: ignore
+		voltage_protection=3.6,
+		current_compliance=0.058,
+		latency=0.01,
+		realtime=True,
+	)
+	with patch("controllers.simulatedK2400.time.sleep") as mock_sleep:
+		sm.read_output()
+	mock_sleep.assert_called_once_with(pytest.approx(0.06))
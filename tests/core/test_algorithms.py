@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from core.algorithms import (
+	AdaptivePerturbAndObserve,
+	IncrementalConductance,
+	PerturbAndObserve,
+	TrackingStrategy,
+	create_tracking_algorithm,
+	trackingAlgorithm,
+)
+
+
+def diode_current(v: float) -> float:
+	return -(0.02 - 1e-10 * (np.exp(v / 0.045) - 1))
+
+
+TRUE_VMPP = 0.7319
+
+
+def track(algorithm: TrackingStrategy, v_start: float, steps: int) -> list[float]:
+	algorithm.reset(v_start)
+	v = v_start
+	history = []
+	for _ in range(steps):
+		v = algorithm.next_voltage(v, diode_current(v))
+		history.append(v)
+	return history
+
+
+@pytest.mark.parametrize(
+	"algorithm",
+	[PerturbAndObserve(), AdaptivePerturbAndObserve(), IncrementalConductance()],
+)
+@pytest.mark.parametrize("v_start", [0.4, 0.8])
+def test_algorithms_converge_to_mpp(algorithm: TrackingStrategy, v_start: float):
+	history = track(algorithm, v_start, 100)
+	assert np.mean(history[-10:]) == pytest.approx(TRUE_VMPP, abs=0.02)
+
+
+def test_adaptive_step_converges_in_fewer_steps_than_fixed_step():
+	def steps_to_mpp(algorithm: TrackingStrategy) -> int:
+		history = np.array(track(algorithm, 0.3, 200))
+		return int(np.argmax(np.abs(history - TRUE_VMPP) < 0.01))
+
+	assert steps_to_mpp(AdaptivePerturbAndObserve()) < steps_to_mpp(PerturbAndObserve())
+
+
+def test_perturb_and_observe_reverses_when_power_falls():
+	po = PerturbAndObserve(v_step=0.01)
+	assert po.next_voltage(0.5, -0.02) == pytest.approx(0.51)
+	assert po.next_voltage(0.51, -0.01) == pytest.approx(0.50)
+
+
+def test_incremental_conductance_holds_at_mpp():
+	ic = IncrementalConductance(v_step=0.001, tolerance=0.05)
+	history = track(ic, 0.72, 200)
+	assert len(set(history[-20:])) == 1
+
+
+@pytest.mark.parametrize(
+	"algorithm, expected",
+	[
+		(trackingAlgorithm.PERTURB_AND_OBSERVE, PerturbAndObserve),
+		(trackingAlgorithm.ADAPTIVE_PERTURB_AND_OBSERVE, AdaptivePerturbAndObserve),
+		(trackingAlgorithm.INCREMENTAL_CONDUCTANCE, IncrementalConductance),
+	],
+)
+def test_create_tracking_algorithm(algorithm: trackingAlgorithm, expected: type):
+	assert isinstance(create_tracking_algorithm(algorithm), expected)
+
+
+@pytest.mark.parametrize(
+	"algorithm_type",
+	[PerturbAndObserve, AdaptivePerturbAndObserve, IncrementalConductance],
+)
+def test_restored_state_continues_the_same_trajectory(algorithm_type: type):
+	original = algorithm_type()
+	track(original, 0.4, 15)
+	restored = algorithm_type()
+	restored.restore(original.state())
+
+	v = 0.6
+	for _ in range(10):
+		v_original = original.next_voltage(v, diode_current(v))
+		assert restored.next_voltage(v, diode_current(v)) == v_original
+		v = v_original
+
+
+@pytest.mark.parametrize("algorithm", [PerturbAndObserve, AdaptivePerturbAndObserve, IncrementalConductance])
+def test_reset_discards_the_state_from_before_a_reseed(algorithm):
+	tracked = algorithm()
+	track(tracked, 0.9, 20)  # heading down from above the MPP
+	tracked.reset(TRUE_VMPP)
+	fresh = algorithm()
+	fresh.reset(TRUE_VMPP)
+	assert tracked.state() == fresh.state()
+
+
+@pytest.mark.parametrize("algorithm", [PerturbAndObserve(v_step=0.01), AdaptivePerturbAndObserve()])
+def test_first_step_after_reset_heads_for_the_seed(algorithm: TrackingStrategy):
+	algorithm.reset(0.7)
+	assert algorithm.next_voltage(0.75, diode_current(0.75)) < 0.75
+	algorithm.reset(0.7)
+	assert algorithm.next_voltage(0.65, diode_current(0.65)) > 0.65
+
+
+def test_adaptive_step_starts_fine_at_a_seeded_mpp():
+	adaptive = AdaptivePerturbAndObserve(min_step=0.001, max_step=0.02)
+	adaptive.reset(TRUE_VMPP)
+	assert adaptive.next_voltage(TRUE_VMPP, diode_current(TRUE_VMPP)) == pytest.approx(TRUE_VMPP + 0.001)
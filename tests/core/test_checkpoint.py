@@ -0,0 +1,65 @@
+import json
+import numpy as np
+import pytest
+
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from core.checkpoint import TrackerCheckpoint, load_checkpoint
+from utils.data_writer import StreamingDataWriter, TRACKING_DTYPE
+
+
+STATE = {"elapsed": 120.0, "v_set": 0.52}
+
+
+def test_checkpoint_is_due_at_start_and_after_each_interval(tmp_path: Path):
+	checkpoint = TrackerCheckpoint(tmp_path / "run_checkpoint.json", interval=60.0)
+	assert checkpoint.due(0.0)
+	checkpoint.save(STATE, 0.0)
+
+	assert not checkpoint.due(59.0)
+	assert checkpoint.due(60.0)
+
+
+def test_checkpoint_records_state_and_paths_of_writers(tmp_path: Path):
+	writer = MagicMock(rows_written=42, path=tmp_path / "run.npy")
+	checkpoint = TrackerCheckpoint(tmp_path / "run_checkpoint.json", writers={"data": writer})
+	checkpoint.save({**STATE, "rows": {"data": 40}}, 0.0)
+
+	saved = json.loads(checkpoint.path.read_text())
+	assert saved["rows"] == {"data": 40}  # counted by the tracker, the writer may still be behind
+	assert saved["paths"] == {"data": str(tmp_path / "run.npy")}
+	assert saved["v_set"] == 0.52
+	assert not checkpoint.path.with_suffix(".json.tmp").exists()
+
+
+def test_reconcile_cuts_rows_written_after_the_checkpoint_and_reports_lost_ones(tmp_path: Path):
+	for name, rows in [("data", 5), ("jv", 2)]:
+		with StreamingDataWriter(tmp_path / f"{name}.npy") as writer:
+			writer.extend(np.zeros(rows, dtype=TRACKING_DTYPE))
+
+	writers = {name: StreamingDataWriter(tmp_path / f"{name}.npy", append=True).open() for name in ("data", "jv")}
+	checkpoint = TrackerCheckpoint(tmp_path / "run_checkpoint.json", writers=writers)
+	rows = checkpoint.reconcile({**STATE, "rows": {"data": 3, "jv": 4}})
+	for writer in writers.values():
+		writer.close()
+
+	assert rows == {"data": 3, "jv": 2}
+	assert np.load(tmp_path / "data.npy").shape == (3,)
+	assert np.load(tmp_path / "jv.npy").shape == (2,)
+
+
+def test_load_checkpoint_round_trip(tmp_path: Path):
+	checkpoint = TrackerCheckpoint(tmp_path / "run_checkpoint.json")
+	checkpoint.save(STATE, 0.0)
+	assert load_checkpoint(checkpoint.path)["elapsed"] == 120.0
+
+
+def test_load_missing_checkpoint_raises(tmp_path: Path):
+	with pytest.raises(FileNotFoundError):
+		load_checkpoint(tmp_path / "run_checkpoint.json")
+
+
+def test_checkpoint_rejects_non_positive_interval(tmp_path: Path):
+	with pytest.raises(ValueError):
+		TrackerCheckpoint(tmp_path / "run_checkpoint.json", interval=0.0)
@@ -0,0 +1,78 @@
+import logging
+import math
+import numpy as np
+import pytest
+
+from core.clock_sync import ClockSync, host_clock_reference
+
+
+def test_clock_sync_single_sample_gives_offset_only():
+	sync = ClockSync()
+	sync.update(100.0, 5000.0)
+
+	assert sync.rate == 1.0
+	assert sync.offset == pytest.approx(4900.0)
+	assert sync.to_host(101.0) == pytest.approx(5001.0)
+
+
+def test_clock_sync_recovers_drift_through_host_jitter():
+	rng = np.random.default_rng(0)
+	sync = ClockSync(time_constant=86400.0)
+	instrument = np.arange(0.0, 3 * 86400.0, 60.0)  # three days, one sample a minute
+	host = 1e4 + instrument * (1 + 50e-6) + 2e-3 * rng.standard_normal(len(instrument))
+	for x, y in zip(instrument, host):
+		sync.update(x, y)
+
+	assert sync.drift_ppm == pytest.approx(50.0, abs=0.1)
+	assert sync.to_host(instrument[-1]) == pytest.approx(1e4 + instrument[-1] * (1 + 50e-6), abs=1e-3)
+
+
+def test_clock_sync_follows_a_change_in_drift():
+	sync = ClockSync(time_constant=600.0)
+	host = 0.0
+	for k in range(1, 7200):
+		host += 1 + (10e-6 if k < 3600 else 30e-6)
+		sync.update(float(k), host)
+
+	assert sync.drift_ppm == pytest.approx(30.0, abs=0.5)
+
+
+def test_clock_sync_holds_rate_until_span_is_long_enough():
+	sync = ClockSync(min_span=10.0)
+	sync.update(0.0, 0.0)
+	sync.update(1.0, 1.1)
+
+	assert sync.rate == 1.0
+
+
+def test_clock_sync_maps_arrays():
+	sync = ClockSync()
+	sync.update(0.0, 10.0)
+	assert sync.to_host(np.array([1.0, 2.0])).tolist() == pytest.approx([11.0, 12.0])
+
+
+def test_clock_sync_restarts_when_instrument_clock_goes_back(caplog: pytest.LogCaptureFixture):
+	sync = ClockSync()
+	sync.update(500.0, 1000.0)
+	with caplog.at_level(logging.WARNING):
+		sync.update(1.0, 1001.0)
+
+	assert "restarting the clock fit" in caplog.text
+	assert sync.samples == 1
+	assert sync.offset == pytest.approx(1000.0)
+
+
+def test_clock_sync_without_samples():
+	sync = ClockSync()
+	assert math.isnan(sync.offset)
+	assert math.isnan(sync.to_host(1.0))
+
+
+def test_clock_sync_rejects_non_positive_time_constant():
+	with pytest.raises(ValueError):
+		ClockSync(time_constant=0.0)
+
+
+def test_host_clock_reference_pairs_both_clocks():
+	reference = host_clock_reference()
+	assert set(reference) == {"perf_counter_ns", "unix_time_ns"}
@@ -0,0 +1,260 @@
+import numpy as np
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+from controllers.interfaces import SourcemeterController, SourcemeterSample, sweepDirection
+from controllers.simulatedK2400 import simulatedK2400Controller
+from core.algorithms import PerturbAndObserve
+from core.checkpoint import TrackerCheckpoint, load_checkpoint
+from core.core import MaximumPowerPointTracker
+from core.scheduler import JVScheduler
+from utils.custom_exceptions import OutputLimitsExceededError
+from utils.data_writer import StreamingDataWriter, JV_DTYPE, TRACKING_DTYPE
+from utils.utils import calc_mpp_from_iv
+
+
+@pytest.fixture
+def mock_sm() -> MagicMock:
+	sm = MagicMock(spec=SourcemeterController)
+	sm.set_and_read.return_value = SourcemeterSample(-0.01, 0.5, 1.0, 2_000_000_000)
+	return sm
+
+
+@pytest.fixture
+def tracker(mock_sm: MagicMock) -> MaximumPowerPointTracker:
+	mppt = MaximumPowerPointTracker(sourcemeter=mock_sm, cell_area=0.1, tracking_time=10, dummyMode=False)
+	mppt.find_initial_vmpp = MagicMock(return_value=0.5)  # type: ignore
+	return mppt
+
+
+def test_track_step_applies_set_point_and_asks_algorithm_for_next(tracker: MaximumPowerPointTracker, mock_sm):
+	tracker.v_set = 0.5
+	t, v, i, p, v_set, host_ns, t_host = tracker.track_step()
+
+	mock_sm.set_and_read.assert_called_once_with(0.5)
+	assert (t, v, i, v_set) == (1.0, 0.5, -0.01, 0.5)
+	assert (host_ns, t_host) == (2_000_000_000, 2.0)  # instrument time moved onto the host clock
+	assert p == pytest.approx(0.005)
+	assert tracker.v_set == pytest.approx(0.51)
+
+
+def test_walk_to_initial_vmpp_ends_at_vmpp(tracker: MaximumPowerPointTracker, mock_sm):
+	tracker.vmpp = 0.05
+	tracker.walk_to_initial_vmpp()
+	mock_sm.ramp_output.assert_called_once()  # one instrument-side ramp rather than a write per step
+	assert mock_sm.ramp_output.call_args.args[0] == 0.05
+	mock_sm.set_sm_output.assert_not_called()
+	assert tracker.v_set == 0.05
+
+
+def test_run_stops_after_tracking_time(tracker: MaximumPowerPointTracker, mock_sm):
+	clock = iter([0.0, 1.0, 5.0, 10.0])
+	with patch("core.core.time.monotonic", side_effect=lambda: next(clock)):
+		tracker.run()
+
+	assert mock_sm.set_and_read.call_count == 3
+	mock_sm.output_off.assert_called_once()
+
+
+def test_run_turns_output_off_and_reraises_on_limits_exceeded(mock_sm):
+	algorithm = MagicMock(spec=PerturbAndObserve)
+	algorithm.next_voltage.return_value = 10.0
+	mock_sm.set_and_read.side_effect = [
+		SourcemeterSample(-0.01, 0.5, 1.0, 2_000_000_000),
+		OutputLimitsExceededError("too high"),
+	]
+
+	mppt = MaximumPowerPointTracker(
+		sourcemeter=mock_sm, cell_area=0.1, tracking_time=10, dummyMode=False, algorithm=algorithm
+	)
+	mppt.find_initial_vmpp = MagicMock(return_value=0.0)  # type: ignore
+
+	with pytest.raises(OutputLimitsExceededError):
+		mppt.run()
+	mock_sm.output_off.assert_called_once()
+
+
+def test_run_streams_samples_to_data_writer(tracker: MaximumPowerPointTracker):
+	tracker.data_writer = MagicMock()
+	clock = iter([0.0, 1.0, 10.0])
+	with patch("core.core.time.monotonic", side_effect=lambda: next(clock)):
+		tracker.run()
+
+	assert tracker.data_writer.append.call_count == 2
+	t, v, i, *_ = tracker.data_writer.append.call_args_list[0].args[0]
+	assert (t, v, i) == (1.0, 0.5, -0.01)
+
+
+def test_run_publishes_samples_to_pipeline(tracker: MaximumPowerPointTracker):
+	tracker.pipeline = MagicMock()
+	tracker.data_writer = MagicMock()
+	clock = iter([0.0, 1.0, 10.0])
+	with patch("core.core.time.monotonic", side_effect=lambda: next(clock)):
+		tracker.run()
+
+	assert tracker.pipeline.publish.call_count == 2
+	tracker.data_writer.append.assert_not_called()
+
+
+def test_tracking_saves_a_checkpoint_to_resume_from(tmp_path, mock_sm):
+	path = tmp_path / "run.npy"
+	writer = StreamingDataWriter(path).open()
+	checkpoint = TrackerCheckpoint(tmp_path / "run_checkpoint.json", writers={"data": writer}, interval=5.0)
+	tracker = MaximumPowerPointTracker(
+		sourcemeter=mock_sm, cell_area=0.1, tracking_time=10, dummyMode=False, checkpoint=checkpoint, data_writer=writer
+	)
+	tracker.find_initial_vmpp = MagicMock(return_value=0.5)  # type: ignore
+	tracker.periodic_jv_sweep = MagicMock()  # type: ignore
+	tracker.jv_scheduler = MagicMock(sweeps=0, due=MagicMock(side_effect=["due", None, None, None]))
+	clock = iter([0.0, 1.0, 30.0, 31.0, 35.0])  # a JV sweep from 1 s to 30 s, not tracking time
+	tracker.clock = lambda: next(clock)
+	with pytest.raises(StopIteration):  # the run dies part way
+		tracker.run()
+	writer.extend(np.zeros(2, dtype=TRACKING_DTYPE))  # reached the file after the last checkpoint
+	writer.close()
+
+	state = load_checkpoint(checkpoint.path)
+	assert state["elapsed"] == 6.0
+	assert state["rows"] == {"data": 3}
+	assert state["algorithm"] == "PerturbAndObserve"
+
+	mock_sm.reset_mock()
+	writer = StreamingDataWriter(path, append=True).open()
+	state["rows"] = TrackerCheckpoint(checkpoint.path, writers={"data": writer}).reconcile(state)
+	assert writer.rows_written == 3  # the file is back where the checkpoint left it
+	resumed = MaximumPowerPointTracker(
+		sourcemeter=mock_sm, cell_area=0.1, tracking_time=10, dummyMode=False, data_writer=writer
+	)
+	resumed.find_initial_vmpp = MagicMock()  # type: ignore
+	clock = iter([100.0, 104.0])
+	resumed.clock = lambda: next(clock)
+	resumed.run(resume_from=state)
+	writer.close()
+
+	resumed.find_initial_vmpp.assert_not_called()  # no new Voc hold or initial sweep
+	assert resumed.vmpp == state["v_set"]
+	assert mock_sm.set_and_read.call_count == 1  # only the 4 s left of tracking
+	assert resumed.rows_recorded == 4 and np.load(path).shape == (4,)
+
+
+def test_planned_jv_sweep_prescans_once_then_reuses_last_sweep():
+	sm = simulatedK2400Controller(resource="GPIB0::20::INSTR", voltage_protection=3.6, current_compliance=0.058)  # type: ignore
+	mppt = MaximumPowerPointTracker(sourcemeter=sm, cell_area=0.1, tracking_time=10, dummyMode=True)
+	voc = sm.model.open_circuit_voltage()
+
+	start = sm.clock
+	i, v = mppt.planned_jv_sweep(max_voltage=voc, time_budget=3.0)
+	assert sm.clock - start == pytest.approx(3.0)
+	assert v[0] == pytest.approx(voc)
+	assert calc_mpp_from_iv(np.column_stack([i, v])) == pytest.approx(sm.model.max_power_point()[0], abs=0.01)
+
+	with patch.object(sm, "set_sm_list", wraps=sm.set_sm_list) as set_sm_list:
+		fwd_i, bcwd_i, fwd_v, bcwd_v = mppt.planned_jv_sweep(
+			max_voltage=voc, time_budget=3.0, sweep_direction=sweepDirection.BOTH
+		)
+	assert set_sm_list.call_count == 2
+	assert len(fwd_v) == len(bcwd_v) == 60
+	np.testing.assert_allclose(fwd_v, bcwd_v[::-1])
+	assert not sm.output_on
+
+
+def test_tracking_pauses_for_scheduled_jv_sweeps_and_reseeds_vmpp(tmp_path):
+	sm = simulatedK2400Controller(resource="GPIB0::20::INSTR", voltage_protection=3.6, current_compliance=0.058)  # type: ignore
+	vmpp, _ = sm.model.max_power_point()
+	mppt = MaximumPowerPointTracker(
+		sourcemeter=sm,
+		cell_area=0.1,
+		tracking_time=100,  # three sweeps, which with their ramps back up to Vmpp do not count as tracking time
+		dummyMode=True,
+		clock=lambda: sm.clock,
+		jv_scheduler=JVScheduler(interval=30, time_budget=2.0),
+		jv_writer=StreamingDataWriter(tmp_path / "run_jv.npy", dtype=JV_DTYPE).open(),
+	)
+	mppt.voc = sm.model.open_circuit_voltage()
+	mppt.v_set = vmpp - 0.3
+	mppt.track()
+	mppt.jv_writer.close()
+
+	assert mppt.jv_scheduler.sweeps == 3
+	assert mppt.vmpp == pytest.approx(vmpp, abs=0.01)
+
+	jv = np.load(tmp_path / "run_jv.npy")
+	assert sorted(set(jv["sweep"].tolist())) == [0, 1, 2]
+	assert jv["reverse"].sum() == len(jv) // 2
+	assert np.all(np.diff(jv["t"]) > 0)
+
+
+def open_circuit_transient(mock_sm: MagicMock, voc: float, tau: float, drift: float = 0.0, dt: float = 0.05):
+	# Each read advances a fake clock by dt along an exponential Voc transient with an optional linear drift
+	clock = {"t": 0.0}
+
+	def read_output():
+		clock["t"] += dt
+		t = clock["t"]
+		return [0.0, voc - 0.1 * np.exp(-t / tau) + drift * t, t]
+
+	mock_sm.read_output.side_effect = read_output
+	return lambda: clock["t"]
+
+
+def test_open_circuit_voltage_returns_once_settled(mock_sm: MagicMock):
+	clock = open_circuit_transient(mock_sm, voc=1.1, tau=0.3)
+	mppt = MaximumPowerPointTracker(sourcemeter=mock_sm, cell_area=0.1, tracking_time=10, dummyMode=False, clock=clock)
+
+	result = mppt.find_open_circuit_voltage(max_hold=30)
+
+	assert result.settled
+	assert result.voc == pytest.approx(1.1, abs=1e-3)
+	assert result.transient[-1, 0] < 5
+	assert result.transient.shape == (mock_sm.read_output.call_count, 2)
+	mock_sm.output_off.assert_called_once()
+
+
+def test_open_circuit_voltage_gives_up_after_max_hold(mock_sm: MagicMock, caplog: pytest.LogCaptureFixture):
+	clock = open_circuit_transient(mock_sm, voc=1.1, tau=0.3, drift=0.01)
+	mppt = MaximumPowerPointTracker(sourcemeter=mock_sm, cell_area=0.1, tracking_time=10, dummyMode=False, clock=clock)
+
+	result = mppt.find_open_circuit_voltage(max_hold=5)
+
+	assert not result.settled
+	assert result.transient[-1, 0] == pytest.approx(5, abs=0.05)
+	assert result.voc == pytest.approx(1.1 + 0.01 * result.transient[-1, 0], abs=1e-3)
+	assert "still drifting" in caplog.text
+
+
+def test_initial_vmpp_of_simulated_device():
+	sm = simulatedK2400Controller(resource="GPIB0::20::INSTR", voltage_protection=3.6, current_compliance=0.058)  # type: ignore
+	mppt = MaximumPowerPointTracker(
+		sourcemeter=sm, cell_area=0.1, tracking_time=10, dummyMode=True, clock=lambda: sm.clock
+	)
+
+	assert mppt.find_initial_vmpp() == pytest.approx(sm.model.max_power_point()[0], abs=0.01)
+	assert mppt.voc == pytest.approx(sm.model.open_circuit_voltage(), abs=1e-3)
+	assert mppt.voc_transient[-1, 0] < 1.5  # a settled device no longer costs the fixed 5 s hold
+
+
+def test_jv_sweep_in_both_directions_analyses_hysteresis():
+	sm = simulatedK2400Controller(resource="GPIB0::20::INSTR", voltage_protection=3.6, current_compliance=0.058)  # type: ignore
+	mppt = MaximumPowerPointTracker(sourcemeter=sm, cell_area=0.1, tracking_time=10, dummyMode=True)
+	voc = sm.model.open_circuit_voltage()
+
+	fwd_i, bcwd_i, fwd_v, bcwd_v = mppt.jv_sweep(max_voltage=voc, sweep_direction=sweepDirection.BOTH)
+	assert len(fwd_i) == len(bcwd_i) == len(fwd_v) == len(bcwd_v)
+	assert mppt.hysteresis is not None
+	assert mppt.hysteresis.average.vmpp == pytest.approx(sm.model.max_power_point()[0], abs=0.05)
+	assert mppt.hysteresis.hysteresis_index == pytest.approx(0.0, abs=0.01)  # the simulated device has no hysteresis
+	assert not sm.output_on
+
+
+def test_periodic_jv_sweep_ramps_back_up_to_the_reseeded_vmpp(tracker: MaximumPowerPointTracker, mock_sm):
+	def reseed(index, time_budget, sweep_direction):
+		tracker.vmpp = tracker.v_set = 0.6
+		return 0.6
+
+	with patch.object(tracker, "light_jv_sweep", side_effect=reseed):
+		tracker.periodic_jv_sweep(JVScheduler(interval=60.0))
+
+	mock_sm.ramp_output.assert_called_once()
+	assert mock_sm.ramp_output.call_args.args[0] == 0.6
+	assert tracker.v_set == 0.6
@@ -0,0 +1,104 @@
+import threading
+import pytest
+
+from unittest.mock import MagicMock, patch
+
+from core.multichannel import MultiChannelTracker
+from utils.validator import ChannelSetting
+
+
+@pytest.fixture
+def channels() -> list[ChannelSetting]:
+	return [
+		ChannelSetting(gpib_address="20", device_area_cm2=0.1, metadata="devA"),
+		ChannelSetting(gpib_address="21", device_area_cm2=0.2),
+	]
+
+
+@pytest.fixture(autouse=True)
+def log_in_tmp_path(tmp_path, monkeypatch: pytest.MonkeyPatch):
+	monkeypatch.chdir(tmp_path)
+
+
+def test_each_channel_tracks_on_its_own_named_thread(channels: list[ChannelSetting], tmp_path):
+	seen: dict[str, float] = {}
+
+	def fake_run(self):
+		seen[threading.current_thread().name] = self.cell_area
+
+	with patch("core.multichannel.MaximumPowerPointTracker.run", fake_run):
+		MultiChannelTracker(channels=channels, tracking_time=1, dummyMode=True).run()
+
+	assert seen == {"GPIB20": 0.1, "GPIB21": 0.2}
+	# each channel log sits next to the data of its channel
+	assert len(list((tmp_path / "data").glob("*_devA_GPIB20.log"))) == 1
+	assert len(list((tmp_path / "data").glob("*_mppPy_GPIB21.log"))) == 1
+	assert not list(tmp_path.glob("*.log"))
+
+
+def test_channels_share_one_resource_manager(channels: list[ChannelSetting]):
+	with (
+		patch("pyvisa.ResourceManager") as mock_rm,
+		patch("controllers.K2400.K2400Context") as mock_context,
+		patch("controllers.K2400.K2400Controller"),
+		patch("core.multichannel.MaximumPowerPointTracker"),
+	):
+		MultiChannelTracker(channels=channels, tracking_time=1, dummyMode=False).run()
+
+	mock_rm.assert_called_once()
+	for call in mock_context.call_args_list:
+		assert call.kwargs["resource_manager"] is mock_rm.return_value
+	mock_rm.return_value.close.assert_called_once()
+
+
+def test_failing_channel_does_not_stop_the_others(channels: list[ChannelSetting]):
+	finished = []
+
+	def fake_run(self):
+		if threading.current_thread().name == "GPIB20":
+			raise RuntimeError("VISA timeout")
+		finished.append(threading.current_thread().name)
+
+	tracker = MultiChannelTracker(channels=channels, tracking_time=1, dummyMode=True)
+	with patch("core.multichannel.MaximumPowerPointTracker.run", fake_run):
+		tracker.run()
+
+	assert finished == ["GPIB21"]
+	assert isinstance(tracker.errors["GPIB20"], RuntimeError)
+
+
+def test_duplicate_addresses_are_rejected():
+	duplicate = [ChannelSetting(gpib_address="20", device_area_cm2=0.1)] * 2
+	with pytest.raises(ValueError, match="unique GPIB address"):
+		MultiChannelTracker(channels=duplicate, tracking_time=1, dummyMode=True)
+
+
+def test_trackers_share_the_stop_event(channels: list[ChannelSetting]):
+	mock_tracker = MagicMock()
+	tracker = MultiChannelTracker(channels=channels, tracking_time=1, dummyMode=True)
+	with patch("core.multichannel.MaximumPowerPointTracker", mock_tracker):
+		tracker.run()
+
+	for call in mock_tracker.call_args_list:
+		assert call.kwargs["stop_event"] is tracker.stop_event
+
+
+def test_jv_schedule_gives_each_channel_its_own_scheduler_and_jv_file(channels: list[ChannelSetting], tmp_path):
+	mock_tracker = MagicMock()
+	tracker = MultiChannelTracker(channels=channels, tracking_time=1, dummyMode=True, jv_interval=60)
+	with patch("core.multichannel.MaximumPowerPointTracker", mock_tracker):
+		tracker.run()
+
+	schedulers = [call.kwargs["jv_scheduler"] for call in mock_tracker.call_args_list]
+	assert schedulers[0] is not schedulers[1]
+	assert all(scheduler.interval == 60 for scheduler in schedulers)
+	assert len(list((tmp_path / "data").glob("*_GPIB2?_jv.npy"))) == 2
+
+
+def test_channel_log_holds_its_tracking_summaries(channels: list[ChannelSetting], tmp_path):
+	MultiChannelTracker(channels=channels, tracking_time=1, dummyMode=True).run()
+
+	(logfile,) = (tmp_path / "data").glob("*_devA_GPIB20.log")
+	log = logfile.read_text()
+	assert "GPIB20: Tracking at t" in log
+	assert "GPIB21:" not in log
@@ -0,0 +1,94 @@
+import itertools
+import pytest
+
+from unittest.mock import MagicMock
+
+from controllers.interfaces import sourcemeterOutput, sourcemeterMode
+from controllers.simulatedK2400 import simulatedK2400Controller, SingleDiodeModel
+from controllers.simulatedSwitch import simulatedSwitch
+from core.core import MaximumPowerPointTracker
+from core.multiplexed import MultiplexedTracker, VisitScheduler, pixel_name
+from utils.constants import SIMULATED_GPIB_LATENCY
+
+
+@pytest.fixture
+def sm() -> simulatedK2400Controller:
+	return simulatedK2400Controller(
+		resource="GPIB0::20::INSTR",  # type: ignore
+		voltage_protection=3.6,
+		current_compliance=0.058,
+		latency=SIMULATED_GPIB_LATENCY,
+	)
+
+
+@pytest.fixture
+def models() -> dict[str, SingleDiodeModel]:
+	return {
+		"1!1": SingleDiodeModel(jsc_mA_cm2=22.0, voc_per_cell=1.10),
+		"1!2": SingleDiodeModel(jsc_mA_cm2=18.0, voc_per_cell=1.00),
+	}
+
+
+def make_trackers(sm: simulatedK2400Controller, channels) -> dict[str, MaximumPowerPointTracker]:
+	return {
+		channel: MaximumPowerPointTracker(
+			sourcemeter=sm, cell_area=0.1, tracking_time=60, dummyMode=True, data_writer=MagicMock()
+		)
+		for channel in channels
+	}
+
+
+def test_pixel_name_is_file_name_safe():
+	assert pixel_name("1!3") == "CH1-3"
+
+
+def test_visit_order_reverses_every_pass():
+	order = VisitScheduler().order(["a", "b", "c"])
+	assert list(itertools.islice(order, 9)) == ["a", "b", "c", "c", "b", "a", "a", "b", "c"]
+
+
+def test_dwell_amortises_switching_within_revisit_limit():
+	scheduler = VisitScheduler(max_overhead=0.1, max_revisit=10.0)
+	list(itertools.islice(scheduler.order(["a", "b"]), 1))
+	assert scheduler.dwell == 1  # nothing measured yet
+
+	scheduler.record_switch(0.1)
+	scheduler.record_steps(0.5, 10)
+	assert scheduler.dwell == 18  # 0.1 s switch is 10 % of a visit with 18 steps of 0.05 s
+
+	scheduler.record_switch(3.0)  # slow switch, now capped so the other pixel waits about 10 s
+	assert scheduler.dwell == pytest.approx((10.0 / 2 - scheduler.switch_time) / 0.05, abs=1)
+
+
+def test_each_pixel_tracks_its_own_maximum_power_point(sm, models):
+	switch = simulatedSwitch(sm, models)
+	trackers = make_trackers(sm, models)
+	mux = MultiplexedTracker(switch, trackers, tracking_time=60, clock=lambda: sm.clock)
+	mux.run()
+
+	for channel, tracker in trackers.items():
+		vmpp, _ = models[channel].max_power_point(sm.clock)
+		assert tracker.v_set == pytest.approx(vmpp, abs=0.05)
+		assert tracker.data_writer.append.call_count > 100
+
+	# switching cost is amortised over many steps per visit
+	assert mux.scheduler.dwell > 1
+	assert switch.switch_count < mux.visits
+	assert sm.output_on is False and switch.selected is None
+
+
+def test_pixels_are_only_switched_with_the_output_off(sm, models):
+	switch = simulatedSwitch(sm, models)
+	sm.set_sm_output(output=sourcemeterOutput.VOLTAGE, value=0.5, mode=sourcemeterMode.FIXED)
+	with pytest.raises(RuntimeError, match="output on"):
+		switch.select("1!1")
+
+	mux = MultiplexedTracker(switch, make_trackers(sm, models), tracking_time=5, clock=lambda: sm.clock)
+	mux.select("1!2")
+	assert switch.selected == "1!2" and sm.model is models["1!2"]
+
+
+def test_pixels_must_be_switch_channels(sm, models):
+	switch = simulatedSwitch(sm, models)
+	with pytest.raises(ValueError, match="not channels of the switch"):
+		MultiplexedTracker(switch, make_trackers(sm, ["1!1", "2!1"]), tracking_time=5)
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+import numpy as np
+import pytest
+
+from core.pipeline import AcquisitionPipeline, SampleRingBuffer, TrackingSummaryLogger, create_tracking_pipeline
+from utils.data_writer import TRACKING_DTYPE
+
+
+def sample(k: float) -> list[float]:
+	return [k, 0.5, -0.01, 0.005, 0.5, 0, k]
+
+
+def test_ring_buffer_drains_in_order():
+	buffer = SampleRingBuffer(capacity=4)
+	for k in range(3):
+		buffer.push(sample(k))
+
+	batch = buffer.drain()
+	assert batch.dtype == TRACKING_DTYPE
+	assert batch["t"].tolist() == [0, 1, 2]
+	assert len(buffer) == 0
+
+
+def test_ring_buffer_overwrites_oldest_when_full():
+	buffer = SampleRingBuffer(capacity=4)
+	for k in range(6):
+		buffer.push(sample(k))
+
+	assert buffer.dropped == 2
+	assert buffer.drain()["t"].tolist() == [2, 3, 4, 5]
+
+
+def test_ring_buffer_without_overwrite_grows_instead_of_dropping():
+	buffer = SampleRingBuffer(capacity=4, overwrite=False)
+	for k in range(3):
+		buffer.push(sample(k))
+	buffer.drain()
+	for k in range(3, 10):  # wraps around the end of the ring before growing
+		buffer.push(sample(k))
+
+	assert (buffer.dropped, buffer.capacity) == (0, 8)
+	assert buffer.drain()["t"].tolist() == list(range(3, 10))
+
+
+def test_tracking_pipeline_writer_gets_every_sample_behind_a_slow_start():
+	written: list[float] = []
+	release = threading.Event()
+
+	def slow_writer(batch):
+		release.wait()
+		written.extend(batch["t"])
+
+	pipeline = create_tracking_pipeline(slow_writer)
+	for consumer in pipeline.consumers:
+		consumer.buffer = SampleRingBuffer(capacity=8, overwrite=consumer.buffer.overwrite)
+	with pipeline:
+		for k in range(100):
+			pipeline.publish(sample(k))
+		release.set()
+
+	assert written == list(range(100))
+
+
+def test_ring_buffer_drain_times_out_empty():
+	assert len(SampleRingBuffer(capacity=4).drain(timeout=0.01)) == 0
+
+
+def test_pipeline_delivers_every_sample_to_every_consumer():
+	received: dict[str, list[float]] = {"a": [], "b": []}
+	pipeline = AcquisitionPipeline()
+	pipeline.add_consumer("a", lambda batch: received["a"].extend(batch["t"]))
+	pipeline.add_consumer("b", lambda batch: received["b"].extend(batch["t"]))
+
+	with pipeline:
+		for k in range(1000):
+			pipeline.publish(sample(k))
+
+	assert received["a"] == list(range(1000))
+	assert received["b"] == list(range(1000))
+
+
+def test_slow_consumer_does_not_block_publishing():
+	release = threading.Event()
+	pipeline = AcquisitionPipeline()
+	pipeline.add_consumer("slow", lambda batch: release.wait())
+
+	with pipeline:
+		start = time.perf_counter()
+		for k in range(1000):
+			pipeline.publish(sample(k))
+		elapsed = time.perf_counter() - start
+		release.set()
+
+	assert elapsed < 0.5
+
+
+def test_failing_consumer_is_logged_and_keeps_running(caplog: pytest.LogCaptureFixture):
+	def fail(batch):
+		raise OSError("disk full")
+
+	pipeline = AcquisitionPipeline()
+	consumer = pipeline.add_consumer("writer", fail)
+	with pipeline:
+		pipeline.publish(sample(0))
+
+	assert consumer.errors >= 1
+	assert "disk full" in caplog.text
+
+
+def test_summary_logger_logs_once_per_interval(caplog: pytest.LogCaptureFixture):
+	caplog.set_level(logging.INFO)
+	summary = TrackingSummaryLogger(interval=10.0)
+	for t in [0.0, 5.0, 10.0, 12.0]:
+		summary(np.array([tuple(sample(t))], dtype=TRACKING_DTYPE))
+
+	assert len([r for r in caplog.records if r.message.startswith("Tracking at")]) == 2
+
+
+def test_create_tracking_pipeline_adds_writer_and_logger():
+	pipeline = create_tracking_pipeline(lambda batch: None)
+	assert [consumer.name for consumer in pipeline.consumers] == ["writer", "logger"]
+
+
+def test_tracking_pipeline_feeds_plot_consumer():
+	plotted = []
+	with create_tracking_pipeline(writer=None, plot=plotted.append) as pipeline:
+		pipeline.publish(sample(1.0))
+
+	assert [consumer.name for consumer in pipeline.consumers] == ["logger", "plot"]
+	assert plotted[0]["t"].tolist() == [1.0]
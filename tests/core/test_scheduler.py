@@ -0,0 +1,38 @@
+import pytest
+
+from core.scheduler import JVScheduler, create_jv_scheduler
+
+
+def test_interval_schedule_counts_from_the_last_sweep():
+	scheduler = JVScheduler(interval=60)
+	scheduler.start(100.0)
+	assert scheduler.due(159.0, 1.0) is None
+	assert scheduler.due(160.0, 1.0) == "60 s interval elapsed"
+
+	scheduler.mark(165.0)
+	assert scheduler.sweeps == 1
+	assert scheduler.due(200.0, 1.0) is None
+
+
+def test_power_drop_is_measured_from_the_peak_since_the_last_sweep():
+	scheduler = JVScheduler(power_drop=0.1)
+	for p in (0.5, 1.0, 0.95, 0.91):
+		assert scheduler.due(0.0, p) is None
+	assert scheduler.due(0.0, 0.89) == "power fell 10% below 1 W"
+
+	scheduler.mark(0.0)
+	assert scheduler.due(0.0, 0.89) is None
+
+
+@pytest.mark.parametrize(
+	"interval, power_drop, message",
+	[(None, None, "needs an interval"), (0, None, "interval must be positive"), (None, 1.5, "between 0 and 1")],
+)
+def test_invalid_schedules_raise(interval, power_drop, message):
+	with pytest.raises(ValueError, match=message):
+		JVScheduler(interval=interval, power_drop=power_drop)
+
+
+def test_create_jv_scheduler_is_off_without_triggers():
+	assert create_jv_scheduler(None, None) is None
+	assert create_jv_scheduler(30.0, None).interval == 30.0  # type: ignore
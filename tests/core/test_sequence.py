@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from pathlib import Path
+
+from controllers.simulatedK2400 import simulatedK2400Controller, SingleDiodeModel
+from controllers.simulatedShutter import simulatedShutter
+from core.core import MaximumPowerPointTracker
+from core.sequence import MeasurementSequence, SequenceStep, sequenceStep, parse_step
+from utils.data_writer import StreamingDataWriter, JV_DTYPE, TRACKING_DTYPE, SHUTTER_DTYPE
+
+
+@pytest.fixture
+def sm() -> simulatedK2400Controller:
+	return simulatedK2400Controller(resource="GPIB0::20::INSTR", voltage_protection=3.6, current_compliance=0.058)  # type: ignore
+
+
+def make_tracker(sm: simulatedK2400Controller, tmp_path: Path) -> MaximumPowerPointTracker:
+	return MaximumPowerPointTracker(
+		sourcemeter=sm,
+		cell_area=0.1,
+		tracking_time=10,
+		dummyMode=True,
+		clock=lambda: sm.clock,
+		data_writer=StreamingDataWriter(tmp_path / "run.npy", dtype=TRACKING_DTYPE).open(),
+		jv_writer=StreamingDataWriter(tmp_path / "run_jv.npy", dtype=JV_DTYPE).open(),
+	)
+
+
+@pytest.mark.parametrize(
+	"spec, step",
+	[("jv", SequenceStep(sequenceStep.JV)), ("track:3600", SequenceStep(sequenceStep.TRACK, 3600.0))],
+)
+def test_parse_step(spec: str, step: SequenceStep):
+	assert parse_step(spec) == step
+
+
+@pytest.mark.parametrize("spec", ["walk", "dark", "pulse:0", "track:-5"])
+def test_parse_step_rejects_bad_specs(spec: str):
+	with pytest.raises(ValueError):
+		parse_step(spec)
+
+
+def test_dark_steps_need_a_shutter(sm, tmp_path):
+	with pytest.raises(ValueError, match="need shutter control"):
+		MeasurementSequence(make_tracker(sm, tmp_path), [parse_step("dark_jv")])
+
+
+def test_simulated_shutter_lights_readings_by_timeline(sm):
+	shutter = simulatedShutter(sm)
+	shutter.close()
+	sm.elapse(1.0)
+	opened, closed = shutter.pulse(0.5)
+
+	assert not shutter.is_open(opened.host_ns - 1)
+	assert shutter.is_open(opened.host_ns) and shutter.is_open(closed.host_ns - 1)
+	assert not shutter.is_open(closed.host_ns)
+	shutter.wait()
+	assert sm.clock == pytest.approx(1.5)
+
+
+def test_sequence_interleaves_light_and_dark_measurements(sm, tmp_path):
+	tracker = make_tracker(sm, tmp_path)
+	shutter = simulatedShutter(sm)
+	events = StreamingDataWriter(tmp_path / "run_shutter.npy", dtype=SHUTTER_DTYPE).open()
+	steps = [parse_step(spec) for spec in ["voc", "jv", "dark_jv:2", "track:20", "dark:5", "pulse:1"]]
+	MeasurementSequence(tracker, steps, shutter, events, sleep=sm.elapse).run()
+	for writer in (tracker.data_writer, tracker.jv_writer, events):
+		writer.close()
+
+	jv = np.load(tmp_path / "run_jv.npy")
+	assert sorted(set(jv["sweep"].tolist())) == [0, 1]
+	light, dark = jv[jv["light"]], jv[~jv["light"]]
+	assert np.all(light["sweep"] == 0) and np.all(dark["sweep"] == 1)
+	assert light["i"][light["v"] < 0.5].max() < -1e-3  # photocurrent
+	assert abs(dark["i"][dark["v"] < 0.5]).max() < 1e-4  # only leakage
+
+	assert tracker.vmpp == pytest.approx(SingleDiodeModel().max_power_point()[0], abs=0.05)  # tracked in the light
+
+	# open for voc, closed for the dark JV, open to track, closed for the dark hold, then the pulse
+	edges = np.load(tmp_path / "run_shutter.npy")
+	assert edges["open"].tolist() == [True, False, True, False, True, False]
+	opened, closed = edges["host_ns"][-2:]
+	assert closed - opened == 1_000_000_000
+
+	data = np.load(tmp_path / "run.npy")
+	pulse = data[data["host_ns"] >= opened]  # the dark reading before the pulse shares the opening edge time
+	lit = (pulse["host_ns"] > opened) & (pulse["host_ns"] < closed)
+	assert np.all(pulse["i"][lit] < -1e-3) and np.all(pulse["i"][~lit] > -1e-4)
+	assert np.all(pulse["v_set"] == pulse["v_set"][0])  # held, not tracked
+	assert pulse["host_ns"][-1] >= 2 * closed - opened
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from plotting.decimation import MinMaxDecimator, minmax_decimate
+
+
+def test_short_series_is_returned_unchanged():
+	x, y = np.arange(10.0), np.arange(10.0) ** 2
+	x_out, y_out = minmax_decimate(x, y, n_bins=5)
+	np.testing.assert_array_equal(x_out, x)
+	np.testing.assert_array_equal(y_out, y)
+
+
+def test_keeps_min_and_max_of_every_bin_in_order():
+	rng = np.random.default_rng(0)
+	x = np.arange(1000.0)
+	y = rng.standard_normal(1000)
+	x_out, y_out = minmax_decimate(x, y, n_bins=10)
+
+	assert len(x_out) <= 22
+	assert (x_out[0], x_out[-1]) == (0, 999)
+	assert np.all(np.diff(x_out) > 0)
+	for chunk_x, chunk_y in zip(np.split(x, 10), np.split(y, 10)):
+		in_bin = (x_out >= chunk_x[0]) & (x_out <= chunk_x[-1])
+		assert y_out[in_bin].min() == chunk_y.min()
+		assert y_out[in_bin].max() == chunk_y.max()
+
+
+def test_decimator_stays_bounded_and_keeps_global_extremes():
+	decimator = MinMaxDecimator(max_points=400)
+	rng = np.random.default_rng(1)
+	y_all = []
+	for start in range(0, 1_000_000, 10_000):
+		y = rng.standard_normal(10_000)
+		decimator.extend(np.arange(start, start + 10_000), y)
+		y_all.append(y)
+		assert len(decimator) <= 400
+
+	y_all = np.concatenate(y_all)
+	assert decimator.points_seen == 1_000_000
+	assert decimator.y.max() == y_all.max()
+	assert decimator.y.min() == y_all.min()
+	assert decimator.x[0] == 0 and decimator.x[-1] == 999_999
+
+
+def test_decimator_keeps_old_data_across_its_x_range_after_many_small_extends():
+	decimator = MinMaxDecimator(max_points=400)
+	rng = np.random.default_rng(2)
+	for start in range(0, 1_000_000, 100):
+		decimator.extend(np.arange(start, start + 100), rng.standard_normal(100))
+
+	# every tenth of the run still holds its share of the decimated points, not just the latest batches
+	counts, _ = np.histogram(decimator.x, bins=10, range=(0, 1_000_000))
+	assert counts.min() >= 0.5 * counts[:-1].mean()
+	assert np.all(np.diff(decimator.x) > 0)
+
+
+def test_decimator_needs_room_for_a_few_bins():
+	with pytest.raises(ValueError, match="at least 8 points"):
+		MinMaxDecimator(max_points=4)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from unittest.mock import patch
+
+from plotting.live_plot import DashboardState, LivePlot, create_live_plot
+from utils.data_writer import JV_DTYPE, TRACKING_DTYPE
+
+
+def jv_rows(sweep: int) -> np.ndarray:
+	rows = np.zeros(4, dtype=JV_DTYPE)
+	rows["sweep"] = sweep
+	rows["reverse"] = [True, True, False, False]
+	return rows
+
+
+def test_dashboard_state_decimates_samples_and_keeps_recent_jv_sweeps():
+	state = DashboardState(max_points=100)
+	samples = np.zeros(1000, dtype=TRACKING_DTYPE)
+	samples["t"] = np.arange(1000)
+	samples["p"] = np.sin(samples["t"] / 50)
+	state.handle("samples", samples)
+
+	assert len(state.power) <= 100
+	assert state.power.y.max() == samples["p"].max()
+
+	for sweep in range(7):
+		state.handle("jv", jv_rows(sweep))
+	assert sorted(state.jv) == [2, 3, 4, 5, 6]
+	assert len(state.jv[6]) == 4
+
+
+def test_sends_never_block_when_the_dashboard_falls_behind():
+	live_plot = LivePlot(maxsize=2)
+	for _ in range(5):
+		live_plot.send_samples(np.zeros(3, dtype=TRACKING_DTYPE))
+	assert live_plot.dropped == 3
+
+
+def test_stop_returns_once_the_dashboard_process_has_gone():
+	live_plot = LivePlot()
+	with patch("plotting.live_plot.run_dashboard", print):  # a picklable stand-in that returns at once
+		live_plot.start()
+	live_plot.stop(timeout=10)
+	assert live_plot._process is None
+
+
+@pytest.mark.parametrize("available", [True, False])
+def test_create_live_plot_needs_matplotlib(available: bool, caplog: pytest.LogCaptureFixture):
+	with patch("plotting.live_plot.plotting_available", return_value=available):
+		live_plot = create_live_plot("run")
+	assert (live_plot is not None) == available
+	assert ("matplotlib" in caplog.text) != available
@@ -0,0 +1,53 @@
+import json
+import pytest
+
+from pathlib import Path
+
+from benchmark import compare, main
+
+
+@pytest.fixture(scope="module")
+def results(tmp_path_factory: pytest.TempPathFactory) -> dict:
+	output = tmp_path_factory.mktemp("bench") / "results.json"
+	assert main(["-t", "30", "--calls", "20", "-o", str(output)]) == 0
+	return json.loads(output.read_text())
+
+
+def test_benchmark_reports_latency_per_operation(results: dict):
+	assert set(results["latency"]) == {"set_sm_output", "read_output", "set_and_read", "calc_mpp_from_iv"}
+	for stats in results["latency"].values():
+		assert stats["p50_us"] <= stats["p95_us"] <= stats["p99_us"]
+
+
+def test_benchmark_reports_tracking_metrics_per_algorithm(results: dict):
+	assert set(results["tracking"]) == {"po", "adaptive", "ic"}
+	for metrics in results["tracking"].values():
+		assert metrics["steps"] > 0
+		assert metrics["samples_per_s_wall"] > 0
+		assert 0.9 < metrics["efficiency"] <= 1.0
+		assert metrics["time_to_mpp_s"] < 30
+
+
+def test_adaptive_step_reaches_mpp_first(results: dict):
+	tracking = results["tracking"]
+	assert tracking["adaptive"]["time_to_mpp_s"] < tracking["po"]["time_to_mpp_s"]
+
+
+def test_compare_flags_regressions(results: dict):
+	assert compare(results, results, tolerance=0.2) == []
+
+	baseline = json.loads(json.dumps(results))
+	baseline["tracking"]["po"]["efficiency"] = 2.0
+	assert compare(results, baseline, tolerance=0.2) == [
+		f"po.efficiency: {results['tracking']['po']['efficiency']:.4g} < baseline 2"
+	]
+
+
+@pytest.mark.parametrize("metric, status", [("samples_per_s_simulated", 1), ("samples_per_s_wall", 0)])
+def test_compare_exit_status(results: dict, tmp_path: Path, metric: str, status: int):
+	baseline = json.loads(json.dumps(results))
+	baseline["tracking"]["ic"][metric] = 1e12  # wall-clock throughput is machine dependent and never fails
+	path = tmp_path / "baseline.json"
+	path.write_text(json.dumps(baseline))
+
+	assert main(["-t", "5", "--calls", "5", "-a", "ic", "--compare", str(path)]) == status
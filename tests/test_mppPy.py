@@ -0,0 +1,126 @@
+import ast
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+from pathlib import Path
+from unittest.mock import patch
+
+from pyvisa import VisaIOError
+from pyvisa.constants import StatusCode
+
+from mppPy import describe_error, run_campaign
+from utils.custom_exceptions import OutputLimitsExceededError
+from utils.validator import CampaignSetting
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+HEAVY_MODULES = ("numpy", "pandas", "pyvisa", "nidaqmx", "pydantic", "matplotlib")
+IMPORT_BUDGET_US = 100_000  # cumulative import time of the entry point, about a tenth of the heavy stack
+
+
+def run_python(code: str, cwd: Path = SRC) -> subprocess.CompletedProcess:
+	env = {**os.environ, "PYTHONPATH": str(SRC)}
+	return subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=env, capture_output=True, text=True, timeout=120
+	)
+
+
+def loaded_heavy_modules(code: str, cwd: Path = SRC) -> list[str]:
+	result = run_python(f"{code}\nimport sys\nprint(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))", cwd)
+	assert result.returncode == 0, result.stderr
+	return ast.literal_eval(result.stdout.strip().splitlines()[-1])
+
+
+def test_help_loads_no_heavy_modules():
+	code = "import mppPy\ntry:\n\tmppPy.parse_arguments(['-h'])\nexcept SystemExit:\n\tpass"
+	assert loaded_heavy_modules(code) == []
+
+
+def test_entry_point_import_within_budget():
+	result = run_python("import mppPy")
+	# -X importtime lines read 'import time: self | cumulative | module', in microseconds
+	cumulative = next(int(line.split("|")[1]) for line in result.stderr.splitlines() if line.endswith("| mppPy"))
+	assert cumulative < IMPORT_BUDGET_US
+
+
+def test_dummy_run_loads_no_hardware_drivers(tmp_path: Path):
+	code = "import sys, mppPy\nsys.argv = ['mppPy', '2', '0.1', '-d', '-s']\nmppPy.main()"
+	loaded = loaded_heavy_modules(code, cwd=tmp_path)
+
+	assert "pyvisa" not in loaded and "nidaqmx" not in loaded
+	assert len(list((tmp_path / "data").glob("*.npy"))) == 1
+
+
+def test_dummy_run_writes_json_lines_run_log(tmp_path: Path):
+	code = "import sys, mppPy\nsys.argv = ['mppPy', '2', '0.1', '-d', '-m', 'devA', '--log_json']\nmppPy.main()"
+	run_python(code, cwd=tmp_path)
+
+	(logfile,) = (tmp_path / "data").glob("*_devA.log")
+	messages = [json.loads(line)["message"] for line in logfile.read_text().splitlines()]
+	assert messages[0] == "Log initiated."
+	assert messages[-1] == "Program finished."
+
+
+def test_dummy_multichannel_run_writes_json_lines_channel_logs(tmp_path: Path):
+	code = "import sys, mppPy\nsys.argv = ['mppPy', '2', '0.1', '-d', '-c', '20', '21', '--log_json']\nmppPy.main()"
+	run_python(code, cwd=tmp_path)
+
+	(logfile,) = (tmp_path / "data").glob("*_GPIB20.log")
+	entries = [json.loads(line) for line in logfile.read_text().splitlines()]
+	assert entries and all(entry["thread"].startswith("GPIB20") for entry in entries)
+
+
+def test_dummy_campaign_reuses_the_sourcemeter_session(tmp_path: Path):
+	(tmp_path / "campaign.toml").write_text(
+		'metadata = "queue"\n[defaults]\ntracking_time_seconds = 2\ndevice_area_cm2 = 0.1\ngpib_address = "20"\n'
+		'[[jobs]]\nmetadata = "devA"\n[[jobs]]\nmetadata = "devB"\nsequence = ["voc", "track:1"]\n'
+	)
+	code = "import sys, mppPy\nsys.argv = ['mppPy', '--config', 'campaign.toml', '-d']\nmppPy.main()"
+	run_python(code, cwd=tmp_path)
+
+	assert len(list((tmp_path / "data").glob("*_devA_job1_GPIB20.npy"))) == 1
+	assert len(list((tmp_path / "data").glob("*_devB_job2_GPIB20.npy"))) == 1
+	(logfile,) = (tmp_path / "data").glob("*_queue.log")
+	log = logfile.read_text()
+	assert log.count("Initialising dummy sourcemeter.") == 1
+	assert "Campaign job 2 of 2" in log and "Safe output" not in log
+
+
+def dummy_campaign(jobs: int) -> CampaignSetting:
+	return CampaignSetting.model_validate(
+		{
+			"dummy": True,
+			"defaults": {"tracking_time_seconds": 1, "device_area_cm2": 0.1, "gpib_address": "20"},
+			"jobs": [{}] * jobs,
+		}
+	)
+
+
+def test_campaign_moves_on_from_a_failed_job(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+	monkeypatch.chdir(tmp_path)
+	failures = [OutputLimitsExceededError("too high"), ValueError("no Voc found"), None]
+	with patch("mppPy.track_device", side_effect=failures) as track_device:
+		run_campaign(dummy_campaign(3), {})
+	assert track_device.call_count == 3
+
+
+def test_campaign_stops_on_a_session_error(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+	monkeypatch.chdir(tmp_path)
+	with patch("mppPy.track_device", side_effect=VisaIOError(StatusCode.error_timeout)) as track_device:
+		with pytest.raises(VisaIOError):
+			run_campaign(dummy_campaign(3), {})
+	assert track_device.call_count == 1
+
+
+@pytest.mark.parametrize(
+	"error, message",
+	[
+		(VisaIOError(StatusCode.error_timeout), "Keithley communication error"),
+		(OutputLimitsExceededError("too high"), "Safe output limits exceeded: too high"),
+		(RuntimeError("boom"), "unexpected error has occured: boom"),
+	],
+)
+def test_describe_error(error: Exception, message: str):
+	assert message in describe_error(error)
@@ -0,0 +1,160 @@
+import json
+import numpy as np
+import pytest
+
+from pathlib import Path
+from unittest.mock import patch
+
+from utils.data_writer import (
+	StreamingDataWriter,
+	TRACKING_DTYPE,
+	make_run_path,
+	log_path,
+	jv_path,
+	timing_path,
+	checkpoint_path,
+)
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> Path:
+	return tmp_path / "run.npy"
+
+
+def test_appended_rows_round_trip(path: Path):
+	with StreamingDataWriter(path, chunk_size=4) as writer:
+		for k in range(10):
+			writer.append([k, 0.5, -0.01, 0.005, 0.51, 0, k])
+
+	data = np.load(path)
+	assert data.dtype == TRACKING_DTYPE
+	assert data["t"].tolist() == list(range(10))
+	assert data["v_set"][0] == 0.51
+
+
+def test_file_is_loadable_mid_run_and_holds_only_flushed_chunks(path: Path):
+	writer = StreamingDataWriter(path, chunk_size=4).open()
+	for k in range(6):
+		writer.append([k, 0.5, -0.01, 0.005, 0.5, 0, k])
+
+	data = np.load(path, mmap_mode="r")
+	assert data.shape == (4,)  # the half-filled second chunk is not yet on disk
+	writer.close()
+	assert np.load(path).shape == (6,)
+
+
+def test_rows_flushed_after_flush_interval(path: Path):
+	with patch("utils.data_writer.time.monotonic", return_value=0.0) as clock:
+		writer = StreamingDataWriter(path, chunk_size=100, flush_interval=10.0).open()
+		clock.return_value = 1.0
+		writer.append([0, 0, 0, 0, 0, 0, 0])
+		assert writer.rows_written == 0
+		clock.return_value = 11.0
+		writer.append([1, 0, 0, 0, 0, 0, 0])
+		assert writer.rows_written == 2
+		writer.close()
+
+
+def test_buffered_batches_flush_only_by_chunk_size(path: Path):
+	rows = np.zeros(3, dtype=TRACKING_DTYPE)
+	with patch.object(StreamingDataWriter, "flush", autospec=True, side_effect=StreamingDataWriter.flush) as flush:
+		writer = StreamingDataWriter(path, chunk_size=10).open()
+		for _ in range(3):
+			writer.extend_buffered(rows)
+		assert (flush.call_count, writer.rows_written) == (0, 0)
+
+		writer.extend_buffered(rows)  # 12 rows fill one chunk and start the next
+		assert (flush.call_count, writer.rows_written) == (1, 10)
+		writer.close()
+	assert np.load(path).shape == (12,)
+
+
+def test_buffered_batches_flushed_after_flush_interval(path: Path):
+	with patch("utils.data_writer.time.monotonic", return_value=0.0) as clock:
+		writer = StreamingDataWriter(path, chunk_size=100, flush_interval=10.0).open()
+		writer.extend_buffered(np.zeros(2, dtype=TRACKING_DTYPE))
+		assert writer.rows_written == 0
+		clock.return_value = 11.0
+		writer.extend_buffered(np.zeros(1, dtype=TRACKING_DTYPE))
+		assert writer.rows_written == 3
+		writer.close()
+
+
+def test_metadata_written_to_sidecar(path: Path):
+	with StreamingDataWriter(path, metadata={"metadata": "Device21", "settings": {"device_area_cm2": 0.1}}):
+		pass
+
+	metadata = json.loads(path.with_suffix(".json").read_text())
+	assert metadata["metadata"] == "Device21"
+	assert metadata["settings"] == {"device_area_cm2": 0.1}
+	assert metadata["columns"] == ["t", "v", "i", "p", "v_set", "host_ns", "t_host"]
+
+
+def test_extend_accepts_plain_arrays(path: Path):
+	with StreamingDataWriter(path) as writer:
+		writer.append([0, 0, 0, 0, 0, 0, 0])
+		writer.extend(np.ones((3, 7)))
+
+	data = np.load(path)
+	assert data["t"].tolist() == [0.0, 1.0, 1.0, 1.0]
+
+
+def test_make_run_path():
+	path = make_run_path("Device21", "20", directory="out")
+	assert path.parent == Path("out")
+	assert path.name.endswith("_Device21_GPIB20.npy")
+
+
+def test_log_path_named_from_metadata():
+	assert log_path("Device21", directory="out").name.endswith("_Device21.log")
+	assert log_path(None, directory="out").name.endswith("_mppPy.log")
+
+
+def test_jv_path_sits_next_to_tracking_data():
+	assert jv_path(Path("out") / "20250101_dev_GPIB20.npy") == Path("out") / "20250101_dev_GPIB20_jv.npy"
+
+
+def test_timing_path_sits_next_to_tracking_data():
+	assert timing_path(Path("out") / "run_GPIB20.npy") == Path("out") / "run_GPIB20_timing.json"
+
+
+def test_checkpoint_path_sits_next_to_tracking_data():
+	assert checkpoint_path(Path("out") / "run_GPIB20.npy") == Path("out") / "run_GPIB20_checkpoint.json"
+
+
+def test_append_mode_continues_existing_file(path: Path):
+	with StreamingDataWriter(path, metadata={"metadata": "Device21"}) as writer:
+		writer.append([0, 0.5, -0.01, 0.005, 0.5, 0, 0])
+	with StreamingDataWriter(path, metadata={"metadata": "Device21"}, append=True) as writer:
+		assert writer.rows_written == 1
+		writer.append([1, 0.5, -0.01, 0.005, 0.5, 0, 1])
+
+	assert np.load(path)["t"].tolist() == [0.0, 1.0]
+	metadata = json.loads(path.with_suffix(".json").read_text())
+	assert metadata["metadata"] == "Device21"
+	assert len(metadata["resumed"]) == 1
+
+
+def test_append_mode_drops_uncommitted_tail(path: Path):
+	with StreamingDataWriter(path) as writer:
+		writer.append([0, 0, 0, 0, 0, 0, 0])
+	with open(path, "ab") as f:
+		f.write(b"\x01" * 30)  # part of a chunk whose header update never happened
+
+	with StreamingDataWriter(path, append=True) as writer:
+		writer.append([1, 0, 0, 0, 0, 0, 0])
+
+	assert np.load(path)["t"].tolist() == [0.0, 1.0]
+
+
+def test_append_mode_rejects_other_record_layouts(path: Path):
+	with StreamingDataWriter(path):
+		pass
+	with pytest.raises(ValueError):
+		StreamingDataWriter(path, dtype=np.dtype([("t", "<f8")]), append=True).open()
+
+
+def test_append_mode_creates_missing_file(path: Path):
+	with StreamingDataWriter(path, append=True) as writer:
+		writer.append([0, 0, 0, 0, 0, 0, 0])
+	assert np.load(path).shape == (1,)
@@ -1,9 +1,94 @@
+import json
 import logging
+import threading
 
-from utils.logger_config import LogLevel, setup_logger
+from pathlib import Path
+
+from utils.logger_config import (
+	LogLevel,
+	setup_logger,
+	queued_logging,
+	log_handlers,
+	add_channel_log,
+	remove_channel_log,
+)
+
+
+class RecordingHandler(logging.Handler):
+	def __init__(self):
+		super().__init__()
+		self.records: list[tuple[str, str]] = []
+
+	def emit(self, record: logging.LogRecord) -> None:
+		self.records.append((record.getMessage(), threading.current_thread().name))
 
 
 def test_logger_name_and_level():
 	logger = setup_logger(level=LogLevel.INFO)
 	assert logger.name == "mppPy"
 	assert logger.level == logging.INFO
+
+
+def test_bare_setup_keeps_configured_handlers_and_level():
+	logger = setup_logger(level=LogLevel.DEBUG)
+	handler = RecordingHandler()
+	logger.addHandler(handler)
+	try:
+		setup_logger()
+		assert handler in logger.handlers
+		assert logger.level == logging.DEBUG
+		assert sum(h.get_name() == "console" for h in logger.handlers) == 1
+	finally:
+		logger.removeHandler(handler)
+		setup_logger(level=LogLevel.INFO)
+
+
+def test_queued_records_are_written_on_the_listener_thread():
+	logger = setup_logger()
+	handler = RecordingHandler()
+	logger.addHandler(handler)
+	try:
+		with queued_logging():
+			assert handler in log_handlers() and handler not in logger.handlers
+			logger.info("Tracking at %.1f s.", 1.25)
+		assert handler in logger.handlers
+	finally:
+		logger.removeHandler(handler)
+
+	assert handler.records == [("Tracking at 1.2 s.", handler.records[0][1])]
+	assert handler.records[0][1] != threading.current_thread().name
+
+
+def test_json_lines_log_file(tmp_path: Path):
+	logfile = tmp_path / "logs" / "run.log"
+	logger = setup_logger(logfile=logfile, json_lines=True)
+	handler = log_handlers()[-1]
+	try:
+		logger.warning("Voc drifting at %.3g V/s.", 0.00123)
+	finally:
+		logger.removeHandler(handler)
+		handler.close()
+
+	entry = json.loads(logfile.read_text())
+	assert entry["level"] == "WARNING"
+	assert entry["message"] == "Voc drifting at 0.00123 V/s."
+	assert entry["thread"] == threading.current_thread().name
+
+
+def test_channel_log_added_while_queued_only_holds_its_thread(tmp_path: Path):
+	logger = setup_logger()
+	logfile = tmp_path / "GPIB20.log"
+	gate = threading.Event()
+	with queued_logging():
+		handler = add_channel_log("GPIB20", logfile)
+		handler.addFilter(lambda record: gate.wait())  # hold the listener on the first channel record
+		worker = threading.Thread(target=lambda: [logger.info("from channel") for _ in range(2)], name="GPIB20")
+		worker.start()
+		worker.join()
+		logger.info("from main")
+		threading.Timer(0.1, gate.set).start()  # the second channel record is still queued when removal starts
+		remove_channel_log(handler)
+		assert handler not in log_handlers()
+
+	lines = logfile.read_text().splitlines()
+	assert len(lines) == 2 and all(line.endswith("from channel") for line in lines)
@@ -39,3 +39,71 @@ def test_parse_arguments_fails_with_invalid_inputs(
 ) -> None:
 	with pytest.raises(SystemExit):
 		parse_arguments(shlex.split(command))
+
+
+@pytest.mark.parametrize(
+	"command, algorithm",
+	[
+		("10 0.1", "po"),
+		("10 0.1 -a adaptive", "adaptive"),
+		("10 0.1 --algorithm ic", "ic"),
+	],
+)
+def test_parse_arguments_selects_tracking_algorithm(command: str, algorithm: str) -> None:
+	assert parse_arguments(shlex.split(command)).algorithm == algorithm
+
+
+def test_parse_arguments_rejects_unknown_algorithm() -> None:
+	with pytest.raises(SystemExit):
+		parse_arguments(shlex.split("10 0.1 -a beta"))
+
+
+def test_parse_arguments_accepts_channel_list() -> None:
+	args = parse_arguments(shlex.split("10 0.1 -c 20 21:0.2 22:0.3:devC"))
+	assert args.channels == ["20", "21:0.2", "22:0.3:devC"]
+
+
+def test_parse_arguments_accepts_jv_schedule() -> None:
+	args = parse_arguments(shlex.split("10 0.1 --jv_interval 600 --jv_power_drop 0.1"))
+	assert (args.jv_interval, args.jv_power_drop) == (600.0, 0.1)
+	assert parse_arguments(shlex.split("10 0.1")).jv_interval is None
+
+
+def test_parse_arguments_live_plot_flag() -> None:
+	assert parse_arguments(shlex.split("10 0.1 -p")).plot
+	assert not parse_arguments(shlex.split("10 0.1")).plot
+
+
+def test_parse_arguments_timing_flag() -> None:
+	assert parse_arguments(shlex.split("10 0.1 --timing")).timing
+	assert not parse_arguments(shlex.split("10 0.1")).timing
+
+
+def test_parse_arguments_run_configuration_replaces_positionals() -> None:
+	args = parse_arguments(shlex.split("--config campaign.toml -d"))
+	assert (args.config, args.tracking_time_seconds, args.device_area_cm2) == ("campaign.toml", None, None)
+	with pytest.raises(SystemExit):
+		parse_arguments(shlex.split("10 0.1 --config campaign.toml"))
+	with pytest.raises(SystemExit):
+		parse_arguments(shlex.split("10"))
+
+
+@pytest.mark.parametrize(
+	"option",
+	[
+		"-g 21",
+		"-a ic",
+		"-m Device21",
+		"--sequence voc jv",
+		"--jv_interval 60",
+		"-c 20 21",
+		"-x 1!1 1!2",
+		"--resume a.npy",
+	],
+)
+def test_parse_arguments_run_configuration_rejects_single_run_options(
+	option: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+	with pytest.raises(SystemExit):
+		parse_arguments(shlex.split(f"--config campaign.toml {option}"))
+	assert f"sets {option.split()[0]} for each job" in capsys.readouterr().err
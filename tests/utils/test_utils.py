@@ -1,8 +1,35 @@
 import pandas as pd
 import pytest
 
+from utils.utils import calc_mpp_from_iv, ramp_levels
+
 
 @pytest.fixture
 def get_jv_test_data(scope="session"):
 	test_data = pd.read_csv("tests/data/jv_test_data.csv", header=None)
 	return test_data
+
+
+def test_calc_mpp_from_iv_returns_vmpp_of_test_sweep(get_jv_test_data: pd.DataFrame):
+	Vmpp = calc_mpp_from_iv(get_jv_test_data.to_numpy())
+	assert isinstance(Vmpp, float)
+	assert 2.5 < Vmpp < 2.6
+
+
+def test_ramp_levels_bound_step_and_slew_rate():
+	levels, delay = ramp_levels(0.0, 1.0, slew_rate=0.5, max_step=0.01, max_points=2500)
+	assert len(levels) == 101
+	assert levels[0] == 0.0 and levels[-1] == 1.0
+	assert delay == pytest.approx(0.02)
+
+
+def test_ramp_levels_widen_steps_to_fit_points_and_go_down():
+	levels, delay = ramp_levels(3.0, 0.0, slew_rate=1.0, max_step=0.001, max_points=101)
+	assert len(levels) == 101
+	assert levels[-1] == 0.0
+	assert delay == pytest.approx(0.03)  # 30 mV steps, still 1 V/s
+
+
+def test_ramp_levels_rejects_non_positive_slew_rate():
+	with pytest.raises(ValueError):
+		ramp_levels(0.0, 1.0, slew_rate=0.0, max_step=0.01, max_points=100)
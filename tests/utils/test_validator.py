@@ -1,6 +1,6 @@
 import pytest
 
-from utils.validator import UserSetting
+from utils.validator import CampaignSetting, UserSetting, load_campaign
 from pydantic import ValidationError
 
 
@@ -29,3 +29,149 @@ def test_user_setting_validation_fails_with_invalid_entries(
 			gpib_address=gpib_address,
 			shutter=shutter,
 		)
+
+
+def test_user_setting_parses_channel_specs() -> None:
+	setting = UserSetting(
+		tracking_time_seconds=10,
+		device_area_cm2=0.1,
+		gpib_address="20",
+		shutter=False,
+		dummy=True,
+		metadata="run",
+		channels=["20", "21:0.2", "22:0.3:devC"],
+	)
+	assert [(c.gpib_address, c.device_area_cm2, c.metadata) for c in setting.channels] == [
+		("20", 0.1, "run"),
+		("21", 0.2, "run"),
+		("22", 0.3, "devC"),
+	]
+
+
+@pytest.mark.parametrize("channel", ["x1", "20:-1", "20:abc"])
+def test_user_setting_rejects_invalid_channels(channel: str) -> None:
+	with pytest.raises(ValidationError):
+		UserSetting(
+			tracking_time_seconds=10,
+			device_area_cm2=0.1,
+			gpib_address="20",
+			shutter=False,
+			dummy=True,
+			metadata=None,
+			channels=[channel],
+		)
+
+
+@pytest.mark.parametrize("jv_interval, jv_power_drop", [(0, None), (None, 0), (None, 1.2)])
+def test_user_setting_rejects_invalid_jv_schedule(jv_interval, jv_power_drop) -> None:
+	with pytest.raises(ValidationError):
+		UserSetting(
+			tracking_time_seconds=10,
+			device_area_cm2=0.1,
+			gpib_address="20",
+			shutter=False,
+			dummy=True,
+			metadata=None,
+			jv_interval=jv_interval,
+			jv_power_drop=jv_power_drop,
+		)
+
+
+def test_user_setting_resume_needs_a_checkpoint(tmp_path) -> None:
+	data = tmp_path / "run.npy"
+	settings = dict(tracking_time_seconds=10, device_area_cm2=0.1, gpib_address="20", shutter=False, dummy=True)
+	with pytest.raises(ValidationError):
+		UserSetting(**settings, metadata=None, resume=data)
+
+	(tmp_path / "run_checkpoint.json").write_text("{}")
+	assert UserSetting(**settings, metadata=None, resume=data).resume == data
+	with pytest.raises(ValidationError):
+		UserSetting(**settings, metadata=None, resume=data, channels=["21"])
+
+
+@pytest.mark.parametrize(
+	"extra",
+	[{"pixels": ["1!1", "1!1"]}, {"channels": ["21"]}, {"jv_interval": 60.0}, {"switch_address": "abc"}],
+)
+def test_user_setting_rejects_invalid_pixel_runs(extra) -> None:
+	settings = dict(tracking_time_seconds=10, device_area_cm2=0.1, gpib_address="20", shutter=False, dummy=True)
+	assert UserSetting(**settings, metadata=None, pixels=["1!1", "1!2"]).pixels == ["1!1", "1!2"]
+	with pytest.raises(ValidationError):
+		UserSetting(**settings, metadata=None, **{"pixels": ["1!1", "1!2"], **extra})
+
+
+def test_user_setting_parses_sequence_steps() -> None:
+	settings = dict(tracking_time_seconds=10, device_area_cm2=0.1, gpib_address="20", dummy=True, metadata=None)
+	setting = UserSetting(**settings, shutter=True, sequence=["voc", "jv", "track:3600", "pulse:5"])
+	assert [(step.kind.value, step.duration) for step in setting.sequence] == [
+		("voc", 0.0),
+		("jv", 0.0),
+		("track", 3600.0),
+		("pulse", 5.0),
+	]
+
+
+@pytest.mark.parametrize(
+	"extra",
+	[
+		{"sequence": ["walk"]},
+		{"sequence": ["dark"]},
+		{"sequence": ["track:-1"]},
+		{"sequence": ["dark_jv"], "shutter": False},
+		{"sequence": ["track"], "channels": ["21"]},
+	],
+)
+def test_user_setting_rejects_invalid_sequences(extra) -> None:
+	settings = dict(tracking_time_seconds=10, device_area_cm2=0.1, gpib_address="20", dummy=True, metadata=None)
+	with pytest.raises(ValidationError):
+		UserSetting(**{**settings, "shutter": True, **extra})
+
+
+CAMPAIGN = """
+metadata = "overnight"
+shutter = true
+
+[defaults]
+gpib_address = "20"
+device_area_cm2 = 0.1
+tracking_time_seconds = 60
+
+[[jobs]]
+metadata = "devA"
+sequence = ["voc", "jv", {kind = "track", duration = 3600}, "dark_jv:5"]
+
+[[jobs]]
+gpib_address = "21"
+algorithm = "ic"
+"""
+
+
+def test_load_campaign_fills_jobs_from_defaults(tmp_path) -> None:
+	path = tmp_path / "campaign.toml"
+	path.write_text(CAMPAIGN)
+	campaign = load_campaign(path, dummy=True, plot=False)
+
+	assert [(job.gpib_address, job.tracking_time_seconds, job.shutter, job.dummy) for job in campaign.jobs] == [
+		("20", 60, True, True),
+		("21", 60, True, True),
+	]
+	assert [step.duration for step in campaign.jobs[0].sequence] == [0.0, 0.0, 3600.0, 5.0]
+	assert campaign.jobs[1].algorithm.value == "ic" and not campaign.plot
+
+
+@pytest.mark.parametrize(
+	"data",
+	[
+		{"jobs": []},
+		{"jobs": [{"shutter": True}]},
+		{"defaults": {"dummy": True}, "jobs": [{}]},
+		{"jobs": [{"device_area": 0.1}]},
+		{"jobs": [{"channels": ["21"]}]},
+		{"jobs": [{"sequence": ["dark:10"]}]},
+	],
+)
+def test_campaign_rejects_invalid_jobs(data) -> None:
+	defaults = {"gpib_address": "20", "device_area_cm2": 0.1, "tracking_time_seconds": 60}
+	data = {**data, "defaults": {**defaults, **data.get("defaults", {})}}
+	with pytest.raises(ValidationError):
+		CampaignSetting.model_validate(data)